@@ -1,11 +1,182 @@
 import requests
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
+from requests.adapters import HTTPAdapter
 
-HH_API = 'https://api.hh.ru/' #"Пожалуйста, отправь HTTP GET-запрос (запрос на получение данных) на вот этот адрес: employer_url"
+from hh_cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_TTL, DEFAULT_MAX_BYTES
+from hh_scheduler import RequestScheduler
+from metrics import observe
 
 
-def get_company_data(employer_id):
+HH_API = os.getenv('HH_API', 'https://api.hh.ru/') #"Пожалуйста, отправь HTTP GET-запрос (запрос на получение данных) на вот этот адрес: employer_url"
+
+# Сколько работодателей запрашиваем одновременно по умолчанию
+DEFAULT_CONCURRENCY = 10
+
+# Максимальный размер страницы вакансий, который разрешает HH
+VACANCIES_PER_PAGE = 100
+
+# HH просит передавать User-Agent с названием приложения
+HEADERS = {'User-Agent': 'hh_parser_db/1.0'}
+
+# Одна сессия на поток: keep-alive соединения переиспользуются между запросами,
+# и мы не платим за TCP+TLS рукопожатие на каждого работодателя.
+_local = threading.local()
+
+# Кэш ответов на диске; выключен, пока не вызван configure_cache (или не задан HH_CACHE_PATH)
+_cache = None
+
+# Общий для всех потоков лимит скорости, повторы при 429/5xx и предохранители хостов
+_scheduler = RequestScheduler()
+
+
+def create_session(pool_size=DEFAULT_CONCURRENCY):
+    """
+    Создает HTTP-сессию с пулом keep-alive соединений.
+
+    Args:
+        pool_size (int): Максимальное число соединений, которые держит пул.
+
+    Returns:
+        requests.Session: Настроенная сессия.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Возвращает сессию текущего потока (создает ее при первом обращении)."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = create_session()
+        _local.session = session
+    return session
+
+
+def configure_scheduler(**kwargs):
+    """
+    Заменяет планировщик запросов (лимит скорости, повторы, предохранители).
+
+    Args:
+        **kwargs: Аргументы RequestScheduler (rate, max_retries, backoff_base, ...).
+
+    Returns:
+        RequestScheduler: Новый планировщик (у него есть stats()).
+    """
+    global _scheduler
+    _scheduler = RequestScheduler(**kwargs)
+    return _scheduler
+
+
+def get_scheduler():
+    """Возвращает текущий планировщик запросов."""
+    return _scheduler
+
+
+def configure_cache(path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Включает кэш ответов API на диске для всех последующих запросов.
+
+    Args:
+        path (str): Путь к файлу кэша.
+        ttl (float): Сколько секунд ответ считается свежим.
+        max_bytes (int): Предельный размер кэша.
+
+    Returns:
+        ResponseCache: Кэш (у него есть stats() со счетчиками попаданий).
+    """
+    global _cache
+    disable_cache()
+    _cache = ResponseCache(path, ttl, max_bytes)
+    return _cache
+
+
+def disable_cache():
+    """Выключает кэш ответов."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+
+def get_cache():
+    """Возвращает текущий кэш ответов или None, если он выключен."""
+    return _cache
+
+
+def fetch_json(url, params=None, session=None):
+    """
+    Выполняет GET-запрос к API и возвращает разобранный JSON.
+
+    Запросы идут через планировщик: общий лимит скорости, повторы при 429/5xx
+    с учетом Retry-After и предохранитель хоста.
+    Если кэш включен, свежий ответ берется с диска без обращения к сети,
+    а устаревший перепроверяется условным запросом (If-None-Match / If-Modified-Since).
+
+    Args:
+        url (str): Адрес запроса.
+        params (dict): Параметры строки запроса.
+        session (requests.Session): Сессия; по умолчанию сессия текущего потока.
+
+    Returns:
+        dict: Ответ API.
+    """
+    if session is None:
+        session = get_session()
+
+    start = time.perf_counter()
+    # Метка - первый сегмент пути ('employers', 'vacancies'), а не весь URL:
+    # так число рядов метрик не растет с числом работодателей
+    labels = {'endpoint': urlsplit(url).path.strip('/').split('/')[0] or 'root'}
+
+    cache = _cache
+    if cache is None:
+        response = _scheduler.get(session, url, params=params)
+        _observe_response(labels, 'off', response, start)
+        response.raise_for_status()
+        return response.json()
+
+    key = cache.make_key(url, params)
+    entry = cache.lookup(key)
+    if entry and entry['fresh']:
+        observe('http_request', time.perf_counter() - start, dict(labels, cache='hit', status=200),
+                bytes=len(entry['body']))
+        return json.loads(entry['body'])
+
+    headers = {}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    response = _scheduler.get(session, url, params=params, headers=headers)
+    if entry and response.status_code == 304:
+        cache.revalidate(key)
+        _observe_response(labels, 'revalidated', response, start)
+        return json.loads(entry['body'])
+
+    _observe_response(labels, 'miss', response, start)
+    response.raise_for_status()
+    cache.store(key, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return response.json()
+
+
+def _observe_response(labels, cache_state, response, start):
+    """Отмечает запрос к API: время с учетом ожидания лимита и повторов, статус и размер ответа."""
+    observe('http_request', time.perf_counter() - start,
+            dict(labels, cache=cache_state, status=response.status_code), bytes=len(response.content))
+
+
+def get_company_data(employer_id, session=None):
     """Получает данные о работодателе и его вакансиях по ID."""
 
     employer_url = f'{HH_API}employers/{employer_id}'
@@ -16,11 +187,116 @@ def get_company_data(employer_id):
 
     print(f'Запрашиваем данные  по URL: {employer_url}')
 
-#Отправляем ** основной ** запрос к API hh.ru, используя библиотеку `requests`.
-    # Почему: Метод `.get()` отправляет запрос на получение данных с сервера по указанному адресу. 🌐
-    response = requests.get(employer_url) #"Пожалуйста, отправь HTTP GET-запрос (запрос на получение данных) на вот этот адрес: employer_url"
-    response.raise_for_status()
-    # 4. Преобразуем ответ из JSON в словарь Python
-    employer_data = response.json()
+#Отправляем ** основной ** запрос к API hh.ru через сессию с keep-alive соединениями.
+    # Почему: fetch_json отправляет GET-запрос (или берет свежий ответ из кэша) и
+    # сразу преобразует ответ из JSON в словарь Python. 🌐
+    employer_data = fetch_json(employer_url, session=session)
     print(f'данные по работадателю {employer_id} успешно получены')
     return employer_data
+
+
+def get_companies_data(employer_ids, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Получает данные сразу по нескольким работодателям параллельно.
+
+    Одновременно выполняется не больше `concurrency` запросов, каждый поток
+    пула использует свою keep-alive сессию.
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        concurrency (int): Максимальное число одновременных запросов.
+
+    Returns:
+        list: Данные работодателей в том же порядке, что и `employer_ids`.
+    """
+    employer_ids = list(employer_ids)
+    if not employer_ids:
+        return []
+
+    workers = max(1, min(concurrency, len(employer_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map сохраняет порядок входных ID независимо от порядка ответов
+        return list(executor.map(get_company_data, employer_ids))
+
+
+def get_vacancies_page(vacancies_url, page, per_page=VACANCIES_PER_PAGE, session=None):
+    """
+    Получает одну страницу вакансий по адресу `vacancies_url` работодателя.
+
+    Args:
+        vacancies_url (str): Адрес поиска вакансий (поле 'vacancies_url' работодателя).
+        page (int): Номер страницы, начиная с 0.
+        per_page (int): Размер страницы.
+        session (requests.Session): Сессия; по умолчанию сессия текущего потока.
+
+    Returns:
+        dict: Ответ API с ключами 'items', 'page', 'pages', 'found'.
+    """
+    return fetch_json(vacancies_url, params={'page': page, 'per_page': per_page}, session=session)
+
+
+def iter_vacancy_pages(company_data, per_page=VACANCIES_PER_PAGE, prefetch=True):
+    """
+    Лениво обходит все страницы вакансий работодателя.
+
+    Пока вызывающий код обрабатывает текущую страницу (например, пишет ее в БД),
+    следующая уже загружается в фоновом потоке, если `prefetch=True`.
+    HH отдает не больше 2000 вакансий на один поисковый запрос, поэтому число
+    страниц берется из поля 'pages' ответа. Получен ли полный список, функция
+    отмечает в company_data['vacancies_complete'] (found <= pages * per_page):
+    вакансии сверх 2000 не видны, и архивировать "пропавшие" у такого
+    работодателя нельзя (см. db.vacancy_list_complete).
+
+    Args:
+        company_data (dict): Данные работодателя из `get_company_data`.
+        per_page (int): Размер страницы.
+        prefetch (bool): Загружать ли следующую страницу заранее.
+
+    Yields:
+        tuple: (номер страницы, список вакансий на странице).
+    """
+    vacancies_url = company_data.get('vacancies_url') or f"{HH_API}vacancies?employer_id={company_data.get('id')}"
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    try:
+        page = 0
+        data = get_vacancies_page(vacancies_url, page, per_page)
+        company_data['vacancies_complete'] = data.get('found', 0) <= data.get('pages', 0) * per_page
+        while True:
+            pages = data.get('pages', 0)
+            next_page = None
+            if executor and page + 1 < pages:
+                next_page = executor.submit(get_vacancies_page, vacancies_url, page + 1, per_page)
+
+            yield page, data.get('items', [])
+
+            page += 1
+            if page >= pages:
+                break
+            if next_page is not None:
+                data = next_page.result()
+            else:
+                data = get_vacancies_page(vacancies_url, page, per_page)
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_vacancies(company_data, per_page=VACANCIES_PER_PAGE, prefetch=True):
+    """
+    Лениво отдает вакансии работодателя по одной, страница за страницей.
+
+    Args:
+        company_data (dict): Данные работодателя из `get_company_data`.
+        per_page (int): Размер страницы.
+        prefetch (bool): Загружать ли следующую страницу заранее.
+
+    Yields:
+        dict: Вакансия в формате API hh.ru.
+    """
+    for _, items in iter_vacancy_pages(company_data, per_page, prefetch):
+        yield from items
+
+
+if os.getenv('HH_CACHE_PATH'):
+    configure_cache(os.getenv('HH_CACHE_PATH'), float(os.getenv('HH_CACHE_TTL', DEFAULT_TTL)))
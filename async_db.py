@@ -0,0 +1,303 @@
+# async_db.py - Асинхронный вариант DBManager на asyncpg
+#
+# Для веб-сервиса на asyncio: пока один запрос ждет PostgreSQL, цикл событий
+# обслуживает другие, и число одновременных запросов ограничено пулом
+# соединений, а не числом потоков. Запросы и формат результатов те же, что
+# у DBManager (SQL берется из db.py).
+
+import asyncio
+import re
+import time
+
+import asyncpg
+
+from db import (
+    ALL_VACANCIES_SQL, VACANCIES_WITH_SALARY_SQL, AVG_SALARY_SQL, CACHED_AVG_SALARY_SQL,
+    VACANCY_COUNTS_SQL, CACHED_VACANCY_COUNTS_SQL, KEYWORD_VACANCIES_SQL, SEARCH_VACANCIES_SQL,
+    DATA_GENERATION_SQL, DEFAULT_ITERSIZE, POOL_MIN_SIZE, POOL_MAX_SIZE, higher_salary_sql, paginate,
+)
+from metrics import get_metrics, observe
+
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+
+def to_asyncpg_sql(sql_query):
+    """
+    Переводит запрос с плейсхолдерами psycopg2 (%s) в нумерованные плейсхолдеры asyncpg ($1, $2, ...).
+
+    Args:
+        sql_query (str): Запрос в стиле psycopg2 (литеральный % записан как %%).
+
+    Returns:
+        str: Запрос для asyncpg.
+    """
+    numbers = iter(range(1, sql_query.count('%s') + 1))
+    return _PLACEHOLDER.sub(lambda match: '%' if match.group() == '%%' else f'${next(numbers)}', sql_query)
+
+
+def asyncpg_connect_kwargs(params):
+    """
+    Переводит параметры подключения psycopg2 (db_params) в аргументы asyncpg.
+
+    Args:
+        params (dict): Параметры подключения к БД.
+
+    Returns:
+        dict: Аргументы asyncpg.create_pool.
+    """
+    kwargs = {
+        'database': params.get('database') or params.get('dbname'),
+        'user': params.get('user'),
+        'password': params.get('password') or None,
+        'host': params.get('host'),
+        'port': int(params['port']) if params.get('port') else None,
+    }
+    # Параметры сервера вида "-c search_path=schema,public" (см. benchmarks.common.bench_params)
+    server_settings = dict(re.findall(r'-c\s*([\w.]+)=(\S+)', params.get('options') or ''))
+    # asyncpg выполняет запросы как подготовленные, и после пяти вызовов PostgreSQL
+    # может перейти на общий план без учета значений параметров. Для поиска
+    # (websearch_to_tsquery, ILIKE, LIMIT) он заметно хуже: планируем каждый
+    # вызов заново, как с psycopg2, который подставляет значения в текст запроса
+    server_settings.setdefault('plan_cache_mode', 'force_custom_plan')
+    kwargs['server_settings'] = server_settings
+    return kwargs
+
+
+# Ошибки запроса: ответ сервера с ошибкой, оборванное соединение (InterfaceError,
+# например ConnectionDoesNotExistError) и сетевые ошибки
+QUERY_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+
+
+class AsyncDBManager:
+    """
+    Асинхронный аналог DBManager: те же методы, но корутины, поверх пула asyncpg.
+
+    Пул создается при первом запросе. Используется как асинхронный контекстный
+    менеджер: при выходе пул закрывается. Можно передать тот же QueryCache,
+    что и DBManager: ключи кэша у обоих одинаковые.
+    """
+
+    def __init__(self, params, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, cache=None, raise_errors=False):
+        """
+        Args:
+            params (dict): Параметры подключения к БД (как для DBManager).
+            min_size (int): Сколько соединений держать открытыми постоянно.
+            max_size (int): Максимальное число соединений в пуле.
+            cache (QueryCache): Кэш результатов get_* и search_vacancies (None - без кэша).
+            raise_errors (bool): Пробрасывать ошибки запросов после сообщения о них
+                                 (как DBManager.raise_errors).
+        """
+        self.params = params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.cache = cache
+        self.raise_errors = raise_errors
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def pool(self):
+        """Возвращает пул соединений; создает его при первом обращении."""
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        min_size=self.min_size, max_size=self.max_size, **asyncpg_connect_kwargs(self.params)
+                    )
+        return self._pool
+
+    async def close(self):
+        """Закрывает все соединения пула."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _fetch(self, name, sql_query, args=(), one=False):
+        """
+        Выполняет запрос на чтение (с кэшем, если он задан) - аналог DBManager._fetch.
+
+        Args:
+            name (str): Имя метода (часть ключа кэша и сообщений об ошибках).
+            sql_query (str): SQL-запрос в стиле psycopg2.
+            args (tuple): Параметры запроса.
+            one (bool): Вернуть первый столбец первой строки вместо списка строк.
+
+        Returns:
+            list: Строки результата кортежами (или одно значение при one=True).
+                  При ошибке - пустой список (None при one=True).
+        """
+        results = None if one else []
+
+        try:
+            pool = await self.pool()
+            wait_start = time.perf_counter()
+            async with pool.acquire() as conn:
+                observe('db_connection_wait', time.perf_counter() - wait_start, {'source': 'asyncpg'})
+                key = None
+                if self.cache is not None:
+                    lookup_start = time.perf_counter()
+                    key = (name, sql_query, tuple(args), await conn.fetchval(DATA_GENERATION_SQL))
+                    found, cached_results = self.cache.get(key)
+                    if found:
+                        observe('db_query', time.perf_counter() - lookup_start, {'name': name, 'cache': 'hit'},
+                                rows=len(cached_results) if isinstance(cached_results, list) else 1)
+                        return cached_results
+
+                start = time.perf_counter()
+                if one:
+                    results = await conn.fetchval(to_asyncpg_sql(sql_query), *args)
+                else:
+                    # Кортежи вместо asyncpg.Record - формат как у DBManager
+                    results = [tuple(row) for row in await conn.fetch(to_asyncpg_sql(sql_query), *args)]
+                seconds = time.perf_counter() - start
+                observe('db_query', seconds, {'name': name, 'cache': 'miss' if key is not None else 'off'},
+                        rows=len(results) if isinstance(results, list) else 1)
+                if get_metrics().is_slow_query(seconds):
+                    # План для медленных запросов снимает только DBManager
+                    get_metrics().slow_query(name, seconds, sql_query)
+
+                if key is not None:
+                    self.cache.put(key, results)
+
+        except QUERY_ERRORS as e:
+            print(f"❌ Ошибка при выполнении запроса '{name}': {e}")
+            if self.raise_errors:
+                raise
+            results = None if one else []
+
+        return results
+
+    async def get_companies_and_vacancies_count(self, cached=True):
+        """
+        Получает список всех компаний и количество открытых вакансий у каждой.
+
+        Args:
+            cached (bool): Читать готовые счетчики из employer_stats или пересчитать по таблицам.
+
+        Returns:
+            list: Список кортежей (название компании, количество вакансий).
+        """
+        sql_query = CACHED_VACANCY_COUNTS_SQL if cached else VACANCY_COUNTS_SQL
+        return await self._fetch('get_companies_and_vacancies_count', sql_query)
+
+    async def get_all_vacancies(self):
+        """
+        Получает список всех вакансий с названием компании.
+
+        Returns:
+            list: Список кортежей вакансий с информацией о компании.
+        """
+        return await self._fetch('get_all_vacancies', ALL_VACANCIES_SQL)
+
+    async def get_vacancies_with_salary(self):
+        """
+        Получает список вакансий с указанной зарплатой.
+
+        Returns:
+            list: Список кортежей вакансий с зарплатой.
+        """
+        return await self._fetch('get_vacancies_with_salary', VACANCIES_WITH_SALARY_SQL)
+
+    async def get_vacancies_with_keyword(self, keyword, limit=None):
+        """
+        Получает вакансии, в названии которых содержится ключевое слово.
+
+        Args:
+            keyword (str): Ключевое слово для поиска в названии вакансии.
+            limit (int): Максимальное число вакансий (None - без ограничения).
+
+        Returns:
+            list: Список кортежей вакансий, содержащих ключевое слово.
+        """
+        return await self._fetch('get_vacancies_with_keyword', KEYWORD_VACANCIES_SQL, (f"%{keyword}%", limit))
+
+    async def search_vacancies(self, query, limit=50):
+        """
+        Полнотекстовый поиск вакансий по названию (см. DBManager.search_vacancies).
+
+        Args:
+            query (str): Поисковый запрос в синтаксисе websearch.
+            limit (int): Максимальное число вакансий.
+
+        Returns:
+            list: Список кортежей вакансий; последний элемент - релевантность.
+        """
+        return await self._fetch('search_vacancies', SEARCH_VACANCIES_SQL, (query, query, limit))
+
+    async def get_avg_salary(self, cached=True):
+        """
+        Получает среднюю зарплату по всем вакансиям в рублях.
+
+        Args:
+            cached (bool): Читать готовое значение из salary_stats или пересчитать по всей таблице.
+
+        Returns:
+            float: Средняя зарплата или None, если нет данных.
+        """
+        return await self._fetch('get_avg_salary', CACHED_AVG_SALARY_SQL if cached else AVG_SALARY_SQL, one=True)
+
+    async def get_vacancies_with_higher_salary(self, cached=True):
+        """
+        Получает вакансии с зарплатой выше средней.
+
+        Args:
+            cached (bool): Брать среднюю из salary_stats, а не пересчитывать ее.
+
+        Returns:
+            list: Список кортежей вакансий с зарплатой выше средней.
+        """
+        return await self._fetch('get_vacancies_with_higher_salary', higher_salary_sql(cached))
+
+    async def _iter_query(self, name, sql_query, args=(), itersize=DEFAULT_ITERSIZE, reraise=False):
+        """
+        Отдает строки запроса по одной через серверный курсор (не больше itersize строк в памяти).
+
+        Как и в DBManager._iter_query, при ошибке поток просто заканчивается, если не
+        задан reraise (или raise_errors у менеджера): тогда ошибка доходит до async for,
+        и оборванный поток не примут за полный.
+
+        Yields:
+            tuple: Строка результата.
+        """
+        try:
+            pool = await self.pool()
+            async with pool.acquire() as conn:
+                # Курсор asyncpg живет только внутри транзакции
+                async with conn.transaction(readonly=True):
+                    async for row in conn.cursor(to_asyncpg_sql(sql_query), *args, prefetch=itersize):
+                        yield tuple(row)
+        except QUERY_ERRORS as e:
+            print(f"❌ Ошибка при выполнении запроса '{name}': {e}")
+            if reraise or self.raise_errors:
+                raise
+
+    def iter_all_vacancies(self, itersize=DEFAULT_ITERSIZE, limit=None, offset=None, after_id=None):
+        """Потоковый вариант get_all_vacancies (async for); параметры как у DBManager.iter_all_vacancies."""
+        sql_query, args = paginate(ALL_VACANCIES_SQL, 'vacancy_id', after_id, limit, offset)
+        return self._iter_query('iter_all_vacancies', sql_query, self._keyset_args(args, after_id), itersize)
+
+    def iter_vacancies_with_salary(self, itersize=DEFAULT_ITERSIZE, limit=None, offset=None, after_id=None):
+        """Потоковый вариант get_vacancies_with_salary (async for)."""
+        sql_query, args = paginate(VACANCIES_WITH_SALARY_SQL, 'vacancy_id', after_id, limit, offset)
+        return self._iter_query('iter_vacancies_with_salary', sql_query, self._keyset_args(args, after_id), itersize)
+
+    def iter_vacancies_with_higher_salary(self, itersize=DEFAULT_ITERSIZE, limit=None, offset=None, after_id=None,
+                                          cached=True):
+        """Потоковый вариант get_vacancies_with_higher_salary (async for)."""
+        sql_query, args = paginate(higher_salary_sql(cached), 'vacancy_id', after_id, limit, offset)
+        return self._iter_query('iter_vacancies_with_higher_salary', sql_query,
+                                self._keyset_args(args, after_id), itersize)
+
+    @staticmethod
+    def _keyset_args(args, after_id):
+        # paginate передает after_id строкой, а asyncpg, в отличие от psycopg2,
+        # не приводит строку к BIGINT сам - передаем число
+        if after_id is not None and str(after_id).isdigit():
+            args = [int(after_id)] + args[1:]
+        return args
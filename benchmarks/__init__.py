@@ -0,0 +1 @@
+# benchmarks - Замеры производительности сбора и загрузки данных
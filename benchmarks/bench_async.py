@@ -0,0 +1,124 @@
+# bench_async.py - Нагрузочный замер DBManager (потоки) и AsyncDBManager (asyncio)
+#
+# При растущем числе одновременных клиентов печатает задержку p50/p99 и
+# пропускную способность (запросов в секунду) для обоих вариантов.
+#
+# Нужен локальный PostgreSQL с параметрами из .env и пакет asyncpg.
+# Запуск: python -m benchmarks.bench_async --rows 200000 --requests 2000 --concurrency 1 4 16 64
+
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_db import AsyncDBManager
+from benchmarks.common import SYNTHETIC_SKILLS, fill_synthetic, reset_schema
+from db import DBManager, refresh_stats
+from migrations import migrate
+
+
+SCHEMA = 'bench_async'
+
+
+def make_workload(requests, seed=0):
+    """
+    Смесь запросов как у API: поиск по навыку, подстрока в названии и средняя зарплата.
+
+    Returns:
+        list: Пары (имя метода, позиционные аргументы).
+    """
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(requests):
+        kind = rng.random()
+        if kind < 0.5:
+            workload.append(('search_vacancies', (rng.choice(SYNTHETIC_SKILLS), 20)))
+        elif kind < 0.9:
+            workload.append(('get_vacancies_with_keyword', (rng.choice(SYNTHETIC_SKILLS), 20)))
+        else:
+            workload.append(('get_avg_salary', ()))
+    return workload
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """
+    Returns:
+        dict: 'p50' и 'p99' в миллисекундах, 'qps'.
+    """
+    latencies = sorted(latencies)
+    return {
+        'p50': percentile(latencies, 0.5) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'qps': len(latencies) / elapsed,
+    }
+
+
+def run_sync(params, workload, concurrency):
+    """Клиенты - потоки, каждый со своим соединением из пула DBManager."""
+    # ThreadedConnectionPool не ждет свободного соединения, а падает - пул не меньше числа потоков
+    with DBManager(params, min_size=concurrency, max_size=concurrency) as db_manager:
+        def call(item):
+            name, args = item
+            start = time.perf_counter()
+            getattr(db_manager, name)(*args)
+            return time.perf_counter() - start
+
+        # Прогрев: соединения пула и кэш страниц PostgreSQL
+        for item in workload[:concurrency]:
+            call(item)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(call, workload))
+        return summarize(latencies, time.perf_counter() - start)
+
+
+async def run_async(params, workload, concurrency):
+    """Клиенты - задачи asyncio, одновременно выполняется не больше concurrency запросов."""
+    async with AsyncDBManager(params, min_size=concurrency, max_size=concurrency) as db_manager:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(item):
+            name, args = item
+            async with semaphore:
+                start = time.perf_counter()
+                await getattr(db_manager, name)(*args)
+                return time.perf_counter() - start
+
+        await asyncio.gather(*(call(item) for item in workload[:concurrency]))
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(call(item) for item in workload))
+        return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Задержка и пропускная способность DBManager и AsyncDBManager')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--employers', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    params = reset_schema(SCHEMA)
+    migrate(params)
+    fill_synthetic(params, args.rows, args.employers)
+    refresh_stats(params)
+
+    workload = make_workload(args.requests)
+    print(f'{"клиентов":>9} {"вариант":>8} {"p50, мс":>9} {"p99, мс":>9} {"запр/с":>9}')
+    for concurrency in args.concurrency:
+        for label, result in (('sync', run_sync(params, workload, concurrency)),
+                              ('async', asyncio.run(run_async(params, workload, concurrency)))):
+            print(f'{concurrency:>9} {label:>8} {result["p50"]:9.1f} {result["p99"]:9.1f} {result["qps"]:9.0f}')
+
+
+if __name__ == '__main__':
+    main()
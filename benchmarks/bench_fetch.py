@@ -0,0 +1,43 @@
+# bench_fetch.py - Сравнение последовательной и параллельной загрузки работодателей
+#
+# Запуск: python -m benchmarks.bench_fetch
+
+import argparse
+import contextlib
+import io
+import time
+
+import api_HH
+from benchmarks.stub_hh import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--employers', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=api_HH.DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+    api_HH.HH_API = base_url
+    ids = list(range(1, args.employers + 1))
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            sequential = [api_HH.get_company_data(employer_id) for employer_id in ids]
+            sequential_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            concurrent = api_HH.get_companies_data(ids, concurrency=args.concurrency)
+            concurrent_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert [c['id'] for c in concurrent] == [s['id'] for s in sequential]
+    print(f'Последовательно: {sequential_time:.2f} c ({len(ids) / sequential_time:.0f} работодателей/с)')
+    print(f'Параллельно ({args.concurrency}): {concurrent_time:.2f} c ({len(ids) / concurrent_time:.0f} работодателей/с)')
+
+
+if __name__ == '__main__':
+    main()
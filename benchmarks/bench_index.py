@@ -0,0 +1,93 @@
+# bench_index.py - Индекс вакансий в памяти: время построения, размер и задержка запросов
+#
+# Для каждого масштаба заполняет схему синтетическими вакансиями, строит
+# VacancyIndex и замеряет запросы по слову, работодателю и зарплате в сравнении
+# с тем же поиском в PostgreSQL (get_vacancies_with_keyword).
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.bench_index --scales 1m 10m
+
+import argparse
+import gc
+import resource
+import statistics
+import time
+
+from benchmarks.common import fill_synthetic, reset_schema, timed
+from benchmarks.scenarios import parse_scale
+from benchmarks.synthetic import SYNTHETIC_SKILLS
+from db import DBManager
+from migrations import migrate
+from vacancy_index import VacancyIndex
+
+
+SCHEMA = 'bench_index'
+
+# Запросы к индексу: (подпись, аргументы VacancyIndex.search)
+INDEX_QUERIES = [
+    ('keyword', {'keyword': SYNTHETIC_SKILLS[0]}),
+    ('keyword x2', {'keyword': f'Senior {SYNTHETIC_SKILLS[0]}'}),
+    ('employer', {'employer_id': 7}),
+    ('salary >= 300k', {'salary_min': 300000}),
+    ('salary 100-150k', {'salary_min': 100000, 'salary_max': 150000}),
+    ('keyword + salary', {'keyword': SYNTHETIC_SKILLS[0], 'salary_min': 200000}),
+    ('keyword + employer', {'keyword': SYNTHETIC_SKILLS[0], 'employer_id': 7}),
+    ('no match', {'keyword': 'Cobol'}),
+]
+
+
+def max_rss_mb():
+    """Пиковый размер процесса в МБ (ru_maxrss в Linux - в КБ)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def latencies_us(func, repeat):
+    """p50 и p99 времени вызова func в микросекундах."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return statistics.median(times) * 1e6, times[int(0.99 * (len(times) - 1))] * 1e6
+
+
+def bench_scale(scale, rows, limit, repeat, db_repeat):
+    params = reset_schema(SCHEMA)
+    migrate(params)
+    print(f'📊 Масштаб {scale}: заполнение {rows:,} вакансий')
+    fill_synthetic(params, rows, employers=max(rows // 100, 1))
+
+    gc.collect()
+    rss_before = max_rss_mb()
+    index, build_seconds = timed(VacancyIndex.build, params)
+    print(f'Построение: {build_seconds:.1f} c ({rows / build_seconds:,.0f} строк/с), '
+          f'индекс ~{index.memory_bytes() / 2 ** 20:.0f} МБ, '
+          f'рост пикового RSS {max_rss_mb() - rss_before:.0f} МБ')
+
+    print(f"{'запрос':>20} {'найдено':>10} {'p50, мкс':>10} {'p99, мкс':>10}")
+    for label, kwargs in INDEX_QUERIES:
+        found = len(index.search(ids_only=True, **kwargs))
+        p50, p99 = latencies_us(lambda: index.search(limit=limit, **kwargs), repeat)
+        print(f'{label:>20} {found:>10,} {p50:>10.1f} {p99:>10.1f}')
+
+    with DBManager(params) as db_manager:
+        p50, p99 = latencies_us(lambda: db_manager.get_vacancies_with_keyword(SYNTHETIC_SKILLS[0], limit),
+                                db_repeat)
+    print(f"{'PostgreSQL ILIKE':>20} {'':>10} {p50:>10.1f} {p99:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер индекса вакансий в памяти')
+    parser.add_argument('--scales', nargs='+', default=['1m', '10m'], help="10k, 1m, 10m или число строк")
+    parser.add_argument('--limit', type=int, default=20, help='Вакансий в ответе')
+    parser.add_argument('--repeat', type=int, default=2000, help='Повторов каждого запроса к индексу')
+    parser.add_argument('--db-repeat', type=int, default=50, help='Повторов запроса к PostgreSQL')
+    args = parser.parse_args()
+
+    for scale, rows in map(parse_scale, args.scales):
+        bench_scale(scale, rows, args.limit, args.repeat, args.db_repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# bench_pipeline.py - Сравнение загрузки "сначала собрать, потом записать" и конвейера
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.bench_pipeline --employers 100 --vacancies 300 --latency 0.02
+
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+
+import api_HH
+from benchmarks.common import reset_schema, timed
+from benchmarks.stub_hh import start_stub_server
+from pipeline import IngestPipeline
+from staging import crawl_to_staging, load_staging
+
+
+SCHEMA = 'bench_pipeline'
+
+
+def sequential(ids, params, concurrency):
+    """Сбор всех работодателей в staging, затем загрузка в БД."""
+    staging_dir = tempfile.mkdtemp()
+    try:
+        run_dir = crawl_to_staging(ids, staging_dir, concurrency)
+        load_staging(run_dir, params)
+    finally:
+        shutil.rmtree(staging_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер конвейерной загрузки')
+    parser.add_argument('--employers', type=int, default=100)
+    parser.add_argument('--vacancies', type=int, default=300, help='Вакансий у каждого работодателя')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=api_HH.DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency, vacancies_per_employer=args.vacancies)
+    api_HH.HH_API = base_url
+    # Заглушка не ограничивает темп, а лимит планировщика исказил бы замер
+    api_HH.configure_scheduler(rate=10000)
+    ids = list(range(1, args.employers + 1))
+    total = args.employers * args.vacancies
+
+    try:
+        params = reset_schema(SCHEMA)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, sequential_time = timed(sequential, ids, params, args.concurrency)
+
+        params = reset_schema(SCHEMA)
+        pipeline = IngestPipeline(params, fetchers=args.concurrency)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, pipeline_time = timed(pipeline.run, ids)
+    finally:
+        server.shutdown()
+
+    print(f'Сбор, затем запись: {sequential_time:.2f} c ({total / sequential_time:,.0f} вакансий/с)')
+    print(f'Конвейер:           {pipeline_time:.2f} c ({total / pipeline_time:,.0f} вакансий/с)')
+    pipeline.print_metrics()
+
+
+if __name__ == '__main__':
+    main()
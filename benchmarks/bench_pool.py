@@ -0,0 +1,67 @@
+# bench_pool.py - Задержка повторяющихся запросов с пулом соединений и без него
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.bench_pool --queries 500
+
+import argparse
+import statistics
+import time
+
+import psycopg2
+
+from benchmarks.common import reset_schema
+from db import DBManager
+
+
+SCHEMA = 'bench_pool'
+
+QUERY = """
+    SELECT e.employer_name, COUNT(v.vacancy_id)
+    FROM employers e
+    LEFT JOIN vacancies v ON e.employer_id = v.employer_id
+    GROUP BY e.employer_name;
+"""
+
+
+def query_without_pool(params):
+    """Как раньше: новое соединение на каждый запрос."""
+    conn = psycopg2.connect(**params)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(QUERY)
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def measure(func, queries):
+    """Возвращает задержки вызовов func в миллисекундах."""
+    latencies = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'{name:>10}: среднее {statistics.mean(latencies):.2f} мс, '
+          f'медиана {statistics.median(latencies):.2f} мс, p99 {p99:.2f} мс')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер задержки запросов с пулом и без')
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    params = reset_schema(SCHEMA)
+
+    report('без пула', measure(lambda: query_without_pool(params), args.queries))
+    with DBManager(params) as db_manager:
+        report('с пулом', measure(db_manager.get_companies_and_vacancies_count, args.queries))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# bench_schema.py - Запросы DBManager на исходной схеме и после migrate
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.bench_schema --rows 1000000
+
+import argparse
+
+from benchmarks.common import explain, fill_synthetic, reset_schema, timed
+from db import DBManager, refresh_stats
+from migrations import migrate
+
+
+SCHEMA = 'bench_schema'
+
+# Запросы DBManager без материализованных агрегатов, чтобы мерить соединения с таблицей
+QUERIES = [
+    ('get_companies_and_vacancies_count', {'cached': False}),
+    ('get_vacancies_with_salary', {}),
+    ('get_avg_salary', {'cached': False}),
+    ('get_vacancies_with_higher_salary', {'cached': False}),
+    ('get_vacancies_with_keyword', {'keyword': 'Python', 'limit': 100}),
+]
+
+# Выборки, которым нужны новые индексы: вакансии одного работодателя и за период
+EMPLOYER_VACANCIES_SQL = """
+    SELECT v.vacancy_id, e.employer_name, v.title
+    FROM vacancies v JOIN employers e ON e.employer_id = v.employer_id
+    WHERE v.employer_id = %s
+"""
+RECENT_VACANCIES_SQL = "SELECT count(*) FROM vacancies WHERE published_at >= now() - interval '7 days'"
+
+
+def run_queries(params, repeat):
+    """Печатает лучшее время каждого запроса из repeat попыток."""
+    with DBManager(params) as db_manager:
+        refresh_stats(db_manager)
+        for name, kwargs in QUERIES:
+            method = getattr(db_manager, name)
+            best = min(timed(method, **kwargs)[1] for _ in range(repeat))
+            print(f'{name:>35}: {best * 1000:8.1f} мс')
+
+    for label, sql_query, args in (('вакансии работодателя', EMPLOYER_VACANCIES_SQL, ('42',)),
+                                   ('вакансии за неделю', RECENT_VACANCIES_SQL, ())):
+        plan = explain(params, sql_query, args)
+        print(f'{label:>35}: {plan.splitlines()[-1].strip()}')
+        print(f'{"":>35}  {plan.splitlines()[0].strip()}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер запросов на старой и новой схеме')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--employers', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('--- Исходная схема (VARCHAR-ключи, без индекса по employer_id) ---')
+    params = reset_schema(SCHEMA)
+    fill_synthetic(params, args.rows, args.employers)
+    run_queries(params, args.repeat)
+
+    print('--- После migrate (BIGINT-ключи, индексы) ---')
+    params = reset_schema(SCHEMA)
+    migrate(params)
+    fill_synthetic(params, args.rows, args.employers)
+    run_queries(params, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# bench_search.py - Поиск по названию вакансии: без индексов, с триграммным и полнотекстовым индексами
+#
+# Нужен локальный PostgreSQL с параметрами из .env (для триграммного индекса - с pg_trgm).
+# Запуск: python -m benchmarks.bench_search --rows 2000000 --keyword Kotlin
+
+import argparse
+
+import psycopg2
+
+from benchmarks.common import explain, fill_synthetic, reset_schema, timed
+from db import DBManager, create_tables
+
+
+SCHEMA = 'bench_search'
+
+# Без LIMIT: так в плане видно, как находятся все совпадения, а не первые 50
+ILIKE_SQL = "SELECT count(*) FROM vacancies WHERE title ILIKE %s"
+FTS_SQL = """
+    SELECT count(*)
+    FROM vacancies
+    WHERE title_tsv @@ (websearch_to_tsquery('russian', %s) || websearch_to_tsquery('english', %s))
+"""
+
+
+def drop_search_indexes(params):
+    conn = psycopg2.connect(**params)
+    with conn, conn.cursor() as cur:
+        cur.execute("DROP INDEX IF EXISTS vacancies_title_trgm_idx;")
+        cur.execute("DROP INDEX IF EXISTS vacancies_title_tsv_idx;")
+    conn.close()
+
+
+def run_queries(params, keyword, label):
+    print(f'\n=== {label} ===')
+    print('--- ILIKE ---')
+    print(explain(params, ILIKE_SQL, (f'%{keyword}%',)))
+    print('--- Полнотекстовый поиск ---')
+    print(explain(params, FTS_SQL, (keyword, keyword)))
+
+    with DBManager(params) as db_manager:
+        _, ilike_seconds = timed(db_manager.get_vacancies_with_keyword, keyword, 50)
+        _, fts_seconds = timed(db_manager.search_vacancies, keyword, 50)
+    print(f'get_vacancies_with_keyword: {ilike_seconds * 1000:.1f} мс, '
+          f'search_vacancies: {fts_seconds * 1000:.1f} мс')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер поиска по названию вакансии')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--keyword', default='Kotlin')
+    args = parser.parse_args()
+
+    params = reset_schema(SCHEMA)
+    drop_search_indexes(params)
+    fill_synthetic(params, args.rows)
+    run_queries(params, args.keyword, 'Без индексов')
+
+    _, build_seconds = timed(create_tables, params)
+    print(f'\nИндексы построены за {build_seconds:.1f} c')
+    conn = psycopg2.connect(**params)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE vacancies;")
+    conn.close()
+    run_queries(params, args.keyword, 'С индексами')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# bench_stats.py - Агрегаты DBManager: пересчет по таблице против материализованных представлений
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.bench_stats --rows 2000000
+
+import argparse
+
+from benchmarks.common import fill_synthetic, reset_schema, timed
+from db import DBManager, refresh_stats
+
+
+SCHEMA = 'bench_stats'
+
+QUERIES = ['get_companies_and_vacancies_count', 'get_avg_salary', 'get_vacancies_with_higher_salary']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер агрегатов с кэшем и без')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--employers', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    params = reset_schema(SCHEMA)
+    fill_synthetic(params, args.rows, args.employers)
+
+    with DBManager(params) as db_manager:
+        _, refresh_seconds = timed(refresh_stats, db_manager)
+        print(f'refresh_stats: {refresh_seconds:.2f} c')
+
+        for name in QUERIES:
+            method = getattr(db_manager, name)
+            for cached in (False, True):
+                best = min(timed(method, cached=cached)[1] for _ in range(args.repeat))
+                label = 'кэш' if cached else 'пересчет'
+                print(f'{name:>35} ({label:>8}): {best * 1000:8.1f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# bench_write.py - Сравнение скорости записи вакансий: построчно, execute_values и COPY
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.bench_write --rows 100000
+
+import argparse
+
+from benchmarks.common import reset_schema, timed
+from benchmarks.synthetic import make_vacancy
+from db import WRITE_MODES, save_employers_to_db, save_vacancies_to_db
+
+
+SCHEMA = 'bench_write'
+
+
+def make_companies(rows, employers):
+    """Генерирует компании с вакансиями, всего `rows` вакансий."""
+    per_employer = max(1, rows // employers)
+    return [
+        {'id': str(employer_id), 'name': f'Компания {employer_id}', 'alternate_url': '',
+         'vacancies': [make_vacancy(employer_id, number) for number in range(per_employer)]}
+        for employer_id in range(1, employers + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер скорости записи вакансий')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--employers', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--modes', nargs='+', default=list(WRITE_MODES), choices=WRITE_MODES)
+    args = parser.parse_args()
+
+    companies = make_companies(args.rows, args.employers)
+    total = sum(len(company['vacancies']) for company in companies)
+
+    for mode in args.modes:
+        params = reset_schema(SCHEMA)
+        save_employers_to_db(companies, params)
+        _, seconds = timed(save_vacancies_to_db, companies, params, mode=mode, batch_size=args.batch_size)
+        print(f'{mode:>5}: {total} строк за {seconds:.2f} c, {total / seconds:,.0f} строк/с')
+
+
+if __name__ == '__main__':
+    main()
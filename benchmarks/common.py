@@ -0,0 +1,125 @@
+# common.py - Общие помощники для замеров на локальном PostgreSQL
+
+import time
+
+import psycopg2
+
+from benchmarks.synthetic import SYNTHETIC_LEVELS, SYNTHETIC_SKILLS, SYNTHETIC_TITLES
+from db import db_params, create_tables
+from exchange_rates import get_rates, store_rates
+
+
+def bench_params(schema):
+    """
+    Параметры подключения, при которых все таблицы создаются в отдельной схеме.
+
+    Args:
+        schema (str): Имя схемы для замера.
+
+    Returns:
+        dict: Копия db_params с search_path на эту схему.
+    """
+    params = db_params.copy()
+    params['options'] = f'-c search_path={schema},public'
+    return params
+
+
+def reset_schema(schema):
+    """
+    Пересоздает схему замера с пустыми таблицами.
+
+    Args:
+        schema (str): Имя схемы.
+
+    Returns:
+        dict: Параметры подключения к этой схеме.
+    """
+    conn = psycopg2.connect(**db_params)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE;')
+        cur.execute(f'CREATE SCHEMA {schema};')
+    conn.close()
+
+    params = bench_params(schema)
+    create_tables(params)
+    return params
+
+
+def fill_synthetic(params, vacancies, employers=1000):
+    """
+    Заполняет таблицы синтетическими данными средствами самого PostgreSQL
+    (generate_series), чтобы миллионы строк создавались за секунды.
+
+    Args:
+        params (dict): Параметры подключения к схеме замера.
+        vacancies (int): Число вакансий.
+        employers (int): Число работодателей.
+    """
+    conn = psycopg2.connect(**params)
+    with conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO employers (employer_id, employer_name, employer_url, open_vacancies)
+            SELECT g, 'Компания ' || g, 'https://hh.ru/employer/' || g, 0
+            FROM generate_series(1, %s) g;
+        """, (employers,))
+        # Зарплата в рублях - по тем же курсам, что и при записи через db.vacancy_to_row
+        store_rates(cur, get_rates())
+        cur.execute("""
+            INSERT INTO vacancies (vacancy_id, employer_id, title, salary_from, salary_to, salary_currency, url,
+                                   published_at, salary_from_rub, salary_to_rub)
+            SELECT s.*, round(s.salary_from * r.rate)::integer, round(s.salary_to * r.rate)::integer
+            FROM (
+                SELECT g,
+                       1 + g %% %s,
+                       trim((%s::text[])[1 + (g / 7) %% %s] || ' ' || (%s::text[])[1 + g %% %s])
+                           || ' (' || (%s::text[])[1 + (g / 13) %% %s] || ')',
+                       CASE WHEN g %% 5 < 2 THEN NULL ELSE 30000 + (g::bigint * 7919) %% 300000 END AS salary_from,
+                       CASE WHEN g %% 3 = 0 THEN NULL ELSE 60000 + (g::bigint * 104729) %% 400000 END AS salary_to,
+                       CASE WHEN g %% 5 < 2 AND g %% 3 = 0 THEN NULL
+                            ELSE (ARRAY['RUR', 'RUR', 'RUR', 'RUR', 'USD', 'KZT', 'EUR'])[1 + g %% 7]
+                       END AS salary_currency,
+                       'https://hh.ru/vacancy/' || g,
+                       now() - make_interval(mins => ((g::bigint * 7) %% (2 * 365 * 24 * 60))::int)
+                FROM generate_series(1, %s) g
+            ) s
+            LEFT JOIN exchange_rates r ON r.currency = s.salary_currency;
+        """, (employers, SYNTHETIC_LEVELS, len(SYNTHETIC_LEVELS),
+              SYNTHETIC_TITLES, len(SYNTHETIC_TITLES),
+              SYNTHETIC_SKILLS, len(SYNTHETIC_SKILLS), vacancies))
+        cur.execute("ANALYZE employers;")
+        cur.execute("ANALYZE vacancies;")
+    conn.close()
+
+
+def explain(params, sql_query, args=()):
+    """
+    Возвращает план запроса EXPLAIN (ANALYZE, BUFFERS) одной строкой на узел.
+
+    Args:
+        params (dict): Параметры подключения.
+        sql_query (str): Запрос.
+        args (tuple): Параметры запроса.
+
+    Returns:
+        str: Текст плана.
+    """
+    conn = psycopg2.connect(**params)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql_query, args)
+            return '\n'.join(row[0] for row in cur.fetchall())
+    finally:
+        conn.close()
+
+
+def timed(func, *args, **kwargs):
+    """
+    Выполняет функцию и замеряет время.
+
+    Returns:
+        tuple: (результат, секунды).
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
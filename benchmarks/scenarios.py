@@ -0,0 +1,276 @@
+# scenarios.py - Сквозной набор замеров сбора, записи и запросов DBManager
+#
+# Для каждого масштаба (10k, 1m, 10m вакансий) пересоздает схему, пишет
+# синтетические данные через save_employers_to_db и save_vacancies_to_db,
+# затем замеряет каждый запрос DBManager. Сбор через get_company_data мерится
+# отдельно на локальной заглушке API. Результаты сохраняются в JSON, чтобы
+# сравнивать версии: с --baseline печатаются замедления больше --tolerance,
+# и код возврата становится 1.
+#
+# Нужен локальный PostgreSQL с параметрами из .env.
+# Запуск: python -m benchmarks.scenarios --scales 10k 1m --output bench.json
+#         python -m benchmarks.scenarios --scales 10k --baseline bench.json
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import api_HH
+from benchmarks.common import reset_schema, timed
+from benchmarks.stub_hh import start_stub_server
+from benchmarks.synthetic import SYNTHETIC_SKILLS, iter_companies, iter_employers
+from db import DBManager, WRITE_MODES, iter_vacancy_rows, refresh_stats, save_employers_to_db, save_vacancies_to_db
+from migrations import migrate
+
+
+SCHEMA = 'bench_scenarios'
+
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Запросы DBManager: (имя в результатах, метод, аргументы, читает ли всю таблицу в память)
+QUERY_SCENARIOS = [
+    ('get_companies_and_vacancies_count', 'get_companies_and_vacancies_count', {}, False),
+    ('get_companies_and_vacancies_count[live]', 'get_companies_and_vacancies_count', {'cached': False}, False),
+    ('get_all_vacancies', 'get_all_vacancies', {}, True),
+    ('get_vacancies_with_salary', 'get_vacancies_with_salary', {}, True),
+    ('get_avg_salary', 'get_avg_salary', {}, False),
+    ('get_avg_salary[live]', 'get_avg_salary', {'cached': False}, False),
+    ('get_vacancies_with_higher_salary', 'get_vacancies_with_higher_salary', {}, True),
+    ('get_vacancies_with_keyword', 'get_vacancies_with_keyword', {'keyword': 'Python', 'limit': 100}, False),
+    ('search_vacancies', 'search_vacancies', {'query': SYNTHETIC_SKILLS[0], 'limit': 50}, False),
+    ('iter_all_vacancies', 'iter_all_vacancies', {}, False),
+    ('iter_vacancies_with_salary', 'iter_vacancies_with_salary', {}, False),
+    ('iter_vacancies_with_higher_salary', 'iter_vacancies_with_higher_salary', {}, False),
+]
+
+# Выше этого числа строк запросы, читающие всю таблицу в список, пропускаются:
+# 10 млн кортежей не помещаются в память обычной машины (есть iter_* варианты)
+DEFAULT_MATERIALIZE_LIMIT = 1_000_000
+
+# Замеры короче этого при сравнении с базовым прогоном не учитываются: шум больше разницы
+MIN_COMPARED_SECONDS = 0.005
+
+
+def parse_scale(value):
+    """'10k', '1m', '10m' или просто число строк."""
+    if value.lower() in SCALES:
+        return value.lower(), SCALES[value.lower()]
+    return value, int(value)
+
+
+def result(scenario, scale, seconds, rows=None, **extra):
+    """Одна запись результата."""
+    entry = {'scenario': scenario, 'scale': scale, 'seconds': round(seconds, 6)}
+    if rows is not None:
+        entry['rows'] = rows
+        entry['rows_per_sec'] = round(rows / seconds, 1) if seconds else None
+    entry.update(extra)
+    return entry
+
+
+def bench_fetch(employers, vacancies_per_employer, latency, concurrency):
+    """
+    Замер get_company_data (и обхода страниц вакансий) на локальной заглушке API.
+
+    Returns:
+        list: Результаты 'get_company_data' и 'iter_vacancies'.
+    """
+    server, base_url = start_stub_server(latency=latency, vacancies_per_employer=vacancies_per_employer,
+                                         skewed=True)
+    previous_api = api_HH.HH_API
+    api_HH.HH_API = base_url
+    api_HH.configure_scheduler(rate=100000)
+    ids = list(range(1, employers + 1))
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies = []
+            start = time.perf_counter()
+            for employer_id in ids:
+                _, seconds = timed(api_HH.get_company_data, employer_id)
+                latencies.append(seconds)
+            sequential_time = time.perf_counter() - start
+
+            companies, concurrent_time = timed(api_HH.get_companies_data, ids, concurrency)
+
+            vacancies = 0
+            start = time.perf_counter()
+            for company in companies:
+                vacancies += sum(1 for _ in api_HH.iter_vacancies(company))
+            pages_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        api_HH.HH_API = previous_api
+        api_HH.configure_scheduler()
+
+    latencies.sort()
+    return [
+        result('get_company_data', None, sequential_time, employers,
+               p50_ms=round(statistics.median(latencies) * 1000, 3),
+               p99_ms=round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3)),
+        result('get_companies_data', None, concurrent_time, employers, concurrency=concurrency),
+        result('iter_vacancies', None, pages_time, vacancies),
+    ]
+
+
+def bench_load(scale, rows, vacancies_per_employer, mode, batch_size):
+    """
+    Пересоздает схему и замеряет запись синтетических данных.
+
+    Returns:
+        tuple: (параметры подключения к схеме, список результатов).
+    """
+    params = reset_schema(SCHEMA)
+    migrate(params)
+    employers = -(-rows // vacancies_per_employer)
+
+    # Сколько из времени записи уходит на сам генератор и разбор вакансий в строки
+    rows_iter = iter_vacancy_rows(iter_companies(rows, vacancies_per_employer))
+    generated, generate_time = timed(sum, (1 for _ in rows_iter))
+
+    _, employers_time = timed(save_employers_to_db, iter_employers(rows, vacancies_per_employer),
+                              params, mode, batch_size)
+    _, vacancies_time = timed(save_vacancies_to_db, iter_companies(rows, vacancies_per_employer),
+                              params, mode, batch_size)
+    _, stats_time = timed(refresh_stats, params)
+    return params, [
+        result('generate_vacancies', scale, generate_time, generated),
+        result('save_employers_to_db', scale, employers_time, employers, mode=mode),
+        result('save_vacancies_to_db', scale, vacancies_time, rows, mode=mode),
+        result('refresh_stats', scale, stats_time),
+    ]
+
+
+def bench_queries(params, scale, rows, repeat, materialize_limit):
+    """
+    Замеряет каждый запрос DBManager (лучшее и медианное время из repeat попыток).
+
+    Returns:
+        list: Результаты запросов.
+    """
+    results = []
+    with DBManager(params) as db_manager:
+        for scenario, method_name, kwargs, materializes in QUERY_SCENARIOS:
+            if materializes and rows > materialize_limit:
+                results.append({'scenario': scenario, 'scale': scale, 'skipped': 'materialize_limit'})
+                continue
+
+            method = getattr(db_manager, method_name)
+            if method_name.startswith('iter_'):
+                def call():
+                    return sum(1 for _ in method(**kwargs))
+            else:
+                def call():
+                    return method(**kwargs)
+
+            times = []
+            returned = None
+            for _ in range(repeat):
+                value, seconds = timed(call)
+                times.append(seconds)
+                # Число строк для списков и iter_*; для одного значения (средняя зарплата) - нет
+                if isinstance(value, list):
+                    returned = len(value)
+                elif method_name.startswith('iter_'):
+                    returned = value
+            results.append(result(scenario, scale, min(times), returned,
+                                  median_seconds=round(statistics.median(times), 6)))
+    return results
+
+
+def environment():
+    """Сведения о версии кода и окружении для сравнения прогонов."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Сравнивает результаты с сохраненным прогоном.
+
+    Returns:
+        list: Строки с описанием замедлений больше tolerance.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(entry['scenario'], entry['scale']): entry for entry in json.load(f)['results']}
+
+    regressions = []
+    for entry in results:
+        old = baseline.get((entry['scenario'], entry['scale']))
+        if not old or 'seconds' not in entry or old.get('seconds', 0) < MIN_COMPARED_SECONDS:
+            continue
+        ratio = entry['seconds'] / old['seconds']
+        if ratio > 1 + tolerance:
+            regressions.append(f"{entry['scenario']} [{entry['scale']}]: "
+                               f"{old['seconds']:.4f} c -> {entry['seconds']:.4f} c (x{ratio:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры сбора, записи и запросов на синтетических данных')
+    parser.add_argument('--scales', nargs='+', default=['10k', '1m'], help="10k, 1m, 10m или число строк")
+    parser.add_argument('--vacancies-per-employer', type=int, default=100)
+    parser.add_argument('--mode', choices=WRITE_MODES, default='copy')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--materialize-limit', type=int, default=DEFAULT_MATERIALIZE_LIMIT)
+    parser.add_argument('--fetch-employers', type=int, default=200, help='0 - не мерить сбор')
+    parser.add_argument('--fetch-latency', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=api_HH.DEFAULT_CONCURRENCY)
+    parser.add_argument('--output', help='Куда сохранить результаты (JSON)')
+    parser.add_argument('--baseline', help='Прошлый результат для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = []
+    if args.fetch_employers:
+        print(f'📊 Сбор: {args.fetch_employers} работодателей с заглушки API')
+        results.extend(bench_fetch(args.fetch_employers, args.vacancies_per_employer, args.fetch_latency,
+                                   args.concurrency))
+
+    for scale, rows in map(parse_scale, args.scales):
+        print(f'📊 Масштаб {scale}: {rows:,} вакансий')
+        params, load_results = bench_load(scale, rows, args.vacancies_per_employer, args.mode, args.batch_size)
+        results.extend(load_results)
+        results.extend(bench_queries(params, scale, rows, args.repeat, args.materialize_limit))
+
+    for entry in results:
+        if 'skipped' in entry:
+            print(f"{entry['scenario']:>42} [{entry['scale']}]: пропущен ({entry['skipped']})")
+            continue
+        speed = f" {entry['rows_per_sec']:>14,.0f} строк/с" if entry.get('rows_per_sec') else ''
+        print(f"{entry['scenario']:>42} [{entry['scale'] or '-'}]: {entry['seconds'] * 1000:10.1f} мс{speed}")
+
+    report = {'environment': environment(), 'arguments': vars(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'✅ Результаты сохранены в {args.output}')
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f'⚠️ Замедление: {line}')
+        if regressions:
+            sys.exit(1)
+        print('✅ Замедлений относительно базового прогона нет')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+# stub_hh.py - Локальная заглушка API hh.ru для замеров и ручной проверки
+
+import hashlib
+import json
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import (
+    SYNTHETIC_AREA_TREE, SYNTHETIC_AREAS, SYNTHETIC_INDUSTRIES, employer_area, employer_industry, employer_vacancy_count, make_employer,
+    make_vacancy,
+)
+
+
+EMPLOYER_PATH = re.compile(r'^/employers/(\d+)$')
+
+# HH отдает не больше 2000 результатов одного поиска: дальше - ошибка 400
+MAX_SEARCH_DEPTH = 2000
+
+# Сколько работодателей находит поиск, если у заглушки не задано employers
+DEFAULT_SEARCH_EMPLOYERS = 10000
+
+
+class StubHHHandler(BaseHTTPRequestHandler):
+    """Отвечает на запросы так же, как api.hh.ru, но из памяти."""
+
+    protocol_version = 'HTTP/1.1'  # Нужен для keep-alive соединений
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY каждый ответ ждет
+    # отложенного ACK клиента (~40 мс), и замер показывает его, а не клиента
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.request_count += 1
+            throttled = self._over_rate_limit()
+        time.sleep(self.server.latency)
+        if throttled:
+            self.server.throttled_count += 1
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        match = EMPLOYER_PATH.match(url.path)
+        if match:
+            self._send_employer(match.group(1))
+        elif url.path == '/vacancies' and 'employer_id' in query:
+            self._send_vacancies(query)
+        elif url.path == '/vacancies':
+            self._send_vacancy_search(query)
+        elif url.path == '/employers':
+            self._send_employer_search(query)
+        elif url.path == '/areas':
+            self._send_json(200, self._area_tree())
+        elif url.path == '/industries':
+            self._send_json(200, [{'id': industry_id, 'name': name, 'industries': []}
+                                  for industry_id, name in SYNTHETIC_INDUSTRIES])
+        else:
+            self._send_json(404, {'errors': [{'type': 'not_found'}]})
+
+    def _over_rate_limit(self):
+        """Как HH: больше rate_limit запросов за последнюю секунду - ответ 429."""
+        if not self.server.rate_limit:
+            return False
+        now = time.monotonic()
+        recent = self.server.recent_requests
+        while recent and now - recent[0] > 1.0:
+            recent.popleft()
+        if len(recent) >= self.server.rate_limit:
+            return True
+        recent.append(now)
+        return False
+
+    def _vacancy_count(self, employer_id):
+        if self.server.skewed:
+            return employer_vacancy_count(int(employer_id), self.server.vacancies_per_employer, self.server.seed)
+        return self.server.vacancies_per_employer
+
+    def _send_employer(self, employer_id):
+        if self.server.employers and int(employer_id) > self.server.employers:
+            self._send_json(404, {'errors': [{'type': 'not_found'}]})
+            return
+        base_url = f'http://{self.headers.get("Host")}/'
+        self._send_json(200, make_employer(employer_id, self._vacancy_count(employer_id), base_url, self.server.seed))
+
+    def _send_vacancies(self, query):
+        employer_id = query['employer_id']
+        page = int(query.get('page', 0))
+        per_page = int(query.get('per_page', 20))
+        found = self._vacancy_count(employer_id)
+        first = page * per_page
+        if first + per_page > MAX_SEARCH_DEPTH:
+            self._send_json(400, {'errors': [{'type': 'bad_argument', 'value': 'page'}]})
+            return
+        items = [
+            make_vacancy(employer_id, number, self.server.seed)
+            for number in range(first, min(first + per_page, found))
+        ]
+        self._send_json(200, {
+            'items': items,
+            'found': found,
+            'page': page,
+            'pages': (min(found, MAX_SEARCH_DEPTH) + per_page - 1) // per_page,
+            'per_page': per_page,
+        })
+
+    def _search_employers(self, area, industry):
+        """
+        ID работодателей, подходящих под фильтры поиска, по возрастанию.
+        Область-родитель включает дочерние, как на hh.ru.
+        """
+        key = (area, industry)
+        with self.server.lock:
+            found = self.server.search_results.get(key)
+        if found is not None:
+            return found
+        seed = self.server.seed
+        children = {area_id: [area_id] for area_id, _ in SYNTHETIC_AREAS}
+        for parent_id, _, child_ids in SYNTHETIC_AREA_TREE:
+            children[parent_id] = children.get(parent_id, []) + child_ids
+        areas = set(children.get(area, [area])) if area else None
+        found = [
+            employer_id for employer_id in range(1, (self.server.employers or DEFAULT_SEARCH_EMPLOYERS) + 1)
+            if (areas is None or employer_area(employer_id, seed)[0] in areas)
+            and (not industry or employer_industry(employer_id, seed)[0] == industry)
+        ]
+        with self.server.lock:
+            self.server.search_results[key] = found
+        return found
+
+    def _search_page(self, query):
+        """Номер и размер страницы поиска или None, если страница глубже MAX_SEARCH_DEPTH."""
+        page = int(query.get('page', 0))
+        per_page = int(query.get('per_page', 20))
+        if (page + 1) * per_page > MAX_SEARCH_DEPTH:
+            self._send_json(400, {'errors': [{'type': 'bad_argument', 'value': 'page'}]})
+            return None
+        return page, per_page
+
+    def _send_search_page(self, items, found, page, per_page):
+        self._send_json(200, {
+            'items': items,
+            'found': found,
+            'page': page,
+            'pages': (min(found, MAX_SEARCH_DEPTH) + per_page - 1) // per_page,
+            'per_page': per_page,
+        })
+
+    def _send_employer_search(self, query):
+        # only_with_vacancies не проверяется: у синтетических работодателей вакансии есть всегда
+        employer_ids = self._search_employers(query.get('area'), query.get('industry'))
+        page = self._search_page(query)
+        if page is None:
+            return
+        page, per_page = page
+        base_url = f'http://{self.headers.get("Host")}/'
+        items = [make_employer(employer_id, self._vacancy_count(employer_id), base_url, self.server.seed)
+                 for employer_id in employer_ids[page * per_page:(page + 1) * per_page]]
+        self._send_search_page(items, len(employer_ids), page, per_page)
+
+    def _send_vacancy_search(self, query):
+        """Поиск вакансий: вакансии подходящих работодателей подряд, работодатель за работодателем."""
+        employer_ids = self._search_employers(query.get('area'), query.get('industry'))
+        # Сколько вакансий до конца каждого работодателя: страница находится бинарным поиском
+        ends = list(accumulate(self._vacancy_count(employer_id) for employer_id in employer_ids))
+        found = ends[-1] if ends else 0
+        page = self._search_page(query)
+        if page is None:
+            return
+        page, per_page = page
+        items = []
+        for position in range(page * per_page, min((page + 1) * per_page, found)):
+            index = bisect_right(ends, position)
+            number = position - (ends[index - 1] if index else 0)
+            items.append(make_vacancy(employer_ids[index], number, self.server.seed))
+        self._send_search_page(items, found, page, per_page)
+
+    def _area_tree(self):
+        """Дерево областей в формате GET /areas."""
+        names = dict(SYNTHETIC_AREAS)
+        return [
+            {'id': parent_id, 'parent_id': None, 'name': parent_name,
+             'areas': [{'id': area_id, 'parent_id': parent_id, 'name': names[area_id], 'areas': []}
+                       for area_id in child_ids]}
+            for parent_id, parent_name, child_ids in SYNTHETIC_AREA_TREE
+        ]
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем вывод замеров логами каждого запроса
+
+
+def start_stub_server(latency=0.0, port=0, vacancies_per_employer=0, rate_limit=0, skewed=False, employers=0,
+                      seed=0):
+    """
+    Запускает заглушку API в фоновом потоке.
+
+    Args:
+        latency (float): Искусственная задержка ответа в секундах.
+        port (int): Порт (0 - выбрать свободный).
+        vacancies_per_employer (int): Сколько вакансий отдавать каждому работодателю.
+        rate_limit (int): Сколько запросов в секунду обслуживать до ответов 429 (0 - без лимита).
+        skewed (bool): Разное число вакансий у работодателей, в среднем vacancies_per_employer.
+        employers (int): Работодатели с ID больше этого отвечают 404 (0 - есть любой ID).
+        seed (int): Зерно генератора синтетических данных (см. benchmarks.synthetic).
+
+    Returns:
+        tuple: (сервер, базовый URL вида 'http://127.0.0.1:port/').
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHHHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.vacancies_per_employer = vacancies_per_employer
+    server.skewed = skewed
+    server.employers = employers
+    server.seed = seed
+    server.request_count = 0  # Сколько запросов дошло до сервера
+    server.lock = threading.Lock()
+    server.rate_limit = rate_limit
+    server.recent_requests = deque()
+    server.throttled_count = 0
+    server.search_results = {}  # (область, отрасль) -> ID работодателей
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
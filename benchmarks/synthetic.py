@@ -0,0 +1,243 @@
+# synthetic.py - Синтетические работодатели и вакансии в формате API hh.ru
+#
+# Данные детерминированы: одна и та же пара (работодатель, номер вакансии)
+# при одном seed всегда дает одну и ту же вакансию. Поэтому заглушка API может
+# отдавать любую страницу без хранения данных, а замеры разных версий кода
+# работают с одинаковыми данными. Распределения похожи на реальные: у части
+# вакансий нет зарплаты или одной из границ, есть валютные вакансии, названия
+# на русском и английском, у немногих работодателей много вакансий.
+
+# Словари для синтетических вакансий в духе hh.ru
+SYNTHETIC_TITLES = [
+    'Python-разработчик', 'Java-разработчик', 'Аналитик данных', 'Data Engineer',
+    'Менеджер проектов', 'Бухгалтер', 'Водитель-экспедитор', 'Frontend developer',
+    'Тестировщик', 'Системный администратор', 'Продавец-консультант', 'DevOps-инженер',
+]
+SYNTHETIC_LEVELS = ['', 'Junior', 'Middle', 'Senior', 'Ведущий', 'Стажер']
+SYNTHETIC_SKILLS = [
+    'Python', 'Django', 'FastAPI', 'Java', 'Spring', 'Kotlin', 'Go', 'Rust', 'C++', 'C#',
+    '1С', 'SQL', 'PostgreSQL', 'ClickHouse', 'Kafka', 'Spark', 'Airflow', 'React', 'Vue',
+    'Angular', 'TypeScript', 'PHP', 'Laravel', 'Ruby', 'Scala', 'Swift', 'Flutter',
+    'Kubernetes', 'Terraform', 'Ansible', 'Linux', 'Excel', 'SAP', 'Битрикс', 'Power BI',
+    'Tableau', 'Figma', 'Photoshop', 'AutoCAD', 'Revit',
+]
+SYNTHETIC_COMPANY_WORDS = [
+    'Альфа', 'Вектор', 'Горизонт', 'Северсталь', 'Техно', 'Инфо', 'Логистик', 'Ритейл',
+    'Финанс', 'Строй', 'Digital', 'Soft', 'Group', 'Сервис', 'Медиа', 'Агро',
+]
+SYNTHETIC_COMPANY_FORMS = ['ООО', 'АО', 'ПАО', 'ИП', '']
+
+# (код валюты, доля вакансий из 100, множитель к рублевой зарплате)
+SYNTHETIC_CURRENCIES = [
+    ('RUR', 88, 1.0),
+    ('KZT', 5, 5.5),
+    ('USD', 3, 0.011),
+    ('EUR', 2, 0.01),
+    ('BYR', 1, 0.035),
+    ('UZS', 1, 140.0),
+]
+SYNTHETIC_AREAS = [('1', 'Москва'), ('2', 'Санкт-Петербург'), ('4', 'Новосибирск'), ('88', 'Казань'),
+                   ('3', 'Екатеринбург'), ('160', 'Алматы'), ('1002', 'Минск'), ('113', 'Россия')]
+# Области поиска HH вложены: вакансии и работодатели области-родителя включают дочерние
+SYNTHETIC_AREA_TREE = [('113', 'Россия', ['1', '2', '4', '88', '3']), ('40', 'Казахстан', ['160']),
+                       ('16', 'Беларусь', ['1002'])]
+SYNTHETIC_INDUSTRIES = [('7', 'Информационные технологии'), ('41', 'Розничная торговля'),
+                        ('43', 'Финансовый сектор'), ('19', 'Строительство'), ('27', 'Транспорт, логистика'),
+                        ('36', 'Производство')]
+SYNTHETIC_SCHEDULES = [('fullDay', 'Полный день'), ('remote', 'Удаленная работа'),
+                       ('flexible', 'Гибкий график'), ('shift', 'Сменный график')]
+SYNTHETIC_EXPERIENCE = [('noExperience', 'Нет опыта'), ('between1And3', 'От 1 года до 3 лет'),
+                        ('between3And6', 'От 3 до 6 лет'), ('moreThan6', 'Более 6 лет')]
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(*values):
+    """
+    Детерминированный 64-битный хэш нескольких целых (splitmix64).
+    В десятки раз дешевле random.Random на каждую вакансию.
+    """
+    state = 0x9E3779B97F4A7C15
+    for value in values:
+        state = (state ^ (value & _MASK)) * 0xBF58476D1CE4E5B9 & _MASK
+        state = (state ^ (state >> 31)) * 0x94D049BB133111EB & _MASK
+        state ^= state >> 29
+    return state
+
+
+def _currency(bits):
+    share = bits % 100
+    for code, weight, rate in SYNTHETIC_CURRENCIES:
+        if share < weight:
+            return code, rate
+        share -= weight
+    return SYNTHETIC_CURRENCIES[0][0], SYNTHETIC_CURRENCIES[0][2]
+
+
+def employer_vacancy_count(employer_id, average, seed=0):
+    """
+    Число открытых вакансий работодателя: у большинства мало, у немногих - много,
+    в среднем около average.
+
+    Args:
+        employer_id (int): ID работодателя.
+        average (int): Среднее число вакансий на работодателя.
+        seed (int): Зерно генератора.
+
+    Returns:
+        int: Число вакансий (не меньше 1).
+    """
+    # Квадрат равномерной величины на [0, 1) дает перекос к малым значениям
+    # со средним 1/3 - растягиваем до нужного среднего
+    uniform = (_mix(seed, employer_id, 0xE) % 10000) / 10000
+    return max(1, int(round(3 * average * uniform * uniform)))
+
+
+def employer_name(employer_id, seed=0):
+    """Название работодателя вида 'ООО «Вектор 42»'."""
+    bits = _mix(seed, int(employer_id), 0xC)
+    form = SYNTHETIC_COMPANY_FORMS[bits % len(SYNTHETIC_COMPANY_FORMS)]
+    word = SYNTHETIC_COMPANY_WORDS[(bits >> 8) % len(SYNTHETIC_COMPANY_WORDS)]
+    return f'{form} «{word} {employer_id}»' if form else f'{word} {employer_id}'
+
+
+def employer_area(employer_id, seed=0):
+    """Область работодателя: (ID, название) из SYNTHETIC_AREAS."""
+    bits = _mix(seed, int(employer_id), 0xC)
+    return SYNTHETIC_AREAS[(bits >> 16) % len(SYNTHETIC_AREAS)]
+
+
+def employer_industry(employer_id, seed=0):
+    """Отрасль работодателя: (ID, название) из SYNTHETIC_INDUSTRIES."""
+    bits = _mix(seed, int(employer_id), 0xC)
+    return SYNTHETIC_INDUSTRIES[(bits >> 32) % len(SYNTHETIC_INDUSTRIES)]
+
+
+def make_employer(employer_id, open_vacancies=0, base_url='https://api.hh.ru/', seed=0):
+    """
+    Строит работодателя в формате ответа GET /employers/{id}.
+
+    Args:
+        employer_id (int | str): ID работодателя.
+        open_vacancies (int): Значение поля 'open_vacancies'.
+        base_url (str): Адрес API для поля 'vacancies_url'.
+        seed (int): Зерно генератора.
+
+    Returns:
+        dict: Работодатель.
+    """
+    bits = _mix(seed, int(employer_id), 0xC)
+    name = employer_name(employer_id, seed)
+    area_id, area_name = employer_area(employer_id, seed)
+    industry_id, industry_name = employer_industry(employer_id, seed)
+    return {
+        'id': str(employer_id),
+        'name': name,
+        'type': 'company',
+        'description': f'<p>{name} - работодатель на hh.ru.</p>',
+        'site_url': f'https://example-{employer_id}.ru',
+        'alternate_url': f'https://hh.ru/employer/{employer_id}',
+        'vacancies_url': f'{base_url}vacancies?employer_id={employer_id}',
+        'area': {'id': area_id, 'name': area_name},
+        'industries': [{'id': industry_id, 'name': industry_name}],
+        'trusted': bool(bits >> 24 & 1),
+        'open_vacancies': open_vacancies,
+    }
+
+
+def make_vacancy(employer_id, number, seed=0):
+    """
+    Строит вакансию в формате элемента 'items' ответа GET /vacancies.
+
+    Args:
+        employer_id (int | str): ID работодателя.
+        number (int): Порядковый номер вакансии у работодателя.
+        seed (int): Зерно генератора.
+
+    Returns:
+        dict: Вакансия.
+    """
+    vacancy_id = f'{employer_id}{number:06d}'
+    bits = _mix(seed, int(employer_id), number)
+
+    level = SYNTHETIC_LEVELS[bits % len(SYNTHETIC_LEVELS)]
+    title = SYNTHETIC_TITLES[(bits >> 4) % len(SYNTHETIC_TITLES)]
+    skill = SYNTHETIC_SKILLS[(bits >> 8) % len(SYNTHETIC_SKILLS)]
+    name = f'{level} {title} ({skill})'.strip()
+
+    # Как на hh.ru: примерно у 40% вакансий зарплата не указана,
+    # у остальных часто есть только нижняя или только верхняя граница
+    salary = None
+    kind = (bits >> 16) % 10
+    if kind >= 4:
+        currency, rate = _currency(bits >> 20)
+        salary_from = 30000 + (bits >> 28) % 60 * 5000
+        salary_to = salary_from + 20000 + (bits >> 36) % 30 * 5000
+        salary = {
+            'from': None if kind == 9 else int(round(salary_from * rate, -2 if rate >= 1 else 0)),
+            'to': None if kind in (4, 5) else int(round(salary_to * rate, -2 if rate >= 1 else 0)),
+            'currency': currency,
+            'gross': bool(bits >> 44 & 1),
+        }
+
+    area_id, area_name = SYNTHETIC_AREAS[(bits >> 48) % len(SYNTHETIC_AREAS)]
+    schedule_id, schedule_name = SYNTHETIC_SCHEDULES[(bits >> 52) % len(SYNTHETIC_SCHEDULES)]
+    experience_id, experience_name = SYNTHETIC_EXPERIENCE[(bits >> 56) % len(SYNTHETIC_EXPERIENCE)]
+    day = 1 + (bits >> 40) % 28
+    return {
+        'id': vacancy_id,
+        'name': name,
+        'area': {'id': area_id, 'name': area_name},
+        'salary': salary,
+        'type': {'id': 'open', 'name': 'Открытая'},
+        'published_at': f'2025-05-{day:02d}T10:00:00+0300',
+        'created_at': f'2025-05-{day:02d}T10:00:00+0300',
+        'archived': False,
+        'alternate_url': f'https://hh.ru/vacancy/{vacancy_id}',
+        'employer': {'id': str(employer_id), 'name': employer_name(employer_id, seed)},
+        'snippet': {
+            'requirement': f'Опыт работы с {skill}. Знание <highlighttext>{skill}</highlighttext>.',
+            'responsibility': f'{title}: разработка и поддержка сервисов.',
+        },
+        'schedule': {'id': schedule_id, 'name': schedule_name},
+        'experience': {'id': experience_id, 'name': experience_name},
+    }
+
+
+def iter_companies(vacancies, vacancies_per_employer=100, seed=0, skewed=False):
+    """
+    Лениво генерирует компании с вакансиями в формате, который принимают
+    save_employers_to_db и save_vacancies_to_db. Вакансии компании - тоже
+    итератор, поэтому в памяти не держится больше одной компании.
+
+    Args:
+        vacancies (int): Сколько всего вакансий сгенерировать.
+        vacancies_per_employer (int): Вакансий на работодателя (в среднем при skewed=True).
+        seed (int): Зерно генератора.
+        skewed (bool): Разное число вакансий у работодателей (см. employer_vacancy_count).
+
+    Yields:
+        dict: Работодатель с ключом 'vacancies'.
+    """
+    employer_id = 0
+    remaining = vacancies
+    while remaining > 0:
+        employer_id += 1
+        count = employer_vacancy_count(employer_id, vacancies_per_employer, seed) if skewed else vacancies_per_employer
+        count = min(count, remaining)
+        remaining -= count
+        company = make_employer(employer_id, count, seed=seed)
+        company['vacancies'] = (make_vacancy(employer_id, number, seed) for number in range(count))
+        yield company
+
+
+def iter_employers(vacancies, vacancies_per_employer=100, seed=0, skewed=False):
+    """
+    Работодатели тех же компаний, что и в iter_companies, без вакансий.
+
+    Yields:
+        dict: Работодатель.
+    """
+    for company in iter_companies(vacancies, vacancies_per_employer, seed, skewed):
+        del company['vacancies']
+        yield company
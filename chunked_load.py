@@ -0,0 +1,407 @@
+# chunked_load.py - Загрузка больших объемов частями с контрольными точками
+#
+# save_vacancies_to_db и sync_vacancies_to_db пишут все одной транзакцией:
+# одна плохая строка откатывает всю загрузку, а долгая транзакция раздувает
+# WAL и держит блокировки. Здесь транзакция фиксируется каждые chunk_rows
+# вакансий (на границе страницы) или после каждого работодателя, и в той же
+# транзакции в load_checkpoints записывается, до какого работодателя и
+# страницы дошла загрузка. Строки, которые не удалось записать, уходят в
+# load_dead_letters вместо отката. Перезапущенная загрузка с тем же именем
+# задания пропускает все, что уже зафиксировано.
+
+import itertools
+import json
+import time
+
+import psycopg2
+import psycopg2.extras
+
+from api_HH import VACANCIES_PER_PAGE
+from db import (
+    acquire_connection, release_connection, mark_data_changed, upsert_changed_rows, batched, vacancy_list_complete,
+    employer_to_sync_row, vacancy_to_sync_row, SYNC_EMPLOYER_COLUMNS, SYNC_VACANCY_COLUMNS, DEFAULT_BATCH_SIZE,
+)
+from metrics import observe
+
+
+DEFAULT_CHUNK_ROWS = 5000   # Вакансий в одной транзакции
+
+# Первый ключ рекомендательной блокировки задания (второй - хэш имени задания):
+# одно задание не загружают два процесса сразу
+LOAD_LOCK_CLASS = 2342
+
+
+def create_load_tables(params):
+    """
+    Создает таблицы контрольных точек load_checkpoints и отложенных строк load_dead_letters.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+    """
+    conn = None
+    cur = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        # position - порядковый номер работодателя во входных данных,
+        # page - последняя зафиксированная страница его вакансий (-1 - еще ни одной)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS load_checkpoints (
+                job_name VARCHAR(255) PRIMARY KEY,
+                position BIGINT NOT NULL,
+                employer_id BIGINT,
+                page INTEGER NOT NULL,
+                rows_loaded BIGINT NOT NULL DEFAULT 0,
+                dead_letters BIGINT NOT NULL DEFAULT 0,
+                finished BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+        # Исходные данные хранятся текстом: в JSONB не пройдут как раз самые плохие строки
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS load_dead_letters (
+                id BIGSERIAL PRIMARY KEY,
+                job_name VARCHAR(255) NOT NULL,
+                kind VARCHAR(10) NOT NULL,
+                employer_id TEXT,
+                page INTEGER,
+                payload TEXT,
+                error TEXT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS load_dead_letters_job_name_idx ON load_dead_letters (job_name);
+        """)
+
+        conn.commit()
+        print("✅ Таблицы load_checkpoints и load_dead_letters созданы или уже существуют.")
+
+    except Exception as e:
+        print(f"❌ Ошибка при создании таблиц контрольных точек: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+
+def read_checkpoint(cur, job_name):
+    """
+    Возвращает контрольную точку задания.
+
+    Args:
+        cur: Курсор psycopg2.
+        job_name (str): Имя задания загрузки.
+
+    Returns:
+        dict: Поля load_checkpoints или None, если задание еще не запускалось.
+    """
+    cur.execute("""
+        SELECT position, employer_id, page, rows_loaded, dead_letters, finished, updated_at
+        FROM load_checkpoints WHERE job_name = %s;
+    """, (job_name,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip(('position', 'employer_id', 'page', 'rows_loaded', 'dead_letters', 'finished', 'updated_at'),
+                    row))
+
+
+def iter_company_pages(companies_data, per_page=VACANCIES_PER_PAGE):
+    """
+    Раскладывает компании (как для save_vacancies_to_db) по страницам вакансий для load_chunked.
+
+    Args:
+        companies_data (iterable): Словари компаний, в ключе 'vacancies' - список или итератор вакансий.
+        per_page (int): Вакансий на странице (как при загрузке из API).
+
+    Yields:
+        tuple: (ID работодателя, данные работодателя или None, итератор пар (страница, вакансии)).
+    """
+    for company_data in companies_data:
+        # Без названия это только ссылка на работодателя, а не его данные
+        employer = ({key: value for key, value in company_data.items() if key != 'vacancies'}
+                    if company_data.get('name') else None)
+        yield company_data.get('id'), employer, _iter_pages(company_data, employer, per_page)
+
+
+def _iter_pages(company_data, employer, per_page):
+    """Страницы вакансий компании; после последней копирует в employer признак полноты списка."""
+    yield from enumerate(batched(company_data.get('vacancies') or (), per_page))
+    # iter_vacancy_pages ставит 'vacancies_complete' только по ходу обхода
+    if employer is not None and 'vacancies_complete' in company_data:
+        employer['vacancies_complete'] = company_data['vacancies_complete']
+
+
+class _Chunk:
+    """Строки одной транзакции загрузки."""
+
+    def __init__(self):
+        self.employers = {}      # ID -> (строка, данные из API)
+        self.vacancies = []      # (строка, данные из API, ID работодателя, страница)
+        self.completed = []      # (ID работодателя, ID всех его вакансий) - для архивации
+        self.dead_letters = []   # (тип, ID работодателя, страница, данные, ошибка)
+
+
+def load_chunked(companies, params, job_name, chunk_rows=DEFAULT_CHUNK_ROWS, per_employer=False,
+                 archive_missing=True, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    Загружает работодателей и вакансии частями, с контрольными точками.
+
+    Новые строки вставляются, изменившиеся обновляются (как в sync_vacancies_to_db).
+    Строку, которую не удалось подготовить или записать, загрузка откладывает
+    в load_dead_letters и идет дальше. Если задание с тем же job_name уже
+    запускалось, работодатели и страницы до его контрольной точки пропускаются,
+    поэтому companies должны идти в том же порядке (например, из одного запуска staging).
+
+    Args:
+        companies (iterable): Тройки (ID работодателя, данные работодателя или None,
+                              пары (страница, вакансии)) - см. iter_company_pages.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        job_name (str): Имя задания загрузки (ключ контрольной точки).
+        chunk_rows (int): Фиксировать транзакцию, когда накопилось столько вакансий.
+        per_employer (bool): Фиксировать транзакцию после каждого работодателя.
+        archive_missing (bool): Помечать архивными вакансии работодателя, которых нет в данных;
+                                тогда у каждого работодателя должен быть полный список вакансий.
+                                Работодатели с обрезанным списком (см. db.vacancy_list_complete)
+                                не архивируются.
+        batch_size (int): Размер пачки записи.
+        restart (bool): Забыть контрольную точку и отложенные строки задания и загрузить все заново.
+
+    Returns:
+        dict: Итог загрузки ('rows', 'inserted', 'updated', 'archived', 'dead_letters', 'chunks', ...)
+              или None при ошибке.
+    """
+    conn = None
+    cur = None
+    locked = False
+    summary = None
+    counters = dict.fromkeys(('employers', 'skipped', 'rows', 'inserted', 'updated', 'archived', 'dead_letters',
+                              'chunks'), 0)
+    start = time.perf_counter()
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        cur.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s));", (LOAD_LOCK_CLASS, job_name))
+        locked = cur.fetchone()[0]
+        if not locked:
+            print(f"❌ Задание загрузки '{job_name}' уже выполняется другим процессом")
+            conn.rollback()
+            return None
+
+        if restart:
+            cur.execute("DELETE FROM load_checkpoints WHERE job_name = %s;", (job_name,))
+            cur.execute("DELETE FROM load_dead_letters WHERE job_name = %s;", (job_name,))
+        checkpoint = read_checkpoint(cur, job_name)
+        conn.commit()
+
+        if checkpoint and checkpoint['finished']:
+            print(f"ℹ️ Задание '{job_name}' уже загружено ({checkpoint['rows_loaded']} вакансий, "
+                  f"отложено {checkpoint['dead_letters']}); заново - с restart=True (--restart)")
+            return {'rows': checkpoint['rows_loaded'], 'dead_letters': checkpoint['dead_letters'], 'finished': True}
+        if checkpoint:
+            print(f"ℹ️ Продолжаем задание '{job_name}' с работодателя №{checkpoint['position']} "
+                  f"({checkpoint['employer_id']}) после страницы {checkpoint['page']}")
+            resume_position, resume_page = checkpoint['position'], checkpoint['page']
+            rows_total, dead_total = checkpoint['rows_loaded'], checkpoint['dead_letters']
+        else:
+            resume_position, resume_page = -1, -1
+            rows_total = dead_total = 0
+
+        chunk = _Chunk()
+        # Последнее, что войдет в контрольную точку: (номер работодателя, ID, страница)
+        last = (resume_position, checkpoint['employer_id'] if checkpoint else None, resume_page)
+
+        def flush(finished=False):
+            nonlocal chunk, rows_total, dead_total
+            started = time.perf_counter()
+            rows = len(chunk.vacancies) - _write_chunk(cur, chunk, counters, batch_size)
+            rows_total += rows
+            dead_total += len(chunk.dead_letters)
+            if chunk.dead_letters:
+                psycopg2.extras.execute_values(cur, """
+                    INSERT INTO load_dead_letters (job_name, kind, employer_id, page, payload, error) VALUES %s
+                """, [(job_name,) + dead_letter for dead_letter in chunk.dead_letters], page_size=batch_size)
+            # Контрольная точка фиксируется вместе со строками: после сбоя
+            # они либо обе есть в БД, либо обеих нет
+            cur.execute("""
+                INSERT INTO load_checkpoints (job_name, position, employer_id, page, rows_loaded, dead_letters,
+                                              finished)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (job_name) DO UPDATE
+                SET position = EXCLUDED.position, employer_id = EXCLUDED.employer_id, page = EXCLUDED.page,
+                    rows_loaded = EXCLUDED.rows_loaded, dead_letters = EXCLUDED.dead_letters,
+                    finished = EXCLUDED.finished, updated_at = now();
+            """, (job_name,) + last + (rows_total, dead_total, finished))
+            conn.commit()
+            if rows or chunk.employers or chunk.completed:
+                mark_data_changed(conn)
+            counters['rows'] += rows
+            counters['dead_letters'] += len(chunk.dead_letters)
+            counters['chunks'] += 1
+            observe('load_chunk', time.perf_counter() - started, {'table': 'vacancies'},
+                    rows=rows, dead_letters=len(chunk.dead_letters))
+            chunk = _Chunk()
+
+        for position, (employer_id, employer, pages) in enumerate(companies):
+            if position < resume_position:
+                counters['skipped'] += 1
+                continue
+            # Страницы до контрольной точки уже в БД, но их вакансии нужны для архивации
+            skip_through = resume_page if position == resume_position else None
+
+            try:
+                employer_key = int(employer_id)
+            except (TypeError, ValueError) as e:
+                if skip_through is None:
+                    chunk.dead_letters.append(('employer', _text(employer_id), None, _payload(employer), str(e)))
+                last = (position, None, -1)
+                continue
+            if skip_through is not None and checkpoint['employer_id'] not in (None, employer_key):
+                print(f"❌ Работодатель №{position} во входных данных ({employer_key}) не совпадает с контрольной "
+                      f"точкой ({checkpoint['employer_id']}): данные другие, начните заново (--restart)")
+                conn.rollback()
+                return None
+
+            if employer is not None and skip_through is None:
+                try:
+                    chunk.employers[employer_key] = (employer_to_sync_row(employer), employer)
+                except Exception as e:
+                    chunk.dead_letters.append(('employer', _text(employer_id), None, _payload(employer), str(e)))
+
+            counters['employers'] += 1
+            seen = []
+            page = skip_through if skip_through is not None else -1
+            for page, vacancies in pages:
+                skipped = skip_through is not None and page <= skip_through
+                for vacancy in vacancies:
+                    try:
+                        row = vacancy_to_sync_row(vacancy, employer_key)
+                        vacancy_key = int(row[0])
+                    except Exception as e:
+                        if not skipped:
+                            chunk.dead_letters.append(('vacancy', _text(employer_id), page, _payload(vacancy),
+                                                       str(e)))
+                        continue
+                    seen.append(vacancy_key)
+                    if not skipped:
+                        chunk.vacancies.append((row, vacancy, employer_key, page))
+                if skipped:
+                    continue
+                last = (position, employer_key, page)
+                # Граница транзакции - только между страницами: контрольная точка указывает на целую страницу
+                if len(chunk.vacancies) >= chunk_rows:
+                    flush()
+
+            # Признак полноты списка становится известен после всех страниц
+            if archive_missing and vacancy_list_complete(employer or {}):
+                chunk.completed.append((employer_key, seen))
+            last = (position, employer_key, page)
+            if per_employer or len(chunk.vacancies) >= chunk_rows:
+                flush()
+
+        flush(finished=True)
+
+        summary = dict(counters, rows_total=rows_total, dead_letters_total=dead_total, finished=True,
+                       seconds=round(time.perf_counter() - start, 1))
+        print(f"✅ Загрузка '{job_name}': работодателей {counters['employers']} (пропущено {counters['skipped']}), "
+              f"вакансий {counters['rows']} (новых {counters['inserted']}, изменилось {counters['updated']}), "
+              f"закрыто {counters['archived']}, отложено {counters['dead_letters']}, "
+              f"транзакций {counters['chunks']}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при загрузке частями '{job_name}': {e}")
+        print("ℹ️ Зафиксированные части сохранены, повторный запуск продолжит с контрольной точки")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            if locked and not conn.closed:
+                cur.execute("SELECT pg_advisory_unlock(%s, hashtext(%s));", (LOAD_LOCK_CLASS, job_name))
+                conn.commit()
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return summary
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _payload(value):
+    """Исходные данные отложенной строки текстом; то, что не сериализуется в JSON, - через repr."""
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=repr)
+
+
+def _write_chunk(cur, chunk, counters, batch_size):
+    """
+    Пишет строки части в текущей транзакции. Если пачка падает, пишет ее
+    построчно, каждую строку в своей точке сохранения, а упавшие строки
+    добавляет в chunk.dead_letters.
+
+    Returns:
+        int: Сколько вакансий не удалось записать.
+    """
+    cur.execute("SAVEPOINT load_chunk;")
+    try:
+        # Работодатели раньше вакансий: на них ссылается внешний ключ
+        upsert_changed_rows(cur, 'employers', SYNC_EMPLOYER_COLUMNS, 'employer_id',
+                            [row for row, _ in chunk.employers.values()], batch_size)
+        inserted, updated, _ = upsert_changed_rows(
+            cur, 'vacancies', SYNC_VACANCY_COLUMNS, 'vacancy_id',
+            [row for row, _, _, _ in chunk.vacancies], batch_size, extra_set=', archived = FALSE'
+        )
+        cur.execute("RELEASE SAVEPOINT load_chunk;")
+        failed = 0
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT load_chunk;")
+        inserted = updated = failed = 0
+        rows = [('employer', row, payload, employer_id, None)
+                for employer_id, (row, payload) in chunk.employers.items()]
+        rows.extend(('vacancy', row, payload, employer_id, page) for row, payload, employer_id, page in chunk.vacancies)
+        for kind, row, payload, employer_id, page in rows:
+            cur.execute("SAVEPOINT load_row;")
+            try:
+                if kind == 'employer':
+                    upsert_changed_rows(cur, 'employers', SYNC_EMPLOYER_COLUMNS, 'employer_id', [row])
+                else:
+                    row_inserted, row_updated, _ = upsert_changed_rows(
+                        cur, 'vacancies', SYNC_VACANCY_COLUMNS, 'vacancy_id', [row], extra_set=', archived = FALSE'
+                    )
+                    inserted += row_inserted
+                    updated += row_updated
+                cur.execute("RELEASE SAVEPOINT load_row;")
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT load_row;")
+                chunk.dead_letters.append((kind, str(employer_id), page, _payload(payload), str(e).strip()))
+                failed += kind == 'vacancy'
+
+    counters['inserted'] += inserted
+    counters['updated'] += updated
+
+    if chunk.completed:
+        employer_ids = [employer_id for employer_id, _ in chunk.completed]
+        seen = list(itertools.chain.from_iterable(vacancy_ids for _, vacancy_ids in chunk.completed))
+        # Архивная вакансия с прежним хэшем не обновилась выше - возвращаем ее отдельно
+        cur.execute("""
+            UPDATE vacancies v SET archived = FALSE, updated_at = now()
+            WHERE v.archived AND v.vacancy_id IN (SELECT unnest(%s::bigint[]));
+        """, (seen,))
+        counters['updated'] += cur.rowcount
+        cur.execute("""
+            UPDATE vacancies v SET archived = TRUE, updated_at = now()
+            WHERE NOT v.archived
+              AND v.employer_id = ANY(%s::bigint[])
+              AND v.vacancy_id NOT IN (SELECT unnest(%s::bigint[]));
+        """, (employer_ids, seen))
+        counters['archived'] += cur.rowcount
+    return failed
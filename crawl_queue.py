@@ -0,0 +1,544 @@
+# crawl_queue.py - Очередь заданий на сбор работодателей в PostgreSQL
+#
+# Таблица crawl_jobs хранит по строке на работодателя. Любое число процессов
+# (на одной или нескольких машинах) забирают из нее пачки заданий с арендой
+# (lease) через SELECT ... FOR UPDATE SKIP LOCKED, собирают работодателей и
+# загружают их в БД. Если процесс упал, его аренда истекает и пачку забирает
+# другой процесс; незавершенный обход продолжается с того же места.
+
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+import time
+
+from api_HH import configure_scheduler, DEFAULT_CONCURRENCY
+from db import acquire_connection, release_connection
+from metrics import get_metrics
+from pipeline import IngestPipeline
+from staging import crawl_to_staging, load_staging, DEFAULT_STAGING_DIR
+
+
+DEFAULT_CLAIM_SIZE = 20       # Работодателей в одной пачке
+DEFAULT_LEASE_SECONDS = 600   # Сколько пачка закреплена за процессом
+DEFAULT_MAX_ATTEMPTS = 3      # После стольких неудач задание помечается 'failed'
+
+# pending - ждет обработки, leased - взято процессом, done - загружено,
+# failed - не удалось за DEFAULT_MAX_ATTEMPTS попыток
+JOB_STATUSES = ('pending', 'leased', 'done', 'failed')
+
+
+def create_crawl_jobs_table(params):
+    """
+    Создает таблицу очереди заданий crawl_jobs.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+    """
+    conn = None
+    cur = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_jobs (
+                employer_id BIGINT PRIMARY KEY,
+                status VARCHAR(10) NOT NULL DEFAULT 'pending',
+                lease_owner VARCHAR(255),
+                lease_expires_at TIMESTAMPTZ,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+        # Частичный индекс: процессы ищут только задания, которые можно взять
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS crawl_jobs_claimable_idx
+            ON crawl_jobs (employer_id) WHERE status IN ('pending', 'leased');
+        """)
+
+        conn.commit()
+        print("✅ Таблица очереди crawl_jobs создана или уже существует.")
+
+    except Exception as e:
+        print(f"❌ Ошибка при создании таблицы crawl_jobs: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+
+def enqueue_employers(employer_ids, params, requeue=False):
+    """
+    Добавляет работодателей в очередь.
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        requeue (bool): Вернуть в очередь уже обработанные ('done'/'failed') задания,
+                        чтобы собрать их заново. Взятые процессами задания не трогаются.
+
+    Returns:
+        int: Сколько заданий добавлено или возвращено в очередь (None при ошибке).
+    """
+    conn = None
+    cur = None
+    queued = None
+
+    if requeue:
+        on_conflict = """
+            DO UPDATE SET status = 'pending', attempts = 0, last_error = NULL,
+                          lease_owner = NULL, lease_expires_at = NULL, updated_at = now()
+            WHERE crawl_jobs.status IN ('done', 'failed')
+        """
+    else:
+        on_conflict = "DO NOTHING"
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        cur.execute(f"""
+            INSERT INTO crawl_jobs (employer_id)
+            SELECT DISTINCT unnest(%s::bigint[])
+            ON CONFLICT (employer_id) {on_conflict};
+        """, ([int(employer_id) for employer_id in employer_ids],))
+        queued = cur.rowcount
+
+        conn.commit()
+        print(f"✅ В очередь поставлено заданий: {queued}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при постановке заданий в очередь: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return queued
+
+
+def claim_jobs(params, worker_id, limit=DEFAULT_CLAIM_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS,
+               max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Забирает пачку заданий в аренду.
+
+    Берутся ожидающие задания и задания с истекшей арендой (их процесс упал).
+    Упавший процесс не вызывает fail_jobs, поэтому задание с истекшей арендой,
+    у которого попытки исчерпаны, здесь же помечается 'failed', а не берется снова.
+    FOR UPDATE SKIP LOCKED пропускает строки, которые в этот момент забирает
+    другой процесс, поэтому процессы не ждут друг друга и не получают одно
+    задание дважды.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        worker_id (str): Имя процесса-владельца аренды.
+        limit (int): Максимальный размер пачки.
+        lease_seconds (float): Длительность аренды.
+        max_attempts (int): Сколько попыток дается заданию (как в fail_jobs).
+
+    Returns:
+        list: ID работодателей пачки (пустой, если заданий нет или произошла ошибка).
+    """
+    conn = None
+    cur = None
+    employer_ids = []
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        cur.execute("""
+            UPDATE crawl_jobs
+            SET status = 'failed',
+                lease_owner = NULL, lease_expires_at = NULL,
+                last_error = 'Аренда истекла, попытки исчерпаны', updated_at = now()
+            WHERE status = 'leased' AND lease_expires_at < now() AND attempts >= %s;
+        """, (max_attempts,))
+        cur.execute("""
+            UPDATE crawl_jobs j
+            SET status = 'leased',
+                lease_owner = %s,
+                lease_expires_at = now() + make_interval(secs => %s),
+                attempts = j.attempts + 1,
+                updated_at = now()
+            FROM (
+                SELECT employer_id
+                FROM crawl_jobs
+                WHERE status = 'pending'
+                   OR (status = 'leased' AND lease_expires_at < now() AND attempts < %s)
+                ORDER BY employer_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ) claimable
+            WHERE j.employer_id = claimable.employer_id
+            RETURNING j.employer_id;
+        """, (worker_id, lease_seconds, max_attempts, limit))
+        employer_ids = sorted(row[0] for row in cur.fetchall())
+
+        conn.commit()
+
+    except Exception as e:
+        print(f"❌ Ошибка при получении заданий из очереди: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return employer_ids
+
+
+def complete_jobs(employer_ids, params, worker_id):
+    """
+    Отмечает задания выполненными.
+
+    Обновляются только задания, аренда которых все еще принадлежит worker_id:
+    если аренда истекла и пачку уже забрал другой процесс, его работа не затирается.
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        worker_id (str): Имя процесса-владельца аренды.
+
+    Returns:
+        int: Сколько заданий отмечено (None при ошибке); меньше числа ID,
+             если аренда части заданий уже перешла к другому процессу.
+    """
+    return _finish_jobs(employer_ids, params, worker_id, """
+        UPDATE crawl_jobs
+        SET status = 'done', lease_owner = NULL, lease_expires_at = NULL,
+            last_error = NULL, updated_at = now()
+        WHERE employer_id = ANY(%(ids)s::bigint[]) AND lease_owner = %(worker_id)s;
+    """, {})
+
+
+def fail_jobs(employer_ids, params, worker_id, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Возвращает задания в очередь после ошибки или, если попытки исчерпаны, помечает их 'failed'.
+
+    Все задания обновляются одним запросом, даже если у каждого своя ошибка.
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        worker_id (str): Имя процесса-владельца аренды.
+        error (str | dict): Текст ошибки для last_error - общий или по ID работодателя.
+        max_attempts (int): Сколько попыток дается заданию.
+
+    Returns:
+        int: Сколько заданий обновлено (None при ошибке).
+    """
+    employer_ids = list(employer_ids)
+    errors = [str(error[employer_id] if isinstance(error, dict) else error) for employer_id in employer_ids]
+    return _finish_jobs(employer_ids, params, worker_id, """
+        UPDATE crawl_jobs j
+        SET status = CASE WHEN j.attempts >= %(max_attempts)s THEN 'failed' ELSE 'pending' END,
+            lease_owner = NULL, lease_expires_at = NULL,
+            last_error = f.error, updated_at = now()
+        FROM unnest(%(ids)s::bigint[], %(errors)s::text[]) AS f(employer_id, error)
+        WHERE j.employer_id = f.employer_id AND j.lease_owner = %(worker_id)s;
+    """, {'errors': errors, 'max_attempts': max_attempts})
+
+
+def renew_leases(employer_ids, params, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Продлевает аренду заданий, которые все еще принадлежат worker_id.
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        worker_id (str): Имя процесса-владельца аренды.
+        lease_seconds (float): На сколько секунд от текущего момента продлить аренду.
+
+    Returns:
+        int: Сколько аренд продлено (None при ошибке).
+    """
+    return _finish_jobs(employer_ids, params, worker_id, """
+        UPDATE crawl_jobs
+        SET lease_expires_at = now() + make_interval(secs => %(lease_seconds)s), updated_at = now()
+        WHERE employer_id = ANY(%(ids)s::bigint[]) AND lease_owner = %(worker_id)s AND status = 'leased';
+    """, {'lease_seconds': lease_seconds})
+
+
+class LeaseHeartbeat:
+    """
+    Фоновый поток, который продлевает аренду пачки, пока она обрабатывается.
+
+    Без него пачка, которая собирается дольше lease_seconds (медленные
+    работодатели, паузы после 429), переходит к другому процессу и
+    собирается дважды. Аренда продлевается каждую треть lease_seconds;
+    если часть заданий уже забрал другой процесс, выводится предупреждение.
+    Используется как контекстный менеджер.
+    """
+
+    def __init__(self, employer_ids, params, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.employer_ids = list(employer_ids)
+        self.params = params
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.renewals = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'lease-{worker_id}', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            renewed = renew_leases(self.employer_ids, self.params, self.worker_id, self.lease_seconds)
+            if renewed is None:
+                continue
+            self.renewals += 1
+            if renewed < len(self.employer_ids):
+                print(f"⚠️ {self.worker_id}: аренда {len(self.employer_ids) - renewed} из "
+                      f"{len(self.employer_ids)} заданий пачки потеряна")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+
+def _finish_jobs(employer_ids, params, worker_id, sql_query, args):
+    employer_ids = [int(employer_id) for employer_id in employer_ids]
+    if not employer_ids:
+        return 0
+
+    conn = None
+    cur = None
+    updated = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+        cur.execute(sql_query, {'ids': employer_ids, 'worker_id': worker_id, **args})
+        updated = cur.rowcount
+        conn.commit()
+
+    except Exception as e:
+        print(f"❌ Ошибка при обновлении заданий очереди: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return updated
+
+
+def queue_stats(params):
+    """
+    Возвращает число заданий в каждом статусе.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+
+    Returns:
+        dict: Статус -> количество (для всех статусов из JOB_STATUSES) или None при ошибке.
+    """
+    conn = None
+    cur = None
+    stats = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+        cur.execute("SELECT status, COUNT(*) FROM crawl_jobs GROUP BY status;")
+        stats = dict.fromkeys(JOB_STATUSES, 0)
+        stats.update(cur.fetchall())
+        conn.commit()
+
+    except Exception as e:
+        print(f"❌ Ошибка при чтении состояния очереди: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return stats
+
+
+def default_worker_id():
+    """Имя процесса для аренды: хост и PID, чтобы процессы разных машин не совпадали."""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def process_batch(employer_ids, params, worker_id, staging_dir=DEFAULT_STAGING_DIR,
+                  concurrency=DEFAULT_CONCURRENCY, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                  lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Собирает пачку работодателей, загружает ее в БД и отмечает задания.
+
+    Пока пачка обрабатывается, ее аренда продлевается (LeaseHeartbeat). Если
+    аренда все же потеряна и задания забрал другой процесс, они не
+    отмечаются выполненными и попадают в счетчик 'lost'.
+
+    С staging_dir пачка сначала целиком пишется в сегменты на диске, затем
+    загружается. Без него сбор и запись идут одновременно через IngestPipeline.
+
+    Ошибка отдельного работодателя (например, 404) возвращает в очередь только
+    его задание. Если не удалась загрузка, в очередь возвращается вся пачка,
+    а каталог запуска (если он есть) остается на диске для повторной загрузки.
+
+    Args:
+        employer_ids (list): ID работодателей из claim_jobs.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        worker_id (str): Имя процесса-владельца аренды.
+        staging_dir (str): Корневой каталог промежуточных данных или None для конвейера.
+        concurrency (int): Сколько работодателей запрашивать одновременно.
+        max_attempts (int): Сколько попыток дается заданию.
+        lease_seconds (float): Длительность аренды; на столько же она продлевается.
+
+    Returns:
+        dict: Счетчики 'done', 'failed' и 'lost' (задания с потерянной арендой).
+    """
+    with LeaseHeartbeat(employer_ids, params, worker_id, lease_seconds):
+        if staging_dir is None:
+            summary = IngestPipeline(params, fetchers=concurrency).run(employer_ids)
+            if summary is None:
+                fail_jobs(employer_ids, params, worker_id, 'Запись в БД не удалась', max_attempts)
+                return {'done': 0, 'failed': len(employer_ids), 'lost': 0}
+            if summary['failed']:
+                fail_jobs(summary['failed'], params, worker_id, 'Ошибка при сборе', max_attempts)
+            return _complete_batch(summary['completed'], params, worker_id, len(summary['failed']))
+
+        errors = {}
+
+        def on_error(employer_id, exception):
+            print(f"❌ Ошибка при сборе работодателя {employer_id}: {exception}")
+            errors[employer_id] = exception
+
+        run_dir = crawl_to_staging(employer_ids, staging_dir, concurrency, on_error=on_error)
+        crawled = [employer_id for employer_id in employer_ids if employer_id not in errors]
+
+        # Все ошибки сбора отмечаются одним запросом, у каждого задания - своя
+        if errors:
+            fail_jobs(list(errors), params, worker_id, errors, max_attempts)
+
+        employers_summary, vacancies_summary = load_staging(run_dir, params)
+        if employers_summary is None or vacancies_summary is None:
+            fail_jobs(crawled, params, worker_id, f'Загрузка {run_dir} не удалась', max_attempts)
+            return {'done': 0, 'failed': len(employer_ids), 'lost': 0}
+
+        result = _complete_batch(crawled, params, worker_id, len(errors))
+    # Данные уже в БД: сегменты этой пачки больше не нужны
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return result
+
+
+def _complete_batch(employer_ids, params, worker_id, failed):
+    """Отмечает собранные задания и сверяет, сколько из них еще принадлежало этому процессу."""
+    done = complete_jobs(employer_ids, params, worker_id)
+    if done is None:
+        # Отметить не удалось: аренда истечет, и задания соберут снова
+        return {'done': 0, 'failed': failed, 'lost': len(employer_ids)}
+    lost = len(employer_ids) - done
+    if lost:
+        print(f"⚠️ {worker_id}: {lost} заданий уже забрал другой процесс (аренда истекла), "
+              f"они не отмечены выполненными")
+    return {'done': done, 'failed': failed, 'lost': lost}
+
+
+def run_worker(params, worker_id=None, claim_size=DEFAULT_CLAIM_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS,
+               staging_dir=DEFAULT_STAGING_DIR, concurrency=DEFAULT_CONCURRENCY,
+               max_attempts=DEFAULT_MAX_ATTEMPTS, poll_interval=None):
+    """
+    Обрабатывает пачки из очереди, пока она не опустеет.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        worker_id (str): Имя процесса; по умолчанию хост и PID.
+        claim_size (int): Работодателей в одной пачке.
+        lease_seconds (float): Длительность аренды пачки; пока пачка обрабатывается,
+                               аренда продлевается каждую треть этого срока.
+        staging_dir (str): Корневой каталог промежуточных данных или None, чтобы
+                           писать в БД конвейером без промежуточных файлов.
+        concurrency (int): Сколько работодателей запрашивать одновременно.
+        max_attempts (int): Сколько попыток дается заданию.
+        poll_interval (float): Если задан, при пустой очереди процесс ждет новые
+                               задания с этим интервалом вместо завершения.
+
+    Returns:
+        dict: Счетчики 'batches', 'done', 'failed', 'lost'.
+    """
+    worker_id = worker_id or default_worker_id()
+    totals = {'batches': 0, 'done': 0, 'failed': 0, 'lost': 0}
+
+    while True:
+        employer_ids = claim_jobs(params, worker_id, claim_size, lease_seconds, max_attempts)
+        if not employer_ids:
+            if poll_interval is None:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        print(f"🔄 {worker_id}: взята пачка из {len(employer_ids)} работодателей")
+        result = process_batch(employer_ids, params, worker_id, staging_dir, concurrency, max_attempts,
+                               lease_seconds)
+        totals['batches'] += 1
+        for name in ('done', 'failed', 'lost'):
+            totals[name] += result[name]
+
+    print(f"✅ {worker_id}: пачек {totals['batches']}, загружено {totals['done']}, ошибок {totals['failed']}, "
+          f"потеряно аренд {totals['lost']}")
+    return totals
+
+
+def _worker_main(params, rate, worker_kwargs):
+    # Лимит скорости у каждого процесса свой, поэтому общий темп делится между ними
+    if rate is not None:
+        configure_scheduler(rate=rate)
+    # Замеры, унаследованные от родителя при fork, не относятся к этому процессу
+    get_metrics().reset()
+    try:
+        run_worker(params, **worker_kwargs)
+    finally:
+        # Процесс multiprocessing завершается без atexit - сводку отдаем сами
+        get_metrics().flush()
+
+
+def run_workers(params, processes=4, total_rate=None, **worker_kwargs):
+    """
+    Запускает несколько процессов run_worker на этой машине и ждет их завершения.
+
+    На других машинах достаточно запустить run_worker (или run_workers) с теми же
+    параметрами БД: координация идет только через таблицу crawl_jobs.
+
+    Args:
+        params (dict): Параметры подключения к PostgreSQL (у каждого процесса свои соединения,
+                       поэтому DBManager сюда не передается).
+        processes (int): Число процессов.
+        total_rate (float): Общий лимит запросов в секунду к API на все процессы
+                            (по умолчанию у каждого процесса свой лимит планировщика).
+        **worker_kwargs: Аргументы run_worker (claim_size, lease_seconds, concurrency, ...).
+
+    Returns:
+        list: Коды завершения процессов.
+    """
+    rate = total_rate / processes if total_rate else None
+    workers = [
+        multiprocessing.Process(target=_worker_main, args=(params, rate, worker_kwargs), name=f'crawl-worker-{number}')
+        for number in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [worker.exitcode for worker in workers]
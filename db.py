@@ -3,7 +3,19 @@
 import psycopg2
 from dotenv import load_dotenv
 import os
+import io
+import json
+import hashlib
+import itertools
+import threading
+import time
 import psycopg2.errors
+import psycopg2.extras
+import psycopg2.pool
+from contextlib import contextmanager
+
+from exchange_rates import to_rub, reload_rates, store_rates, recompute_salary_rub
+from metrics import get_metrics, observe, timer
 
 load_dotenv()
 
@@ -21,6 +33,68 @@ db_params = {
     "port": DB_PORT
 }
 
+# Порядок столбцов при записи. Кортежи строк из *_to_row должны ему соответствовать.
+EMPLOYER_COLUMNS = ('employer_id', 'employer_name', 'employer_url')
+VACANCY_COLUMNS = ('vacancy_id', 'employer_id', 'title', 'salary_from', 'salary_to', 'salary_currency', 'url',
+                   'salary_from_rub', 'salary_to_rub')
+
+# Режимы записи: построчный INSERT, пачки через execute_values и COPY через временную таблицу
+WRITE_MODES = ('row', 'batch', 'copy')
+DEFAULT_BATCH_SIZE = 1000
+
+# Размер пула соединений DBManager по умолчанию
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 10
+
+
+def acquire_connection(params):
+    """
+    Возвращает соединение с БД.
+
+    Если вместо параметров передан DBManager, соединение берется из его пула,
+    иначе открывается новое. Когда все max_size соединений пула заняты,
+    вызов ждет, пока какое-нибудь вернут (ThreadedConnectionPool в этом
+    случае сам не ждет, а бросает PoolError).
+
+    Args:
+        params (dict | DBManager): Параметры подключения или менеджер с пулом.
+
+    Returns:
+        connection: Соединение psycopg2.
+    """
+    start = time.perf_counter()
+    if isinstance(params, DBManager):
+        params._slots.acquire()
+        try:
+            conn = params.pool.getconn()
+        except Exception:
+            params._slots.release()
+            raise
+        source = 'pool'
+    else:
+        conn = psycopg2.connect(**params)
+        source = 'connect'
+    observe('db_connection_wait', time.perf_counter() - start, {'source': source})
+    return conn
+
+
+def release_connection(params, conn):
+    """
+    Возвращает соединение в пул DBManager или закрывает его.
+
+    Args:
+        params (dict | DBManager): То же значение, что передавалось в acquire_connection.
+        conn: Соединение psycopg2.
+    """
+    if isinstance(params, DBManager):
+        # Пул сам откатит незавершенную транзакцию
+        try:
+            params.pool.putconn(conn)
+        finally:
+            params._slots.release()
+    else:
+        conn.close()
+
 
 def create_database(params):
     """
@@ -68,13 +142,13 @@ def create_tables(params):
     Создает таблицы в базе данных, если они не существуют.
     
     Args:
-        params (dict): Параметры подключения к PostgreSQL.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
     """
     conn = None
     cur = None
     
     try:
-        conn = psycopg2.connect(**params)
+        conn = acquire_connection(params)
         cur = conn.cursor()
         
         # Создаем таблицу employers (работодатели)
@@ -100,9 +174,55 @@ def create_tables(params):
         );
         """
         
+        # Полнотекстовый поиск по названию: tsvector с русской и английской
+        # морфологией вычисляется один раз при записи строки
+        add_title_tsv_column = """
+        ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS title_tsv tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('russian', title) || to_tsvector('english', title)
+            ) STORED;
+        """
+        create_title_tsv_index = """
+        CREATE INDEX IF NOT EXISTS vacancies_title_tsv_idx ON vacancies USING gin (title_tsv);
+        """
+        
+        # Столбцы для инкрементальной синхронизации: хэш содержимого строки,
+        # время последнего изменения и признак закрытой (архивной) вакансии
+        add_sync_columns = """
+        ALTER TABLE employers
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32),
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        ALTER TABLE vacancies
+            ADD COLUMN IF NOT EXISTS published_at TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32),
+            ADD COLUMN IF NOT EXISTS archived BOOLEAN NOT NULL DEFAULT FALSE,
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        """
+        
+        # Зарплата в рублях по курсу на момент записи (см. exchange_rates.py):
+        # считается один раз при сохранении, запросы сравнивают вакансии в разных валютах
+        add_salary_rub_columns = """
+        ALTER TABLE vacancies
+            ADD COLUMN IF NOT EXISTS salary_from_rub INTEGER,
+            ADD COLUMN IF NOT EXISTS salary_to_rub INTEGER;
+        """
+        
+        # Поколение данных: растет после каждой записи, по нему кэши
+        # результатов понимают, что данные изменились
+        create_data_generation_sequence = """
+        CREATE SEQUENCE IF NOT EXISTS data_generation_seq;
+        """
+        
         # Выполняем SQL-запросы для создания таблиц
         cur.execute(create_employers_table)
         cur.execute(create_vacancies_table)
+        cur.execute(add_title_tsv_column)
+        cur.execute(create_title_tsv_index)
+        cur.execute(add_sync_columns)
+        cur.execute(add_salary_rub_columns)
+        cur.execute(create_data_generation_sequence)
+        create_trigram_index(cur)
+        create_stats_views(cur)
         
         # Фиксируем изменения
         conn.commit()
@@ -116,59 +236,438 @@ def create_tables(params):
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_connection(params, conn)
+
+
+DATA_GENERATION_SQL = "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM data_generation_seq"
+
+
+def mark_data_changed(conn):
+    """
+    Увеличивает поколение данных после зафиксированной записи.
+
+    Вызывается после commit: читатель, увидевший новое поколение, уже видит
+    и новые данные, поэтому не закэширует под ним старый результат.
+    Последовательность не транзакционна и не блокирует параллельные загрузки.
+
+    Args:
+        conn: Соединение psycopg2 без открытой транзакции с данными.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT nextval('data_generation_seq');")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def get_data_generation(cur):
+    """
+    Возвращает текущее поколение данных.
+
+    Args:
+        cur: Курсор psycopg2.
+
+    Returns:
+        int: Номер поколения (0 - записей еще не было).
+    """
+    cur.execute(DATA_GENERATION_SQL)
+    return cur.fetchone()[0]
+
+
+def create_trigram_index(cur):
+    """
+    Создает триграммный GIN-индекс по названию вакансии, чтобы ILIKE '%слово%'
+    не сканировал всю таблицу.
+
+    Расширение pg_trgm есть не во всех сборках PostgreSQL, поэтому при его
+    отсутствии индекс пропускается, а остальная схема создается как обычно.
+
+    Args:
+        cur: Курсор psycopg2 внутри открытой транзакции.
+    """
+    cur.execute("SAVEPOINT create_trigram_index;")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS vacancies_title_trgm_idx
+            ON vacancies USING gin (title gin_trgm_ops);
+        """)
+        cur.execute("RELEASE SAVEPOINT create_trigram_index;")
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT create_trigram_index;")
+        print(f"⚠️ Триграммный индекс не создан, поиск по подстроке будет без индекса: {e}")
+
+
+def salary_midpoint_sql(alias='', suffix=''):
+    """
+    SQL-выражение "зарплата вакансии": середина вилки или единственная указанная граница.
+
+    Args:
+        alias (str): Псевдоним таблицы vacancies в запросе (например, 'v').
+        suffix (str): Окончание имен столбцов: '' - в валюте вакансии, '_rub' - в рублях.
+
+    Returns:
+        str: Выражение; NULL, если зарплата не указана.
+    """
+    prefix = f'{alias}.' if alias else ''
+    salary_from = f'{prefix}salary_from{suffix}'
+    salary_to = f'{prefix}salary_to{suffix}'
+    return f"(COALESCE({salary_from}, {salary_to}) + COALESCE({salary_to}, {salary_from})) / 2.0"
+
+
+def create_stats_views(cur):
+    """
+    Создает материализованные представления с агрегатами для DBManager:
+    employer_stats (по строке на работодателя) и salary_stats (одна строка).
+    Зарплаты в них - в рублях.
+    Обновляются функцией refresh_stats после каждой загрузки.
+
+    Args:
+        cur: Курсор psycopg2 внутри открытой транзакции.
+    """
+    cur.execute(f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS employer_stats AS
+        SELECT e.employer_id,
+               e.employer_name,
+               COUNT(v.vacancy_id) AS vacancies_count,
+               COUNT({salary_midpoint_sql('v', '_rub')}) AS salaries_count,
+               SUM({salary_midpoint_sql('v', '_rub')}) AS salaries_sum
+        FROM employers e
+        LEFT JOIN vacancies v ON e.employer_id = v.employer_id AND NOT v.archived
+        GROUP BY e.employer_id, e.employer_name;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS employer_stats_employer_id_idx ON employer_stats (employer_id);
+        CREATE INDEX IF NOT EXISTS employer_stats_vacancies_count_idx ON employer_stats (vacancies_count DESC);
+
+        CREATE MATERIALIZED VIEW IF NOT EXISTS salary_stats AS
+        SELECT 1 AS id,
+               AVG({salary_midpoint_sql(suffix='_rub')}) AS avg_salary,
+               COUNT({salary_midpoint_sql(suffix='_rub')}) AS salaries_count
+        FROM vacancies
+        WHERE NOT archived;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS salary_stats_id_idx ON salary_stats (id);
+    """)
+
+
+def refresh_stats(params):
+    """
+    Пересчитывает материализованные агрегаты. Вызывается после каждой загрузки данных.
+    CONCURRENTLY не блокирует чтение статистики на время пересчета.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+    """
+    conn = None
+    cur = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+        cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY employer_stats;")
+        cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY salary_stats;")
+        conn.commit()
+        # Кэшированные ответы по employer_stats и salary_stats устарели
+        mark_data_changed(conn)
+        print("✅ Статистика по вакансиям пересчитана")
+
+    except Exception as e:
+        print(f"❌ Ошибка при пересчете статистики: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+
+def update_exchange_rates(params, path=None):
+    """
+    Перечитывает курсы валют из файла, записывает их в таблицу exchange_rates
+    и пересчитывает зарплату в рублях у уже сохраненных вакансий.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        path (str): Файл курсов (по умолчанию - HH_EXCHANGE_RATES_FILE или exchange_rates.json).
+
+    Returns:
+        int: Сколько вакансий изменилось или None при ошибке.
+    """
+    conn = None
+    cur = None
+    changed = None
+
+    try:
+        rates = reload_rates(path) if path else reload_rates()
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+        store_rates(cur, rates)
+        changed = recompute_salary_rub(cur)
+        conn.commit()
+        if changed:
+            mark_data_changed(conn)
+        print(f"✅ Курсы валют обновлены ({len(rates)}), пересчитано вакансий: {changed}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при обновлении курсов валют: {e}")
+        if conn:
+            conn.rollback()
+        changed = None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return changed
+
+
+# Число вакансий у каждой компании: пересчет по таблицам и готовые счетчики из employer_stats
+VACANCY_COUNTS_SQL = """
+    SELECT e.employer_name, COUNT(v.vacancy_id)
+    FROM employers e
+    LEFT JOIN vacancies v ON e.employer_id = v.employer_id AND NOT v.archived
+    GROUP BY e.employer_id, e.employer_name
+    ORDER BY COUNT(v.vacancy_id) DESC
+"""
+
+CACHED_VACANCY_COUNTS_SQL = """
+    SELECT employer_name, vacancies_count
+    FROM employer_stats
+    ORDER BY vacancies_count DESC
+"""
+
+# SQL-запрос для получения вакансий по ключевому слову в названии
+# ILIKE %s - ищет подстроку без учета регистра. %s - плейсхолдер.
+KEYWORD_VACANCIES_SQL = """
+    SELECT vacancy_id, employer_id, title, salary_from, salary_to, salary_currency, url
+    FROM vacancies
+    WHERE title ILIKE %s AND NOT archived
+    LIMIT %s
+"""
+
+# Полнотекстовый поиск: запрос разбирается и русской, и английской морфологией
+SEARCH_VACANCIES_SQL = """
+    SELECT v.vacancy_id, v.employer_id, v.title, v.salary_from, v.salary_to,
+           v.salary_currency, v.url, ts_rank(v.title_tsv, q.query) AS rank
+    FROM vacancies v,
+         (SELECT websearch_to_tsquery('russian', %s)
+                 || websearch_to_tsquery('english', %s) AS query) q
+    WHERE v.title_tsv @@ q.query AND NOT v.archived
+    ORDER BY rank DESC
+    LIMIT %s
+"""
+
+# Запросы, которые DBManager выполняет и целиком (get_*), и потоково (iter_*)
+ALL_VACANCIES_SQL = """
+    SELECT v.vacancy_id, e.employer_name, v.title, v.salary_from, v.salary_to, 
+           v.salary_currency, v.url
+    FROM vacancies v
+    JOIN employers e ON v.employer_id = e.employer_id
+    WHERE NOT v.archived
+"""
+
+VACANCIES_WITH_SALARY_SQL = """
+    SELECT vacancy_id, employer_id, title, salary_from, salary_to, salary_currency, url
+    FROM vacancies
+    WHERE (salary_from IS NOT NULL OR salary_to IS NOT NULL) AND NOT archived
+"""
+
+# Средняя зарплата в рублях: пересчет по таблице и готовое значение из salary_stats
+AVG_SALARY_SQL = f"""
+    SELECT AVG({salary_midpoint_sql(suffix='_rub')})
+    FROM vacancies
+    WHERE NOT archived
+"""
+
+CACHED_AVG_SALARY_SQL = "SELECT avg_salary FROM salary_stats"
+
+
+# Верхняя граница вилки в рублях (GREATEST пропускает NULL). Выражение совпадает
+# с индексом vacancies_salary_rub_max_idx, поэтому отбор по нему идет по индексу.
+# Среднюю (NUMERIC) сравниваем как floor(...)::integer: для целой зарплаты x > avg
+# то же, что x > floor(avg), а сравнение с NUMERIC привело бы столбец к NUMERIC мимо индекса
+SALARY_RUB_MAX_SQL = "GREATEST(v.salary_from_rub, v.salary_to_rub)"
+
+
+def higher_salary_sql(cached=True):
+    """
+    Запрос вакансий, у которых верхняя граница вилки в рублях выше средней зарплаты.
+
+    Args:
+        cached (bool): Брать среднюю из salary_stats, а не пересчитывать по всей таблице.
+
+    Returns:
+        str: SQL-запрос без ';' в конце.
+    """
+    avg_sql = CACHED_AVG_SALARY_SQL if cached else AVG_SALARY_SQL
+    return f"""
+        WITH avg_salary(value) AS ({avg_sql})
+        SELECT v.vacancy_id, v.employer_id, v.title, v.salary_from, v.salary_to,
+               v.salary_currency, v.url, e.employer_name
+        FROM vacancies v
+        JOIN employers e ON v.employer_id = e.employer_id
+        WHERE {SALARY_RUB_MAX_SQL} > (SELECT floor(value)::integer FROM avg_salary)
+        AND NOT v.archived
+    """
+
+
+# Снимок вакансий для выгрузки в Parquet (export.py): все столбцы, нужные
+# аналитике, месяц публикации для секционирования и время изменения строки
+VACANCY_SNAPSHOT_COLUMNS = (
+    'vacancy_id', 'employer_id', 'employer_name', 'title', 'salary_from', 'salary_to', 'salary_currency',
+    'salary_from_rub', 'salary_to_rub', 'url', 'published_at', 'month', 'archived', 'updated_at',
+)
+
+VACANCY_SNAPSHOT_SQL = """
+    SELECT v.vacancy_id, v.employer_id, e.employer_name, v.title, v.salary_from, v.salary_to,
+           v.salary_currency, v.salary_from_rub, v.salary_to_rub, v.url, v.published_at,
+           to_char(v.published_at AT TIME ZONE 'UTC', 'YYYY-MM') AS month, v.archived, v.updated_at
+    FROM vacancies v
+    JOIN employers e ON v.employer_id = e.employer_id
+"""
+
+
+# Столбцы для индекса вакансий в памяти (vacancy_index.py): зарплата в рублях,
+# чтобы фильтр по зарплате сравнивал вакансии в разных валютах
+VACANCY_INDEX_SQL = """
+    SELECT vacancy_id, employer_id, title, salary_from_rub, salary_to_rub
+    FROM vacancies
+    WHERE NOT archived
+"""
+
+
+# Сколько строк серверный курсор передает за один сетевой запрос
+DEFAULT_ITERSIZE = 2000
+
+
+def paginate(sql_query, key_column='vacancy_id', after_id=None, limit=None, offset=None):
+    """
+    Оборачивает запрос в постраничную выборку.
+
+    Keyset-пагинация (after_id) не пересматривает пропущенные строки и работает
+    одинаково быстро на любой странице, в отличие от OFFSET.
+
+    Args:
+        sql_query (str): Исходный запрос без ';' в конце.
+        key_column (str): Уникальный столбец результата, по которому упорядочиваем.
+        after_id: Вернуть только строки с ключом больше этого значения.
+        limit (int): Максимальное число строк.
+        offset (int): Сколько строк пропустить.
+
+    Returns:
+        tuple: (SQL-запрос, список параметров).
+    """
+    if after_id is None and limit is None and offset is None:
+        return sql_query, []
+
+    args = []
+    page_sql = f"SELECT * FROM ({sql_query}) page"
+    if after_id is not None:
+        page_sql += f" WHERE page.{key_column} > %s"
+        # Строка подходит и для VARCHAR, и для BIGINT ключей
+        args.append(str(after_id))
+    page_sql += f" ORDER BY page.{key_column}"
+    if limit is not None:
+        page_sql += " LIMIT %s"
+        args.append(limit)
+    if offset is not None:
+        page_sql += " OFFSET %s"
+        args.append(offset)
+    return page_sql, args
 
 
 class DBManager:
     """
     Класс для выполнения операций выборки данных из базы данных PostgreSQL.
+
+    Держит пул соединений (ThreadedConnectionPool), поэтому методы не тратят время
+    на установку соединения. Экземпляр можно передавать вместо параметров
+    подключения в create_tables и save_*_to_db - они возьмут соединение из того же пула.
+    Используется как контекстный менеджер: при выходе пул закрывается.
+
+    С кэшем (query_cache.QueryCache) повторный запрос до следующей загрузки
+    данных обходится чтением номера поколения вместо выполнения запроса.
+    Закэшированные списки общие для всех вызовов - не изменяйте их на месте.
     """
 
-    def __init__(self, params):
+    def __init__(self, params, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, cache=None, raise_errors=False):
         """
         Инициализирует менеджер базы данных с параметрами подключения.
 
         Args:
             params (dict): Параметры подключения к БД.
+            min_size (int): Сколько соединений держать открытыми постоянно.
+            max_size (int): Максимальное число соединений в пуле.
+            cache (QueryCache): Кэш результатов get_* и search_vacancies (None - без кэша).
+            raise_errors (bool): Пробрасывать ошибки запросов get_*/iter_* после сообщения
+                                 о них, а не возвращать пустой результат (для запусков из CLI,
+                                 где ошибка должна дойти до кода выхода).
         """
         self.params = params
-
-    def get_companies_and_vacancies_count(self):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.cache = cache
+        self.raise_errors = raise_errors
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Свободные соединения пула: при нехватке acquire_connection ждет, а не падает
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @property
+    def pool(self):
+        """Пул соединений; создается при первом обращении."""
+        if self._pool is None:
+            # Потоки, одновременно обратившиеся впервые, должны получить один и тот же пул
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(self.min_size, self.max_size, **self.params)
+        return self._pool
+
+    @contextmanager
+    def connection(self):
         """
-        Получает список всех компаний и количество открытых вакансий у каждой.
+        Берет соединение из пула на время блока with.
 
-        Returns:
-            list: Список кортежей (название компании, количество вакансий).
+        При успешном выходе транзакция фиксируется, при ошибке - откатывается.
         """
-        conn = None
-        cur = None
-        results = []
-
+        conn = acquire_connection(self)
         try:
-            conn = psycopg2.connect(**self.params)
-            cur = conn.cursor()
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_connection(self, conn)
 
-            sql_query = """
-                SELECT e.employer_name, COUNT(v.vacancy_id)
-                FROM employers e
-                LEFT JOIN vacancies v ON e.employer_id = v.employer_id
-                GROUP BY e.employer_name
-                ORDER BY COUNT(v.vacancy_id) DESC;
-            """
-            cur.execute(sql_query)
-            results = cur.fetchall()
+    def close(self):
+        """Закрывает все соединения пула."""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
 
-        except Exception as e:
-            print(f"❌ Ошибка при выполнении запроса 'get_companies_and_vacancies_count': {e}")
-            results = []
+    def __enter__(self):
+        return self
 
-        finally:
-            if cur:
-                cur.close()
-            if conn:
-                conn.close()
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-        return results
+    def get_companies_and_vacancies_count(self, cached=True):
+        """
+        Получает список всех компаний и количество открытых вакансий у каждой.
+
+        Args:
+            cached (bool): Читать готовые счетчики из employer_stats (актуальны на момент
+                           последнего refresh_stats) или пересчитать по таблицам.
+
+        Returns:
+            list: Список кортежей (название компании, количество вакансий).
+        """
+        sql_query = CACHED_VACANCY_COUNTS_SQL if cached else VACANCY_COUNTS_SQL
+        return self._fetch('get_companies_and_vacancies_count', sql_query)
 
     def get_all_vacancies(self):
         """
@@ -178,239 +677,486 @@ class DBManager:
         Returns:
             list: Список кортежей вакансий с информацией о компании.
         """
-        conn = None
-        cur = None
-        results = []
+        return self._fetch('get_all_vacancies', ALL_VACANCIES_SQL)
 
-        try:
-            conn = psycopg2.connect(**self.params)
-            cur = conn.cursor()
+    def get_vacancies_with_salary(self):
+        """
+        Получает список вакансий с указанной зарплатой.
 
-            sql_query = """
-                SELECT v.vacancy_id, e.employer_name, v.title, v.salary_from, v.salary_to, 
-                       v.salary_currency, v.url
-                FROM vacancies v
-                JOIN employers e ON v.employer_id = e.employer_id;
-            """
-            cur.execute(sql_query)
-            results = cur.fetchall()
+        Returns:
+            list: Список кортежей вакансий с зарплатой.
+        """
+        return self._fetch('get_vacancies_with_salary', VACANCIES_WITH_SALARY_SQL)
 
-        except Exception as e:
-            print(f"❌ Ошибка при выполнении запроса 'get_all_vacancies': {e}")
-            results = []
+    def get_vacancies_with_keyword(self, keyword, limit=None):
+        """
+        Получает список всех вакансий, в названии которых содержится ключевое слово.
+        Поиск по подстроке использует триграммный индекс, если он создан.
 
-        finally:
-            if cur:
-                cur.close()
-            if conn:
-                conn.close()
+        Args:
+            keyword (str): Ключевое слово для поиска в названии вакансии.
+            limit (int): Максимальное число вакансий (None - без ограничения).
 
-        return results
+        Returns:
+            list: Список кортежей вакансий, содержащих ключевое слово.
+        """
+        # Формируем ключевое слово для поиска с символами % вокруг него
+        # Это нужно для поиска подстроки в любом месте заголовка
+        search_keyword = f"%{keyword}%"
 
-    def get_vacancies_with_salary(self):
+        # Выполняем запрос, передавая SQL-строку и КОРТЕЖ со значениями плейсхолдеров
+        # LIMIT NULL в PostgreSQL означает "без ограничения"
+        return self._fetch('get_vacancies_with_keyword', KEYWORD_VACANCIES_SQL, (search_keyword, limit)) # <-- **ВАЖНО!** Передаем кортеж!
+
+    def search_vacancies(self, query, limit=50):
         """
-        Получает список вакансий с указанной зарплатой.
+        Полнотекстовый поиск вакансий по названию с учетом русской и английской
+        морфологии ("разработчика" найдет "Разработчик"), отсортированный по релевантности.
+
+        Args:
+            query (str): Поисковый запрос; поддерживается синтаксис websearch
+                         ("python -junior", "\"data engineer\"", "go or rust").
+            limit (int): Максимальное число вакансий.
 
         Returns:
-            list: Список кортежей вакансий с зарплатой.
+            list: Список кортежей вакансий; последний элемент - релевантность.
         """
-        conn = None
-        cur = None
-        results = []
+        return self._fetch('search_vacancies', SEARCH_VACANCIES_SQL, (query, query, limit))
 
-        try:
-            conn = psycopg2.connect(**self.params)
-            cur = conn.cursor()
+    def get_avg_salary(self, cached=True):
+        """
+        Получает среднюю зарплату по всем вакансиям в рублях.
+        Зарплата вакансии - середина вилки, если указаны обе границы, иначе указанная граница.
 
-            sql_query = """
-                SELECT *
-                FROM vacancies
-                WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL;
-            """
-            cur.execute(sql_query)
-            results = cur.fetchall()
+        Args:
+            cached (bool): Читать готовое значение из salary_stats (актуально на момент
+                           последнего refresh_stats) или пересчитать по всей таблице.
 
-        except Exception as e:
-            print(f"❌ Ошибка при выполнении запроса 'get_vacancies_with_salary': {e}")
-            results = []
+        Returns:
+            float: Средняя зарплата в рублях или None, если нет данных.
+        """
+        return self._fetch('get_avg_salary', CACHED_AVG_SALARY_SQL if cached else AVG_SALARY_SQL, one=True)
 
-        finally:
-            if cur:
-                cur.close()
-            if conn:
-                conn.close()
+    def get_vacancies_with_higher_salary(self, cached=True):
+        """
+        Получает список всех вакансий, у которых зарплата выше средней по всем вакансиям
+        (сравнение в рублях: верхняя граница вилки больше средней).
 
-        return results
+        Args:
+            cached (bool): Брать среднюю из salary_stats, а не пересчитывать ее.
 
-    def get_vacancies_with_keyword(self, keyword):
+        Returns:
+            list: Список кортежей вакансий с зарплатой выше средней.
         """
-        Получает список всех вакансий, в названии которых содержится ключевое слово.
+        return self._fetch('get_vacancies_with_higher_salary', higher_salary_sql(cached))
+
+    def _fetch(self, name, sql_query, args=(), one=False):
+        """
+        Выполняет запрос на чтение. Если у менеджера есть кэш, результат сначала
+        ищется в нем по имени метода, запросу, параметрам и поколению данных.
 
         Args:
-            keyword (str): Ключевое слово для поиска в названии вакансии.
+            name (str): Имя метода (часть ключа кэша и сообщений об ошибках).
+            sql_query (str): SQL-запрос.
+            args (tuple): Параметры запроса.
+            one (bool): Вернуть первый столбец первой строки вместо списка строк.
 
         Returns:
-            list: Список кортежей вакансий, содержащих ключевое слово.
+            list: Строки результата (или одно значение при one=True). При ошибке -
+                  пустой список (None при one=True), такой результат не кэшируется;
+                  с raise_errors ошибка пробрасывается.
         """
         conn = None
         cur = None
-        results = []
+        results = None if one else []
 
         try:
-            conn = psycopg2.connect(**self.params)
+            conn = acquire_connection(self)
             cur = conn.cursor()
 
-            # SQL-запрос для получения вакансий по ключевому слову в названии
-            # ILIKE %s - ищет подстроку без учета регистра. %s - плейсхолдер.
-            sql_query = """
-                SELECT *
-                FROM vacancies
-                WHERE title ILIKE %s;
-            """
-            # Формируем ключевое слово для поиска с символами % вокруг него
-            # Это нужно для поиска подстроки в любом месте заголовка
-            search_keyword = f"%{keyword}%"
-
-            # Выполняем запрос, передавая SQL-строку и КОРТЕЖ со значением плейсхолдера
-            cur.execute(sql_query, (search_keyword,)) # <-- **ВАЖНО!** Передаем (search_keyword,) как кортеж!
-
-            results = cur.fetchall()
+            key = None
+            if self.cache is not None:
+                lookup_start = time.perf_counter()
+                # Поколение меняется после каждой записи: старые ключи больше не совпадут
+                key = (name, sql_query, tuple(args), get_data_generation(cur))
+                found, cached_results = self.cache.get(key)
+                if found:
+                    observe('db_query', time.perf_counter() - lookup_start, {'name': name, 'cache': 'hit'},
+                            rows=len(cached_results) if isinstance(cached_results, list) else 1)
+                    return cached_results
+
+            start = time.perf_counter()
+            cur.execute(sql_query, args)
+            if one:
+                row = cur.fetchone()  # Получаем первую строку результата
+                results = row[0] if row else None
+            else:
+                results = cur.fetchall()
+            seconds = time.perf_counter() - start
+            observe('db_query', seconds, {'name': name, 'cache': 'miss' if key is not None else 'off'},
+                    rows=len(results) if isinstance(results, list) else 1)
+            self._check_slow_query(cur, name, sql_query, args, seconds)
+
+            if key is not None:
+                self.cache.put(key, results)
 
         except Exception as e:
-            print(f"❌ Ошибка при выполнении запроса 'get_vacancies_with_keyword': {e}")
-            results = []
+            print(f"❌ Ошибка при выполнении запроса '{name}': {e}")
+            if self.raise_errors:
+                raise
+            results = None if one else []
 
         finally:
             if cur:
                 cur.close()
             if conn:
-                conn.close()
+                release_connection(self, conn)
 
         return results
-        
-    def get_avg_salary(self):
+
+    @staticmethod
+    def _check_slow_query(cur, name, sql_query, args, seconds):
+        """
+        Отмечает медленный запрос; если включено (Metrics.explain_slow), снимает его план
+        EXPLAIN (ANALYZE, BUFFERS). Запрос при этом выполняется еще раз.
         """
-        Получает среднюю зарплату по всем вакансиям.
-        Учитывает как нижнюю (salary_from), так и верхнюю (salary_to) границы зарплаты.
+        metrics = get_metrics()
+        if not metrics.is_slow_query(seconds):
+            return
+        plan = None
+        if metrics.explain_slow:
+            try:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql_query, args)
+                plan = '\n'.join(row[0] for row in cur.fetchall())
+            except Exception as e:
+                print(f"⚠️ Не удалось получить план запроса '{name}': {e}")
+        metrics.slow_query(name, seconds, sql_query, plan)
+
+    def _iter_query(self, name, sql_query, args=(), itersize=DEFAULT_ITERSIZE, reraise=False):
+        """
+        Выполняет запрос через именованный (серверный) курсор и отдает строки по одной.
 
-        Returns:
-            float: Средняя зарплата по всем вакансиям или None, если нет данных.
+        Клиент держит в памяти не больше itersize строк, сколько бы их ни вернул запрос.
+        При ошибке поток строк просто заканчивается, если не задан reraise (или
+        raise_errors у менеджера): тогда ошибка доходит до вызывающего кода,
+        и оборванный поток не примут за полный.
+
+        Args:
+            name (str): Имя запроса (для курсора и сообщений об ошибках).
+            sql_query (str): SQL-запрос.
+            args (list): Параметры запроса.
+            itersize (int): Сколько строк забирать с сервера за раз.
+            reraise (bool): Пробросить ошибку запроса после сообщения о ней.
+
+        Yields:
+            tuple: Строка результата.
         """
         conn = None
-        cur = None
-        avg_salary = None
+        rows = 0
+        start = time.perf_counter()
 
         try:
-            conn = psycopg2.connect(**self.params)
-            cur = conn.cursor()
-
-            # SQL-запрос для получения средней зарплаты
-            # COALESCE используется для замены NULL на 0
-            # NULLIF используется для предотвращения деления на 0
-            sql_query = """
-                SELECT AVG(COALESCE(salary_from, 0) + COALESCE(salary_to, 0)) / 
-                       NULLIF(CASE 
-                           WHEN salary_from IS NOT NULL AND salary_to IS NOT NULL THEN 2
-                           WHEN salary_from IS NOT NULL OR salary_to IS NOT NULL THEN 1
-                           ELSE 0
-                       END, 0) as avg_salary
-                FROM vacancies
-                WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL;
-            """
-            cur.execute(sql_query)
-            avg_salary = cur.fetchone()[0]  # Получаем первый элемент первой строки результата
+            conn = acquire_connection(self)
+            cur = conn.cursor(name=f'{name}_cursor')
+            cur.itersize = itersize
+            cur.execute(sql_query, args)
+            for row in cur:
+                rows += 1
+                yield row
 
         except Exception as e:
-            print(f"❌ Ошибка при выполнении запроса 'get_avg_salary': {e}")
-            avg_salary = None
+            print(f"❌ Ошибка при выполнении запроса '{name}': {e}")
+            if reraise or self.raise_errors:
+                raise
 
         finally:
-            if cur:
-                cur.close()
             if conn:
-                conn.close()
+                # Запрос только читает данные: откат завершает транзакцию
+                # и закрывает серверный курсор, даже если итерацию прервали.
+                # Оборванное соединение откатывать нельзя - пул его просто закроет
+                if not conn.closed:
+                    conn.rollback()
+                release_connection(self, conn)
+            # Время включает обработку строк вызывающим кодом между порциями
+            observe('db_query', time.perf_counter() - start, {'name': name, 'cache': 'stream'}, rows=rows)
+
+    def iter_all_vacancies(self, itersize=DEFAULT_ITERSIZE, limit=None, offset=None, after_id=None):
+        """
+        Потоковый вариант get_all_vacancies через серверный курсор.
 
-        return avg_salary
+        Args:
+            itersize (int): Сколько строк забирать с сервера за раз.
+            limit (int): Максимальное число строк.
+            offset (int): Сколько строк пропустить.
+            after_id: Keyset-пагинация - только вакансии с vacancy_id больше этого.
 
-    def get_vacancies_with_higher_salary(self):
+        Yields:
+            tuple: Вакансия в том же формате, что и в get_all_vacancies.
         """
-        Получает список всех вакансий, у которых зарплата выше средней по всем вакансиям.
+        sql_query, args = paginate(ALL_VACANCIES_SQL, 'vacancy_id', after_id, limit, offset)
+        return self._iter_query('iter_all_vacancies', sql_query, args, itersize)
 
-        Returns:
-            list: Список кортежей вакансий с зарплатой выше средней.
+    def iter_vacancies_with_salary(self, itersize=DEFAULT_ITERSIZE, limit=None, offset=None, after_id=None):
         """
-        conn = None
-        cur = None
-        results = []
+        Потоковый вариант get_vacancies_with_salary через серверный курсор.
 
-        try:
-            conn = psycopg2.connect(**self.params)
-            cur = conn.cursor()
+        Args:
+            itersize (int): Сколько строк забирать с сервера за раз.
+            limit (int): Максимальное число строк.
+            offset (int): Сколько строк пропустить.
+            after_id: Keyset-пагинация - только вакансии с vacancy_id больше этого.
 
-            # SQL-запрос для получения вакансий с зарплатой выше средней
-            # Используем подзапрос для вычисления средней зарплаты
-            sql_query = """
-                WITH avg_salary AS (
-                    SELECT AVG(COALESCE(salary_from, 0) + COALESCE(salary_to, 0)) / 
-                           NULLIF(CASE 
-                               WHEN salary_from IS NOT NULL AND salary_to IS NOT NULL THEN 2
-                               WHEN salary_from IS NOT NULL OR salary_to IS NOT NULL THEN 1
-                               ELSE 0
-                           END, 0) as avg_value
-                    FROM vacancies
-                    WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL
-                )
-                SELECT v.*, e.employer_name
-                FROM vacancies v
-                JOIN employers e ON v.employer_id = e.employer_id
-                WHERE (
-                    COALESCE(v.salary_from, 0) > (SELECT avg_value FROM avg_salary)
-                    OR
-                    COALESCE(v.salary_to, 0) > (SELECT avg_value FROM avg_salary)
-                )
-                AND (v.salary_from IS NOT NULL OR v.salary_to IS NOT NULL);
-            """
-            cur.execute(sql_query)
-            results = cur.fetchall()
+        Yields:
+            tuple: Вакансия в том же формате, что и в get_vacancies_with_salary.
+        """
+        sql_query, args = paginate(VACANCIES_WITH_SALARY_SQL, 'vacancy_id', after_id, limit, offset)
+        return self._iter_query('iter_vacancies_with_salary', sql_query, args, itersize)
 
-        except Exception as e:
-            print(f"❌ Ошибка при выполнении запроса 'get_vacancies_with_higher_salary': {e}")
-            results = []
+    def iter_vacancies_with_higher_salary(self, itersize=DEFAULT_ITERSIZE, limit=None, offset=None, after_id=None,
+                                          cached=True):
+        """
+        Потоковый вариант get_vacancies_with_higher_salary через серверный курсор.
 
-        finally:
-            if cur:
-                cur.close()
-            if conn:
-                conn.close()
+        Args:
+            itersize (int): Сколько строк забирать с сервера за раз.
+            limit (int): Максимальное число строк.
+            offset (int): Сколько строк пропустить.
+            after_id: Keyset-пагинация - только вакансии с vacancy_id больше этого.
+            cached (bool): Брать среднюю из salary_stats, а не пересчитывать ее.
+
+        Yields:
+            tuple: Вакансия в том же формате, что и в get_vacancies_with_higher_salary.
+        """
+        sql_query, args = paginate(higher_salary_sql(cached), 'vacancy_id', after_id, limit, offset)
+        return self._iter_query('iter_vacancies_with_higher_salary', sql_query, args, itersize)
 
-        return results
+    def iter_vacancies_for_index(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Открытые вакансии для индекса в памяти через серверный курсор.
+
+        Ошибка запроса (в том числе обрыв соединения посреди потока) пробрасывается:
+        индекс по части строк не должен сойти за полный.
+
+        Args:
+            itersize (int): Сколько строк забирать с сервера за раз.
+
+        Yields:
+            tuple: (vacancy_id, employer_id, title, salary_from_rub, salary_to_rub).
+        """
+        return self._iter_query('iter_vacancies_for_index', VACANCY_INDEX_SQL, (), itersize, reraise=True)
+
+    def iter_vacancy_snapshot(self, updated_since=None, itersize=DEFAULT_ITERSIZE):
+        """
+        Строки для выгрузки вакансий (столбцы VACANCY_SNAPSHOT_COLUMNS) через серверный курсор.
+
+        Ошибка запроса (в том числе обрыв соединения посреди потока) пробрасывается:
+        неполная выгрузка не должна сойти за полную.
+
+        Args:
+            updated_since (datetime): Только вакансии, измененные начиная с этого момента,
+                включая архивные - чтобы выгрузка узнала о закрытии. None - все открытые.
+            itersize (int): Сколько строк забирать с сервера за раз.
+
+        Yields:
+            tuple: Вакансия в порядке VACANCY_SNAPSHOT_COLUMNS.
+        """
+        if updated_since is None:
+            return self._iter_query('iter_vacancy_snapshot', VACANCY_SNAPSHOT_SQL + " WHERE NOT v.archived",
+                                    (), itersize, reraise=True)
+        return self._iter_query('iter_vacancy_snapshot', VACANCY_SNAPSHOT_SQL + " WHERE v.updated_at >= %s",
+                                (updated_since,), itersize, reraise=True)
+
+
+def employer_to_row(employer):
+    """
+    Превращает работодателя из API в кортеж для записи в таблицу 'employers'.
+
+    Args:
+        employer (dict): Данные работодателя (как из API).
+
+    Returns:
+        tuple: Значения в порядке EMPLOYER_COLUMNS.
+    """
+    return (employer.get('id'), employer.get('name'), employer.get('alternate_url'))
+
+
+def vacancy_to_row(vacancy, employer_id=None):
+    """
+    Превращает вакансию из API в кортеж для записи в таблицу 'vacancies'.
+
+    Args:
+        vacancy (dict): Данные вакансии (как из API).
+        employer_id (str): ID работодателя; если не передан, берется из vacancy['employer'].
+
+    Returns:
+        tuple: Значения в порядке VACANCY_COLUMNS.
+    """
+    if employer_id is None:
+        employer_id = (vacancy.get('employer') or {}).get('id')
+
+    # Извлекаем данные о зарплате, если они есть
+    salary_data = vacancy.get('salary') or {}
+
+    currency = salary_data.get('currency')
+    return (
+        vacancy.get('id'),
+        employer_id,
+        vacancy.get('name'),  # Название вакансии в данных API - 'name'
+        salary_data.get('from'),
+        salary_data.get('to'),
+        currency,
+        vacancy.get('alternate_url'),  # Ссылка на вакансию
+        # Зарплата в рублях по курсам из локального файла (exchange_rates.py)
+        to_rub(salary_data.get('from'), currency),
+        to_rub(salary_data.get('to'), currency),
+    )
+
+
+def vacancy_list_complete(company_data):
+    """
+    Полный ли список вакансий у компании.
+
+    HH отдает не больше 2000 вакансий на поиск: у работодателя с большим числом
+    вакансий часть не видна, и архивировать его "пропавшие" вакансии нельзя.
+    Признак 'vacancies_complete' ставит api_HH.iter_vacancy_pages; списки без
+    него (переданные вручную, старые запуски staging) считаются полными.
+
+    Args:
+        company_data (dict): Данные работодателя.
+
+    Returns:
+        bool: False, если список вакансий обрезан.
+    """
+    return company_data.get('vacancies_complete', True) is not False
+
+
+def iter_vacancy_rows(companies_data):
+    """
+    Лениво превращает вакансии всех компаний в строки для таблицы 'vacancies'.
+
+    Args:
+        companies_data (iterable): Словари компаний с ключом 'vacancies'.
+
+    Yields:
+        tuple: Значения в порядке VACANCY_COLUMNS.
+    """
+    for company_data in companies_data:
+        employer_id = company_data.get('id')
+        for vacancy in company_data.get('vacancies') or ():
+            yield vacancy_to_row(vacancy, employer_id)
+
+
+def batched(rows, batch_size):
+    """
+    Разбивает итератор строк на списки длиной не больше batch_size.
+
+    Yields:
+        list: Очередная пачка строк.
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_value(value):
+    """Форматирует значение для COPY ... WITH (FORMAT csv): NULL - пустое поле без кавычек."""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
 
 
-def save_employers_to_db(employers_data, params):
+def write_rows(cur, table, columns, key_column, rows, mode='batch', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Записывает строки в таблицу в рамках текущей транзакции курсора.
+    Конфликты по key_column пропускаются (ON CONFLICT DO NOTHING).
+
+    Args:
+        cur: Курсор psycopg2.
+        table (str): Имя таблицы.
+        columns (tuple): Столбцы в порядке значений строк.
+        key_column (str): Столбец уникального ключа для ON CONFLICT.
+        rows (iterable): Кортежи значений.
+        mode (str): 'row' - INSERT на каждую строку, 'batch' - execute_values,
+                    'copy' - COPY во временную таблицу и один INSERT ... SELECT на пачку.
+        batch_size (int): Размер пачки для режимов 'batch' и 'copy'.
+
+    Returns:
+        int: Сколько строк было передано на запись.
+    """
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Неизвестный режим записи '{mode}', ожидается один из {WRITE_MODES}")
+
+    with timer('db_write', {'table': table, 'mode': mode}) as fields:
+        fields['rows'] = _write_rows(cur, table, columns, key_column, rows, mode, batch_size)
+    return fields['rows']
+
+
+def _write_rows(cur, table, columns, key_column, rows, mode, batch_size):
+    column_list = ', '.join(columns)
+    conflict = f"ON CONFLICT ({key_column}) DO NOTHING"
+    total = 0
+
+    if mode == 'row':
+        placeholders = ', '.join(['%s'] * len(columns))
+        insert_sql = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}) {conflict};"
+        for row in rows:
+            cur.execute(insert_sql, row)
+            total += 1
+        return total
+
+    if mode == 'batch':
+        insert_sql = f"INSERT INTO {table} ({column_list}) VALUES %s {conflict};"
+        for batch in batched(rows, batch_size):
+            psycopg2.extras.execute_values(cur, insert_sql, batch, page_size=batch_size)
+            total += len(batch)
+        return total
+
+    # mode == 'copy': временная таблица с теми же типами столбцов, удаляется при COMMIT.
+    # Имя со схемой pg_temp: DROP не заденет постоянную таблицу с тем же именем
+    stage = f"pg_temp.{table}_stage"
+    cur.execute(f"DROP TABLE IF EXISTS {stage};")
+    cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA;")
+    for batch in batched(rows, batch_size):
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write(','.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} {conflict};")
+        cur.execute(f"TRUNCATE {stage};")
+        total += len(batch)
+    return total
+
+
+def save_employers_to_db(employers_data, params, mode='batch', batch_size=DEFAULT_BATCH_SIZE):
     """
     Сохраняет данные о работодателях в таблицу 'employers'.
     Использует ON CONFLICT DO NOTHING.
+
+    Args:
+        employers_data (iterable): Словари работодателей (как из API).
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        mode (str): Режим записи, см. WRITE_MODES.
+        batch_size (int): Размер пачки для режимов 'batch' и 'copy'.
     """
     conn = None
     cur = None
 
     try:
-        conn = psycopg2.connect(**params)
+        conn = acquire_connection(params)
         cur = conn.cursor()
 
-        insert_employer_sql = """
-            INSERT INTO employers (employer_id, employer_name, employer_url)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (employer_id) DO NOTHING;
-        """
-        for employer in employers_data:
-            employer_id = employer.get('id')
-            employer_name = employer.get('name')
-            employer_url = employer.get('alternate_url')
-            employer_values = (employer_id, employer_name, employer_url)
-            cur.execute(insert_employer_sql, employer_values)
+        rows = (employer_to_row(employer) for employer in employers_data)
+        write_rows(cur, 'employers', EMPLOYER_COLUMNS, 'employer_id', rows, mode, batch_size)
 
         conn.commit()
+        mark_data_changed(conn)
 
     except psycopg2.errors.UniqueViolation as e:
          print(f"ℹ️ Попытка вставить дубликат работодателя: {e}")
@@ -424,74 +1170,35 @@ def save_employers_to_db(employers_data, params):
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_connection(params, conn)
 
 
-def save_vacancies_to_db(companies_data, params):
+def save_vacancies_to_db(companies_data, params, mode='batch', batch_size=DEFAULT_BATCH_SIZE):
     """
     Сохраняет данные о вакансиях из списка компаний в таблицу 'vacancies'.
-    Использует ON CONFLICT DO NOTHING.
+    Использует ON CONFLICT DO NOTHING. Все пишется одной транзакцией; большие
+    объемы лучше загружать частями с контрольными точками (chunked_load.load_chunked).
 
     Args:
-        companies_data (list): Список словарей с данными о компаниях (как из API),
-                               каждый словарь содержит список вакансий.
-        params (dict): Параметры подключения к PostgreSQL.
+        companies_data (iterable): Словари с данными о компаниях (как из API),
+                                   в ключе 'vacancies' - список или итератор
+                                   вакансий (например, `api_HH.iter_vacancies`).
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        mode (str): Режим записи, см. WRITE_MODES.
+        batch_size (int): Размер пачки для режимов 'batch' и 'copy'.
     """
     conn = None
     cur = None
 
     try:
-        conn = psycopg2.connect(**params)
+        conn = acquire_connection(params)
         cur = conn.cursor()
 
-        insert_vacancy_sql = """
-            INSERT INTO vacancies (vacancy_id, employer_id, title, salary_from, salary_to, salary_currency, url)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (vacancy_id) DO NOTHING;
-        """
-
-        # Перебираем каждую компанию в списке
-        for company_data in companies_data:
-            employer_id = company_data.get('id') # Получаем ID работодателя для вакансий этой компании
-
-            # Проверяем, есть ли у компании список вакансий и что он не пустой
-            vacancies_list = company_data.get('vacancies')
-            if not vacancies_list:
-                continue # Если вакансий нет, переходим к следующей компании
-
-            # Перебираем каждую вакансию в списке вакансий этой компании
-            for vacancy in vacancies_list:
-                vacancy_id = vacancy.get('id')
-                title = vacancy.get('name') # Название вакансии в данных API - 'name'
-                url = vacancy.get('alternate_url') # Ссылка на вакансию
-
-                # Извлекаем данные о зарплате, если они есть
-                salary_data = vacancy.get('salary')
-                salary_from = None
-                salary_to = None
-                salary_currency = None
-
-                if salary_data: # Проверяем, есть ли поле 'salary'
-                    salary_from = salary_data.get('from')
-                    salary_to = salary_data.get('to')
-                    salary_currency = salary_data.get('currency')
-
-                # Собираем данные вакансии в кортеж.
-                # Порядок ДОЛЖЕН совпадать с порядком столбцов в INSERT!
-                vacancy_values = (
-                    vacancy_id,
-                    employer_id, # Используем ID работодателя, полученный из внешнего цикла
-                    title,
-                    salary_from,
-                    salary_to,
-                    salary_currency,
-                    url
-                )
-
-                # Выполняем SQL команду для вставки данных одной вакансии
-                cur.execute(insert_vacancy_sql, vacancy_values)
+        write_rows(cur, 'vacancies', VACANCY_COLUMNS, 'vacancy_id',
+                   iter_vacancy_rows(companies_data), mode, batch_size)
 
         conn.commit()
+        mark_data_changed(conn)
 
     except psycopg2.errors.UniqueViolation as e:
          print(f"ℹ️ Попытка вставить дубликат вакансии: {e}")
@@ -505,5 +1212,226 @@ def save_vacancies_to_db(companies_data, params):
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_connection(params, conn)
+
+
+
+# Столбцы инкрементальной синхронизации: к обычным добавляются данные для сравнения версий
+SYNC_EMPLOYER_COLUMNS = EMPLOYER_COLUMNS + ('open_vacancies', 'content_hash')
+SYNC_VACANCY_COLUMNS = VACANCY_COLUMNS + ('published_at', 'content_hash')
+
+
+def content_hash(values):
+    """
+    Считает хэш содержимого строки, чтобы не перезаписывать неизменившиеся данные.
+
+    Args:
+        values (tuple): Значения строки.
+
+    Returns:
+        str: MD5 в шестнадцатеричном виде (32 символа).
+    """
+    payload = json.dumps(values, ensure_ascii=False, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def employer_to_sync_row(employer):
+    """Строка для SYNC_EMPLOYER_COLUMNS: данные работодателя и хэш их содержимого."""
+    row = employer_to_row(employer) + (employer.get('open_vacancies'),)
+    return row + (content_hash(row),)
+
+
+def vacancy_to_sync_row(vacancy, employer_id=None):
+    """Строка для SYNC_VACANCY_COLUMNS: данные вакансии и хэш их содержимого."""
+    row = vacancy_to_row(vacancy, employer_id) + (vacancy.get('published_at'),)
+    return row + (content_hash(row),)
+
+
+def upsert_changed_rows(cur, table, columns, key_column, rows, batch_size=DEFAULT_BATCH_SIZE, extra_set=''):
+    """
+    Вставляет новые строки и обновляет только те, у которых изменился content_hash.
+
+    Args:
+        cur: Курсор psycopg2.
+        table (str): Имя таблицы.
+        columns (tuple): Столбцы в порядке значений строк, включая content_hash.
+        key_column (str): Столбец уникального ключа (первый в строке).
+        rows (iterable): Кортежи значений.
+        batch_size (int): Размер пачки.
+        extra_set (str): Дополнительные присваивания для обновляемых строк.
+
+    Returns:
+        tuple: (вставлено, обновлено, передано всего).
+    """
+    column_list = ', '.join(columns)
+    assignments = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns if column != key_column)
+    upsert_sql = f"""
+        INSERT INTO {table} ({column_list}) VALUES %s
+        ON CONFLICT ({key_column}) DO UPDATE
+        SET {assignments}, updated_at = now(){extra_set}
+        WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING (xmax = 0) AS inserted;
+    """
+    start = time.perf_counter()
+    inserted = updated = total = 0
+    for batch in batched(rows, batch_size):
+        total += len(batch)
+        # Одна команда не может обновить строку дважды, поэтому дубликаты
+        # внутри пачки (вакансия, попавшая на две страницы) схлопываем
+        unique_batch = list({row[0]: row for row in batch}.values())
+        results = psycopg2.extras.execute_values(cur, upsert_sql, unique_batch, page_size=batch_size, fetch=True)
+        for (is_inserted,) in results:
+            if is_inserted:
+                inserted += 1
+            else:
+                updated += 1
+    observe('db_write', time.perf_counter() - start, {'table': table, 'mode': 'upsert'},
+            rows=total, inserted=inserted, updated=updated)
+    return inserted, updated, total
+
+
+def sync_employers_to_db(employers_data, params, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Инкрементально синхронизирует работодателей: новые вставляются,
+    изменившиеся обновляются, неизменившиеся не перезаписываются.
+
+    Args:
+        employers_data (iterable): Словари работодателей (как из API).
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        batch_size (int): Размер пачки.
+
+    Returns:
+        dict: Счетчики 'inserted', 'updated', 'unchanged' или None при ошибке.
+    """
+    conn = None
+    cur = None
+    summary = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        rows = (employer_to_sync_row(employer) for employer in employers_data)
+        inserted, updated, total = upsert_changed_rows(
+            cur, 'employers', SYNC_EMPLOYER_COLUMNS, 'employer_id', rows, batch_size
+        )
+        conn.commit()
+        if inserted or updated:
+            mark_data_changed(conn)
+
+        summary = {'inserted': inserted, 'updated': updated, 'unchanged': total - inserted - updated}
+        print(f"✅ Работодатели: новых {inserted}, изменилось {updated}, без изменений {summary['unchanged']}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при синхронизации работодателей: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return summary
+
+
+def sync_vacancies_to_db(companies_data, params, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Инкрементально синхронизирует вакансии переданных компаний.
+
+    Новые вакансии вставляются, изменившиеся (по content_hash) обновляются,
+    неизменившиеся не перезаписываются. Вакансии этих компаний, которых нет
+    в свежем обходе, помечаются archived = TRUE; если архивная вакансия снова
+    появилась, пометка снимается. Поэтому в companies_data должен быть полный
+    список вакансий каждой компании; компании, у которых он обрезан
+    (см. vacancy_list_complete), не архивируются.
+
+    Args:
+        companies_data (iterable): Словари компаний (как из API), в ключе
+                                   'vacancies' - список или итератор вакансий.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        batch_size (int): Размер пачки.
+
+    Returns:
+        dict: Счетчики 'inserted', 'updated', 'unchanged', 'archived' или None при ошибке.
+    """
+    conn = None
+    cur = None
+    summary = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        # Временные таблицы с ID из текущего обхода; типы берем из основных таблиц
+        cur.execute("""
+            CREATE TEMP TABLE sync_seen_vacancies ON COMMIT DROP AS
+            SELECT vacancy_id FROM vacancies WITH NO DATA;
+            CREATE TEMP TABLE sync_crawled_employers ON COMMIT DROP AS
+            SELECT employer_id FROM employers WITH NO DATA;
+        """)
+
+        crawled_employers = []
+
+        def rows_with_tracking():
+            for company_data in companies_data:
+                employer_id = company_data.get('id')
+                seen = []
+                for vacancy in company_data.get('vacancies') or ():
+                    row = vacancy_to_sync_row(vacancy, employer_id)
+                    seen.append((row[0],))
+                    if len(seen) >= batch_size:
+                        psycopg2.extras.execute_values(cur, "INSERT INTO sync_seen_vacancies VALUES %s", seen)
+                        seen = []
+                    yield row
+                if seen:
+                    psycopg2.extras.execute_values(cur, "INSERT INTO sync_seen_vacancies VALUES %s", seen)
+                # Признак полноты известен только после обхода всех страниц
+                if vacancy_list_complete(company_data):
+                    crawled_employers.append((employer_id,))
+
+        inserted, updated, total = upsert_changed_rows(
+            cur, 'vacancies', SYNC_VACANCY_COLUMNS, 'vacancy_id', rows_with_tracking(), batch_size,
+            extra_set=', archived = FALSE'
+        )
+        # Архивная вакансия с прежним хэшем не обновилась выше - возвращаем ее отдельно
+        cur.execute("""
+            UPDATE vacancies v SET archived = FALSE, updated_at = now()
+            FROM sync_seen_vacancies s
+            WHERE v.vacancy_id = s.vacancy_id AND v.archived;
+        """)
+        updated += cur.rowcount
+
+        psycopg2.extras.execute_values(cur, "INSERT INTO sync_crawled_employers VALUES %s", crawled_employers)
+        cur.execute("""
+            UPDATE vacancies v SET archived = TRUE, updated_at = now()
+            WHERE NOT v.archived
+              AND v.employer_id IN (SELECT employer_id FROM sync_crawled_employers)
+              AND NOT EXISTS (SELECT 1 FROM sync_seen_vacancies s WHERE s.vacancy_id = v.vacancy_id);
+        """)
+        archived = cur.rowcount
+
+        conn.commit()
+        if inserted or updated or archived:
+            mark_data_changed(conn)
+
+        summary = {
+            'inserted': inserted,
+            'updated': updated,
+            'unchanged': max(0, total - inserted - updated),
+            'archived': archived,
+        }
+        print(f"✅ Вакансии: новых {inserted}, изменилось {updated}, "
+              f"без изменений {summary['unchanged']}, закрыто {archived}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при синхронизации вакансий: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
 
+    return summary
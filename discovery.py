@@ -0,0 +1,399 @@
+# discovery.py - Поиск работодателей через поисковые запросы API hh.ru
+#
+# Вместо заранее известного списка ID работодатели находятся постранично
+# через GET /employers (или GET /vacancies) с фильтрами по области и отрасли.
+# Один поиск HH отдает не больше 2000 результатов, поэтому поиск режется на
+# срезы (область, отрасль). Если в срезе найдено больше, он делится на
+# дочерние области, а где их нет - на отрасли. Результаты, привязанные прямо
+# к области-родителю (разница между найденным в нем и в дочерних), ищутся
+# отдельно по отраслям, а если делить некуда - учитываются как недоступные.
+# Страницы всех срезов
+# загружаются параллельно, ID проходят через битовую карту (бит на возможный
+# ID), и только новые пачками уходят в очередь crawl_jobs.
+#
+# Состояние обхода - курсор в JSON-файле: незаконченные срезы с последней
+# подряд загруженной страницей и битовая карта найденных ID. Курсор пишется
+# после того, как найденные ID поставлены в очередь, поэтому прерванный поиск
+# продолжается с тех же страниц и ничего не теряет.
+
+import base64
+import json
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from api_HH import HH_API, fetch_json
+from crawl_queue import enqueue_employers
+
+
+# HH отдает не больше 2000 результатов одного поиска (page * per_page < 2000)
+SEARCH_DEPTH = 2000
+# Максимальный размер страницы поиска, который разрешает HH
+SEARCH_PER_PAGE = 100
+
+DEFAULT_DISCOVERY_CONCURRENCY = 20
+DEFAULT_CURSOR_PATH = 'discovery_cursor.json'
+DEFAULT_ENQUEUE_BATCH = 1000     # Новых ID в одной вставке в crawl_jobs
+DEFAULT_CHECKPOINT_PAGES = 50    # Курсор сохраняется через столько загруженных страниц
+
+# Источник -> (путь поиска, фильтры, которые он принимает, постоянные параметры).
+# Поиск работодателей HH не фильтрует по отрасли - для отраслей нужен поиск вакансий
+SOURCES = {
+    'employers': ('employers', ('area',), {'only_with_vacancies': 'true'}),
+    'vacancies': ('vacancies', ('area', 'industry'), {}),
+}
+
+
+class EmployerIdSet:
+    """
+    Множество ID работодателей в битовой карте: бит на каждый ID до самого
+    большого. ID на hh.ru - плотные целые до ~10^7, поэтому карта на все ID
+    занимает ~1.2 МБ, а set из int на сотни тысяч ID - десятки МБ.
+    """
+
+    def __init__(self, data=b''):
+        """
+        Args:
+            data (bytes): Битовая карта из to_bytes().
+        """
+        self._bits = bytearray(data)
+        self._count = int.from_bytes(self._bits, 'little').bit_count()
+
+    def add(self, employer_id):
+        """
+        Добавляет ID.
+
+        Returns:
+            bool: True, если ID раньше не встречался.
+        """
+        index, mask = employer_id >> 3, 1 << (employer_id & 7)
+        if index >= len(self._bits):
+            # Растем не меньше чем вдвое: новые ID приходят вразнобой
+            self._bits.extend(bytes(max(index + 1 - len(self._bits), len(self._bits))))
+        if self._bits[index] & mask:
+            return False
+        self._bits[index] |= mask
+        self._count += 1
+        return True
+
+    def __contains__(self, employer_id):
+        index = employer_id >> 3
+        return index < len(self._bits) and bool(self._bits[index] & 1 << (employer_id & 7))
+
+    def __len__(self):
+        return self._count
+
+    def to_bytes(self):
+        """Битовая карта без нулевого хвоста."""
+        return bytes(self._bits).rstrip(b'\0')
+
+    def to_json(self):
+        """Карта для курсора: сжатая zlib (в ней длинные серии нулей) и в base64."""
+        return base64.b64encode(zlib.compress(self.to_bytes())).decode('ascii')
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(zlib.decompress(base64.b64decode(value)))
+
+
+def read_cursor(path):
+    """
+    Читает курсор поиска.
+
+    Returns:
+        dict: Состояние поиска или None, если курсора нет.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_cursor(path, cursor):
+    """Записывает курсор атомарно (через временный файл)."""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(cursor, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def fetch_area_tree():
+    """
+    Загружает дерево областей HH (GET /areas).
+
+    Returns:
+        dict: ID области -> список ID дочерних областей; None - верхние области.
+    """
+    children = {None: []}
+
+    def walk(areas, parent_id):
+        for area in areas:
+            children.setdefault(parent_id, []).append(area['id'])
+            walk(area.get('areas') or [], area['id'])
+
+    walk(fetch_json(f'{HH_API}areas'), None)
+    return children
+
+
+def fetch_industries():
+    """Загружает ID отраслей верхнего уровня (GET /industries)."""
+    return [industry['id'] for industry in fetch_json(f'{HH_API}industries')]
+
+
+def new_slice(area, industry):
+    # page - первая страница, которая еще не загружена (все до нее - загружены),
+    # pages и found становятся известны после первой страницы
+    return {'area': area, 'industry': industry, 'page': 0, 'pages': None, 'found': None}
+
+
+def slice_key(slice_):
+    return slice_['area'], slice_['industry']
+
+
+def search_employer_ids(source, items):
+    """ID работодателей на странице поиска (у анонимных вакансий работодателя нет)."""
+    if source == 'employers':
+        return [int(item['id']) for item in items]
+    return [int(item['employer']['id']) for item in items if (item.get('employer') or {}).get('id')]
+
+
+def discover_employers(params, areas=None, industries=None, source='employers', cursor_path=DEFAULT_CURSOR_PATH,
+                       concurrency=DEFAULT_DISCOVERY_CONCURRENCY, enqueue_batch=DEFAULT_ENQUEUE_BATCH,
+                       checkpoint_pages=DEFAULT_CHECKPOINT_PAGES, reset=False, sink=None):
+    """
+    Находит работодателей поиском HH и ставит новых в очередь crawl_jobs.
+
+    Поиск идет срезами (область, отрасль). Срез, в котором найдено больше
+    SEARCH_DEPTH результатов, дополнительно делится на дочерние области,
+    а если их нет - на отрасли (только для source='vacancies'). Когда у всех
+    частей известно число найденного, оно сверяется с найденным в срезе:
+    остаток - это результаты, привязанные прямо к области-родителю. Они
+    ищутся срезами (область-родитель, отрасль); если делить по отраслям
+    нельзя (source='employers' или отрасль уже задана), остаток попадает
+    в 'truncated' - из него доступны только первые SEARCH_DEPTH результатов
+    самого среза.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        areas (list): ID областей; по умолчанию - верхние области из GET /areas.
+        industries (list): ID отраслей (только для source='vacancies').
+        source (str): 'employers' - поиск работодателей, 'vacancies' - работодатели найденных вакансий.
+        cursor_path (str): Файл курсора; если он есть, поиск продолжается с него.
+        concurrency (int): Одновременных запросов к API.
+        enqueue_batch (int): Новых ID в одной вставке в очередь.
+        checkpoint_pages (int): Через сколько загруженных страниц сохранять курсор.
+        reset (bool): Начать поиск заново, не глядя на курсор.
+        sink (callable): Куда отдавать пачки новых ID (по умолчанию - enqueue_employers);
+                         должен вернуть None при ошибке.
+
+    Returns:
+        dict: Итог поиска ('employers', 'pages', 'slices_left', 'failed_pages', 'truncated', ...)
+              или None при ошибке.
+    """
+    if source not in SOURCES:
+        print(f"❌ Неизвестный источник поиска: {source}")
+        return None
+    path, filters, fixed_params = SOURCES[source]
+    if industries and 'industry' not in filters:
+        print(f"❌ Поиск {source} не фильтрует по отрасли, используйте source='vacancies'")
+        return None
+    if sink is None:
+        def sink(employer_ids):
+            return enqueue_employers(employer_ids, params)
+
+    try:
+        area_tree = fetch_area_tree()
+        split_industries = (industries or fetch_industries()) if 'industry' in filters else []
+    except Exception as e:
+        print(f"❌ Ошибка при загрузке справочников HH: {e}")
+        return None
+
+    options = {'source': source, 'areas': areas or None, 'industries': industries or None}
+    cursor = None if reset else read_cursor(cursor_path)
+    if cursor is not None and {key: cursor.get(key) for key in options} != options:
+        print(f"❌ Курсор {cursor_path} относится к другому поиску {({key: cursor.get(key) for key in options})}; "
+              f"начните заново с reset=True (--reset)")
+        return None
+    if cursor is None:
+        cursor = dict(options, slices=[new_slice(area, industry)
+                                       for area in (areas or area_tree[None])
+                                       for industry in (industries or [None])],
+                      finished=[], truncated=[], splits=[], pages=0, seen=None)
+    else:
+        print(f"ℹ️ Продолжаем поиск с курсора {cursor_path}: срезов осталось {len(cursor['slices'])}")
+    cursor.setdefault('splits', [])
+
+    seen = EmployerIdSet.from_json(cursor['seen']) if cursor['seen'] else EmployerIdSet()
+    # В finished рядом с ключом среза хранится число найденного в нем - для сверки делений
+    known = {slice_key(slice_) for slice_ in cursor['slices']} | {tuple(key[:2]) for key in cursor['finished']}
+    found_by_key = {slice_key(slice_): slice_['found'] for slice_ in cursor['slices'] if slice_['found'] is not None}
+    found_by_key.update((tuple(key[:2]), key[2]) for key in cursor['finished'] if len(key) > 2)
+    done_pages = {}   # Срез -> загруженные страницы после первой незагруженной
+    new_ids = []
+    failed_pages = 0
+    unsaved_pages = 0
+    start = time.perf_counter()
+
+    def request(slice_, page):
+        query = dict(fixed_params, page=page, per_page=SEARCH_PER_PAGE)
+        query.update((name, slice_[name]) for name in filters if slice_[name] is not None)
+        return fetch_json(f'{HH_API}{path}', params=query)
+
+    def add_parts(area, industry, found, parts, by_area):
+        """Ставит в поиск части среза и запоминает деление для сверки найденного."""
+        cursor['splits'].append({'area': area, 'industry': industry, 'found': found, 'by_area': by_area,
+                                 'parts': [list(slice_key(part)) for part in parts]})
+        parts = [part for part in parts if slice_key(part) not in known]
+        known.update(map(slice_key, parts))
+        cursor['slices'].extend(parts)
+        ready.extend((part, 0) for part in parts)
+
+    def truncate(area, industry, found, message):
+        cursor['truncated'].append([area, industry, found])
+        print(f"⚠️ Срез {(area, industry)}: {message}, доступны только первые {SEARCH_DEPTH}")
+
+    def split(slice_):
+        """
+        Делит slice_ на дочерние области, а без них - на отрасли.
+
+        Returns:
+            bool: False, если делить некуда.
+        """
+        children = area_tree.get(slice_['area'], [])
+        if children:
+            parts = [new_slice(area, slice_['industry']) for area in children]
+        elif slice_['industry'] is None:
+            parts = [new_slice(slice_['area'], industry) for industry in split_industries]
+        else:
+            return False
+        if not parts:
+            return False
+        add_parts(slice_['area'], slice_['industry'], slice_['found'], parts, bool(children))
+        return True
+
+    def check_splits():
+        """
+        Сверяет найденное в поделенных срезах с суммой по их частям.
+
+        Остаток при делении по областям - результаты самой области-родителя:
+        они ищутся по отраслям, а если это невозможно - срез считается обрезанным.
+        """
+        for check in list(cursor['splits']):
+            founds = [found_by_key.get(tuple(key)) for key in check['parts']]
+            if None in founds:
+                continue   # Не у всех частей загружена первая страница
+            cursor['splits'].remove(check)
+            remainder = check['found'] - sum(founds)
+            if remainder <= 0:
+                continue
+            if check['by_area'] and check['industry'] is None and split_industries:
+                add_parts(check['area'], None, check['found'],
+                          [new_slice(check['area'], industry) for industry in split_industries], False)
+            else:
+                truncate(check['area'], check['industry'], remainder,
+                         f"{remainder} результатов не попали ни в одну из частей")
+
+    def flush():
+        """Ставит накопленные новые ID в очередь. Returns: bool - удалось ли."""
+        if new_ids:
+            if sink(list(new_ids)) is None:
+                return False
+            new_ids.clear()
+        return True
+
+    def checkpoint():
+        if not flush():
+            return False
+        cursor['seen'] = seen.to_json()
+        write_cursor(cursor_path, cursor)
+        return True
+
+    # Сначала первые страницы всех срезов: по ним видно, сколько страниц у каждого
+    ready = deque((slice_, slice_['page']) for slice_ in cursor['slices'] if slice_['pages'] is None)
+    ready.extend((slice_, page) for slice_ in cursor['slices'] if slice_['pages'] is not None
+                 for page in range(slice_['page'], slice_['pages']))
+    in_flight = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    ok = True
+    # Деления, части которых успел найти прерванный запуск
+    check_splits()
+
+    try:
+        while ready or in_flight:
+            while ready and len(in_flight) < concurrency:
+                slice_, page = ready.popleft()
+                in_flight[executor.submit(request, slice_, page)] = (slice_, page)
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                slice_, page = in_flight.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    # Срез остается в курсоре с этой страницы: ее загрузит следующий запуск
+                    failed_pages += 1
+                    print(f"⚠️ Страница {page} среза {slice_key(slice_)} не загружена: {e}")
+                    continue
+
+                if slice_['pages'] is None:
+                    slice_['found'] = data.get('found', 0)
+                    slice_['pages'] = min(data.get('pages', 0), SEARCH_DEPTH // SEARCH_PER_PAGE)
+                    found_by_key[slice_key(slice_)] = slice_['found']
+                    ready.extend((slice_, next_page) for next_page in range(page + 1, slice_['pages']))
+                    if slice_['found'] > SEARCH_DEPTH and not split(slice_):
+                        truncate(slice_['area'], slice_['industry'], slice_['found'], f"найдено {slice_['found']}")
+                    check_splits()
+
+                new_ids.extend(filter(seen.add, search_employer_ids(source, data.get('items', []))))
+                if len(new_ids) >= enqueue_batch and not flush():
+                    ok = False
+                    break
+
+                pages = done_pages.setdefault(slice_key(slice_), set())
+                pages.add(page)
+                while slice_['page'] in pages:
+                    pages.discard(slice_['page'])
+                    slice_['page'] += 1
+                if slice_['page'] >= slice_['pages']:
+                    cursor['slices'].remove(slice_)
+                    cursor['finished'].append([slice_['area'], slice_['industry'], slice_['found']])
+                    done_pages.pop(slice_key(slice_), None)
+
+                cursor['pages'] += 1
+                unsaved_pages += 1
+
+            if not ok:
+                break
+            if unsaved_pages >= checkpoint_pages:
+                if not checkpoint():
+                    ok = False
+                    break
+                unsaved_pages = 0
+                print(f"📊 Поиск: страниц {cursor['pages']}, работодателей {len(seen)}, "
+                      f"срезов осталось {len(cursor['slices'])}")
+    except KeyboardInterrupt:
+        print("⚠️ Поиск прерван, курсор сохраняется")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Курсор не пишется, если ID не удалось поставить в очередь:
+        # тогда следующий запуск заново загрузит эти страницы
+        if ok and not checkpoint():
+            ok = False
+
+    if not ok:
+        print("❌ Не удалось поставить найденных работодателей в очередь, курсор не обновлен")
+        return None
+
+    summary = {
+        'employers': len(seen),
+        'pages': cursor['pages'],
+        'slices_done': len(cursor['finished']),
+        'slices_left': len(cursor['slices']),
+        'failed_pages': failed_pages,
+        'truncated': len(cursor['truncated']),
+        'seconds': round(time.perf_counter() - start, 1),
+    }
+    print(f"✅ Поиск работодателей: {summary}")
+    return summary
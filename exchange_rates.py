@@ -0,0 +1,133 @@
+# exchange_rates.py - Курсы валют для пересчета зарплат в рубли
+#
+# Курсы берутся из локального файла (работает без сети) и кэшируются в
+# процессе: vacancy_to_row пересчитывает зарплату при каждой записи вакансии,
+# не обращаясь ни к файлу, ни к БД. Таблица exchange_rates в БД повторяет
+# файл - по ней пересчитываются уже сохраненные вакансии (db.update_exchange_rates).
+
+import json
+import os
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+
+DEFAULT_RATES_PATH = os.getenv('HH_EXCHANGE_RATES_FILE',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exchange_rates.json'))
+
+_rates = None
+_rates_lock = threading.Lock()
+
+
+def read_rates_file(path=DEFAULT_RATES_PATH):
+    """
+    Читает курсы из файла вида {"date": ..., "rates": {"USD": 80.5, ...}}.
+
+    Args:
+        path (str): Путь к JSON-файлу.
+
+    Returns:
+        dict: Код валюты hh.ru -> рублей за единицу (Decimal).
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f, parse_float=Decimal)
+    return {currency.upper(): Decimal(rate) for currency, rate in data['rates'].items()}
+
+
+def get_rates():
+    """Курсы из файла по умолчанию; файл читается один раз на процесс."""
+    global _rates
+    if _rates is None:
+        with _rates_lock:
+            if _rates is None:
+                _rates = read_rates_file()
+    return _rates
+
+
+def reload_rates(path=DEFAULT_RATES_PATH):
+    """
+    Перечитывает курсы из файла (после его обновления).
+
+    Returns:
+        dict: Новые курсы.
+    """
+    global _rates
+    rates = read_rates_file(path)
+    with _rates_lock:
+        _rates = rates
+    return rates
+
+
+def to_rub(amount, currency, rates=None):
+    """
+    Пересчитывает сумму в рубли.
+
+    Args:
+        amount (int | float): Сумма в валюте вакансии.
+        currency (str): Код валюты hh.ru ('RUR', 'USD', ...).
+        rates (dict): Курсы (по умолчанию - get_rates()).
+
+    Returns:
+        int: Сумма в рублях или None, если сумма не указана или курс валюты неизвестен.
+    """
+    if amount is None or not currency:
+        return None
+    rate = (rates if rates is not None else get_rates()).get(currency.upper())
+    if rate is None:
+        return None
+    # Точная арифметика и округление половины вверх - как round(NUMERIC) в recompute_salary_rub;
+    # дробную сумму API переводим в Decimal через строку, без двоичного хвоста float
+    return int((Decimal(str(amount)) * rate).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def store_rates(cur, rates):
+    """
+    Записывает курсы в таблицу exchange_rates (создает ее при необходимости).
+
+    Args:
+        cur: Курсор psycopg2 внутри открытой транзакции.
+        rates (dict): Код валюты -> рублей за единицу.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            currency VARCHAR(10) PRIMARY KEY,
+            rate NUMERIC NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("DELETE FROM exchange_rates;")
+    cur.executemany("INSERT INTO exchange_rates (currency, rate) VALUES (%s, %s);", sorted(rates.items()))
+
+
+def recompute_salary_rub(cur):
+    """
+    Пересчитывает salary_from_rub и salary_to_rub всех вакансий по таблице exchange_rates.
+
+    У изменившихся вакансий обновляется updated_at, чтобы пересчет попал
+    в инкрементальную выгрузку (export.export_vacancies).
+
+    Args:
+        cur: Курсор psycopg2 внутри открытой транзакции.
+
+    Returns:
+        int: Сколько вакансий изменилось.
+    """
+    # Сумма в рублях округляется до целого, как в to_rub
+    cur.execute("""
+        UPDATE vacancies v
+        SET salary_from_rub = round(v.salary_from * r.rate)::integer,
+            salary_to_rub = round(v.salary_to * r.rate)::integer,
+            updated_at = now()
+        FROM exchange_rates r
+        WHERE r.currency = upper(v.salary_currency)
+          AND (v.salary_from_rub IS DISTINCT FROM round(v.salary_from * r.rate)::integer
+               OR v.salary_to_rub IS DISTINCT FROM round(v.salary_to * r.rate)::integer);
+    """)
+    changed = cur.rowcount
+    # Валюты без курса: сумма в рублях неизвестна
+    cur.execute("""
+        UPDATE vacancies v
+        SET salary_from_rub = NULL, salary_to_rub = NULL, updated_at = now()
+        WHERE (v.salary_from_rub IS NOT NULL OR v.salary_to_rub IS NOT NULL)
+          AND NOT EXISTS (SELECT 1 FROM exchange_rates r WHERE r.currency = upper(v.salary_currency));
+    """)
+    return changed + cur.rowcount
@@ -0,0 +1,429 @@
+# export.py - Выгрузка вакансий в Parquet для аналитики без обращения к PostgreSQL
+#
+# Соединение vacancies и employers читается серверным курсором, строки
+# собираются в пачки Arrow (RecordBatch) по столбцам и пишутся в Parquet,
+# разложенный по каталогам employer_id=.../month=.... Повторная выгрузка
+# дописывает только вакансии, измененные после прошлой (по updated_at);
+# VacancySnapshot отображает файлы в память (mmap) и оставляет для каждой
+# вакансии последнюю выгруженную версию. Каждое дописывание добавляет по
+# маленькому файлу в каталоги затронутых работодателей, поэтому каталог, где
+# файлов набралось DEFAULT_COMPACT_FILES, переписывается одним файлом
+# (compact_snapshot) - в нем остается только последняя версия каждой вакансии.
+#
+#   python main.py export --dir snapshot          # первая - полная, дальше - дописывание
+#   python main.py export --dir snapshot --full   # переписать снимок целиком
+
+import glob
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
+
+from db import DBManager, VACANCY_SNAPSHOT_COLUMNS, DEFAULT_ITERSIZE, batched
+
+
+DEFAULT_EXPORT_DIR = 'snapshot'
+DEFAULT_BATCH_ROWS = 50000   # Строк в одной пачке Arrow
+DEFAULT_PARTITIONING = ('employer_id', 'month')
+DEFAULT_COMPACT_FILES = 8   # С какого числа файлов каталог разбиения переписывается одним файлом
+MANIFEST_NAME = '_manifest.json'   # '_' в начале: pyarrow.dataset не считает файл данными
+
+# Транзакция, начатая до прошлой выгрузки и зафиксированная после нее, ставит
+# updated_at раньше отметки. Дописывание берет строки с запасом назад: повторно
+# выгруженная вакансия просто заменит прежнюю версию при чтении
+INCREMENTAL_OVERLAP = timedelta(minutes=5)
+
+# Типы столбцов (порядок - VACANCY_SNAPSHOT_COLUMNS) и номер выгрузки, к которой относится строка
+SNAPSHOT_SCHEMA = pa.schema([
+    ('vacancy_id', pa.int64()),
+    ('employer_id', pa.int64()),
+    ('employer_name', pa.string()),
+    ('title', pa.string()),
+    ('salary_from', pa.int32()),
+    ('salary_to', pa.int32()),
+    ('salary_currency', pa.string()),
+    ('salary_from_rub', pa.int32()),
+    ('salary_to_rub', pa.int32()),
+    ('url', pa.string()),
+    ('published_at', pa.timestamp('us', tz='UTC')),
+    ('month', pa.string()),
+    ('archived', pa.bool_()),
+    ('updated_at', pa.timestamp('us', tz='UTC')),
+    ('export_seq', pa.int32()),
+])
+
+
+def read_manifest(path):
+    """
+    Читает описание выгрузок снимка.
+
+    Returns:
+        dict: {'partitioning': [...], 'exports': [{'seq', 'rows', 'watermark', ...}, ...],
+               'compactions': [...]} или None, если снимка еще нет.
+               'compactions' появляется после первого уплотнения.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(path, manifest):
+    """Записывает описание выгрузок атомарно (через временный файл)."""
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def rows_to_batch(rows, export_seq):
+    """
+    Превращает пачку строк курсора в RecordBatch: значения раскладываются
+    по столбцам один раз, дальше с ними работает только Arrow.
+
+    Args:
+        rows (list): Кортежи в порядке VACANCY_SNAPSHOT_COLUMNS.
+        export_seq (int): Номер выгрузки.
+
+    Returns:
+        pyarrow.RecordBatch: Пачка по схеме SNAPSHOT_SCHEMA.
+    """
+    arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), SNAPSHOT_SCHEMA)]
+    arrays.append(pa.repeat(pa.scalar(export_seq, pa.int32()), len(rows)))
+    return pa.RecordBatch.from_arrays(arrays, schema=SNAPSHOT_SCHEMA)
+
+
+def iter_record_batches(rows, export_seq, batch_rows, progress):
+    """
+    Собирает строки в пачки Arrow по batch_rows штук.
+
+    Args:
+        rows (iterable): Строки курсора.
+        export_seq (int): Номер выгрузки.
+        batch_rows (int): Строк в пачке.
+        progress (dict): Сюда пишутся число строк ('rows') и последнее updated_at ('watermark').
+
+    Yields:
+        pyarrow.RecordBatch: Очередная пачка.
+    """
+    updated_at_index = VACANCY_SNAPSHOT_COLUMNS.index('updated_at')
+    for batch in batched(rows, batch_rows):
+        progress['rows'] += len(batch)
+        latest = max(row[updated_at_index] for row in batch)
+        if progress['watermark'] is None or latest > progress['watermark']:
+            progress['watermark'] = latest
+        yield rows_to_batch(batch, export_seq)
+
+
+def partitioning_for(columns):
+    """Разбиение каталогов в стиле Hive (столбец=значение) по указанным столбцам."""
+    return ds.partitioning(pa.schema([SNAPSHOT_SCHEMA.field(column) for column in columns]), flavor='hive')
+
+
+def remove_export_files(path, export_seq):
+    """Удаляет файлы выгрузки export_seq из снимка (например, после прерванного дописывания)."""
+    for file_path in glob.glob(os.path.join(path, '**', f'part-{export_seq:06d}-*.parquet'), recursive=True):
+        os.remove(file_path)
+
+
+def latest_versions(table):
+    """Оставляет в таблице снимка последнюю выгруженную версию каждой вакансии (по export_seq)."""
+    latest = table.group_by('vacancy_id').aggregate([('export_seq', 'max')])
+    return table.join(latest, keys=['vacancy_id', 'export_seq'],
+                      right_keys=['vacancy_id', 'export_seq_max'], join_type='inner')
+
+
+def compact_snapshot(path=DEFAULT_EXPORT_DIR, min_files=DEFAULT_COMPACT_FILES, compression='zstd'):
+    """
+    Уплотняет каталоги разбиения, в которых накопилось min_files файлов и больше.
+
+    Файлы каталога читаются вместе, для каждой вакансии остается последняя
+    версия, и результат пишется одним файлом compact-<номер выгрузки>.parquet.
+    Новый файл появляется под своим именем до удаления старых: читатель может
+    на мгновение увидеть вакансию дважды, но не потеряет ее. Уплотнение
+    записывается в манифест ('compactions').
+
+    Args:
+        path (str): Каталог снимка.
+        min_files (int): С какого числа файлов уплотнять каталог.
+        compression (str): Сжатие Parquet.
+
+    Returns:
+        dict: Описание уплотнения ('after_seq', 'partitions', 'files_before', 'files_after',
+              'rows_before', 'rows_after') или None при ошибке или если уплотнять нечего.
+    """
+    manifest = read_manifest(path)
+    if not manifest or not manifest['exports']:
+        return None
+    export_seq = manifest['exports'][-1]['seq']
+    compaction = {'after_seq': export_seq, 'partitions': 0, 'files_before': 0, 'files_after': 0,
+                  'rows_before': 0, 'rows_after': 0}
+    start = time.perf_counter()
+
+    try:
+        for directory, _, file_names in os.walk(path):
+            files = sorted(os.path.join(directory, name) for name in file_names
+                           if name.endswith('.parquet') and not name.startswith(('.', '_')))
+            if len(files) < min_files:
+                continue
+
+            table = ds.dataset(files, format='parquet').to_table()
+            compacted = latest_versions(table).select(table.column_names).sort_by('vacancy_id')
+
+            # '_' в начале: пока файл дописывается, pyarrow.dataset его не видит
+            tmp_path = os.path.join(directory, '_compact.parquet.tmp')
+            pq.write_table(compacted, tmp_path, compression=compression)
+            os.replace(tmp_path, os.path.join(directory, f'compact-{export_seq:06d}.parquet'))
+            for file_path in files:
+                if os.path.basename(file_path) != f'compact-{export_seq:06d}.parquet':
+                    os.remove(file_path)
+
+            compaction['partitions'] += 1
+            compaction['files_before'] += len(files)
+            compaction['files_after'] += 1
+            compaction['rows_before'] += table.num_rows
+            compaction['rows_after'] += compacted.num_rows
+    except Exception as e:
+        print(f"❌ Ошибка при уплотнении снимка {path}: {e}")
+        return None
+
+    if not compaction['partitions']:
+        return None
+
+    compaction['compacted_at'] = datetime.now().astimezone().isoformat(timespec='seconds')
+    manifest.setdefault('compactions', []).append(compaction)
+    write_manifest(path, manifest)
+    compaction['seconds'] = round(time.perf_counter() - start, 3)
+    print(f"✅ Уплотнено каталогов: {compaction['partitions']}, файлов {compaction['files_before']} -> "
+          f"{compaction['files_after']}, строк {compaction['rows_before']} -> {compaction['rows_after']}")
+    return compaction
+
+
+def export_vacancies(params, path=DEFAULT_EXPORT_DIR, full=False, batch_rows=DEFAULT_BATCH_ROWS,
+                     partitioning=DEFAULT_PARTITIONING, compression='zstd', itersize=DEFAULT_ITERSIZE,
+                     compact_files=DEFAULT_COMPACT_FILES):
+    """
+    Выгружает вакансии в Parquet.
+
+    Если снимок уже есть и full=False, дописывает файлы с вакансиями,
+    измененными после прошлой выгрузки (включая закрытые). Полная выгрузка
+    пишется во временный каталог и заменяет прежний снимок целиком.
+    При ошибке БД снимок и манифест остаются прежними, а недописанные файлы удаляются.
+    После дописывания каталоги, где набралось compact_files файлов, уплотняются
+    (compact_snapshot).
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        path (str): Каталог снимка.
+        full (bool): Переписать снимок, а не дописывать.
+        batch_rows (int): Строк в одной пачке Arrow (и не больше стольких строк в памяти).
+        partitioning (tuple): Столбцы разбиения на каталоги для новой полной выгрузки;
+            дописывание использует разбиение существующего снимка.
+        compression (str): Сжатие Parquet.
+        itersize (int): Сколько строк серверный курсор забирает за раз.
+        compact_files (int): С какого числа файлов уплотнять каталог разбиения (None - не уплотнять).
+
+    Returns:
+        dict: Описание выгрузки ('seq', 'rows', 'watermark', 'seconds', 'compaction')
+              или None при ошибке.
+    """
+    manifest = None if full else read_manifest(path)
+    incremental = bool(manifest and manifest['exports'])
+    if incremental:
+        last = manifest['exports'][-1]
+        export_seq = last['seq'] + 1
+        updated_since = datetime.fromisoformat(last['watermark']) - INCREMENTAL_OVERLAP
+        target_dir = path
+    else:
+        manifest = {'partitioning': list(partitioning), 'exports': []}
+        export_seq = 1
+        updated_since = None
+        target_dir = path.rstrip(os.sep) + '.new'
+        shutil.rmtree(target_dir, ignore_errors=True)
+
+    db_manager = params if isinstance(params, DBManager) else DBManager(params, max_size=1)
+    progress = {'rows': 0, 'watermark': None}
+    rows = None
+    start = time.perf_counter()
+
+    try:
+        rows = db_manager.iter_vacancy_snapshot(updated_since, itersize)
+        ds.write_dataset(
+            iter_record_batches(rows, export_seq, batch_rows, progress),
+            target_dir,
+            schema=SNAPSHOT_SCHEMA,
+            format='parquet',
+            partitioning=partitioning_for(manifest['partitioning']),
+            # Номер выгрузки в имени: новые файлы не затирают прежние в тех же каталогах
+            basename_template=f'part-{export_seq:06d}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+            max_partitions=1_000_000,
+        )
+
+        if incremental and not progress['rows']:
+            print("✅ Новых изменений для выгрузки нет")
+            return {'seq': None, 'rows': 0, 'watermark': last['watermark'],
+                    'seconds': round(time.perf_counter() - start, 3)}
+
+        watermark = progress['watermark'] or (datetime.fromisoformat(last['watermark']) if incremental else None)
+        summary = {
+            'seq': export_seq,
+            'rows': progress['rows'],
+            'watermark': watermark.isoformat() if watermark else datetime.now().astimezone().isoformat(),
+            'exported_at': datetime.now().astimezone().isoformat(timespec='seconds'),
+            'incremental': incremental,
+        }
+        manifest['exports'].append(summary)
+        os.makedirs(target_dir, exist_ok=True)
+        write_manifest(target_dir, manifest)
+
+        if not incremental:
+            # Подменяем снимок целиком: читатели видят либо старый, либо новый
+            old_dir = path.rstrip(os.sep) + '.old'
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(path):
+                os.replace(path, old_dir)
+            os.replace(target_dir, path)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        kind = 'дописано' if incremental else 'выгружено'
+        print(f"✅ В {path} {kind} вакансий: {summary['rows']} за {summary['seconds']:.1f} с")
+        if incremental and compact_files:
+            summary['compaction'] = compact_snapshot(path, compact_files, compression)
+        return summary
+
+    except Exception as e:
+        print(f"❌ Ошибка при выгрузке вакансий в Parquet: {e}")
+        if incremental:
+            remove_export_files(path, export_seq)
+        else:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        return None
+    finally:
+        if rows is not None:
+            rows.close()
+        if db_manager is not params:
+            db_manager.close()
+
+
+class VacancySnapshot:
+    """
+    Чтение выгруженного снимка вакансий.
+
+    Файлы Parquet отображаются в память, а не читаются в буферы процесса,
+    поэтому повторные запросы к снимку берут данные из страничного кэша ОС.
+    Если снимок дописывался, для каждой вакансии остается последняя версия;
+    закрытые вакансии по умолчанию отбрасываются.
+    """
+
+    def __init__(self, path=DEFAULT_EXPORT_DIR):
+        """
+        Args:
+            path (str): Каталог снимка (см. export_vacancies).
+        """
+        self.path = path
+        self.manifest = read_manifest(path)
+        if self.manifest is None:
+            raise FileNotFoundError(f"В {path} нет снимка вакансий ({MANIFEST_NAME})")
+        self.dataset = ds.dataset(
+            path,
+            schema=SNAPSHOT_SCHEMA,
+            format='parquet',
+            partitioning=partitioning_for(self.manifest['partitioning']),
+            filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True),
+        )
+
+    def table(self, columns=None, filter=None, include_archived=False):
+        """
+        Читает снимок в pyarrow.Table.
+
+        Args:
+            columns (list): Нужные столбцы (по умолчанию - все).
+            filter (pyarrow.compute.Expression): Условие на строки, например
+                pc.field('employer_id') == 1740 (по столбцам разбиения читаются
+                только нужные каталоги).
+            include_archived (bool): Оставить закрытые вакансии.
+
+        Returns:
+            pyarrow.Table: Строки снимка.
+        """
+        deduplicate = len(self.manifest['exports']) > 1
+        read_columns = None
+        # После выбора версий условие проверяется по таблице: нужны все столбцы, на которые оно ссылается
+        if columns is not None and not (deduplicate and filter is not None):
+            service_columns = ['archived'] + (['vacancy_id', 'export_seq'] if deduplicate else [])
+            read_columns = list(dict.fromkeys(list(columns) + service_columns))
+
+        if not deduplicate:
+            table = self.dataset.to_table(columns=read_columns, filter=filter)
+        else:
+            # Условие проверяем после выбора последней версии: иначе старая версия,
+            # подходящая под него, заменила бы новую, которая не подходит
+            table = latest_versions(self.dataset.to_table(columns=read_columns))
+            if filter is not None:
+                table = table.filter(filter)
+
+        if not include_archived:
+            table = table.filter(pc.invert(table['archived']))
+        return table.select(list(columns)) if columns is not None else table
+
+    def to_pandas(self, columns=None, filter=None):
+        """Открытые вакансии снимка в pandas.DataFrame (нужен pandas)."""
+        return self.table(columns, filter).to_pandas()
+
+    def salary_by_employer(self, in_rub=True, min_count=1):
+        """
+        Средняя, минимальная и максимальная зарплата по работодателям.
+
+        Зарплата вакансии - середина вилки или единственная указанная граница
+        (как db.salary_midpoint_sql).
+
+        Args:
+            in_rub (bool): Считать в рублях (иначе - в валюте вакансии, без пересчета).
+            min_count (int): Не показывать работодателей, у которых меньше вакансий с зарплатой.
+
+        Returns:
+            pyarrow.Table: employer_id, employer_name, vacancies, with_salary, mean, min, max
+                           по убыванию средней.
+        """
+        suffix = '_rub' if in_rub else ''
+        table = self.table(['employer_id', 'employer_name', f'salary_from{suffix}', f'salary_to{suffix}'])
+        salary_from = table[f'salary_from{suffix}'].cast(pa.float64())
+        salary_to = table[f'salary_to{suffix}'].cast(pa.float64())
+        salary = pc.divide(pc.add(pc.coalesce(salary_from, salary_to), pc.coalesce(salary_to, salary_from)), 2.0)
+
+        stats = table.append_column('salary', salary).group_by(['employer_id', 'employer_name']).aggregate([
+            ('employer_id', 'count', pc.CountOptions(mode='all')),
+            ('salary', 'count'), ('salary', 'mean'), ('salary', 'min'), ('salary', 'max'),
+        ])
+        stats = stats.rename_columns({
+            'employer_id_count': 'vacancies', 'salary_count': 'with_salary',
+            'salary_mean': 'mean', 'salary_min': 'min', 'salary_max': 'max',
+        })
+        stats = stats.filter(pc.greater_equal(stats['with_salary'], min_count))
+        return stats.select(['employer_id', 'employer_name', 'vacancies', 'with_salary', 'mean', 'min', 'max']) \
+            .sort_by([('mean', 'descending')])
+
+    def keyword_counts(self, keywords):
+        """
+        Сколько открытых вакансий содержат в названии каждое слово (без учета регистра, как ILIKE).
+
+        Args:
+            keywords (iterable): Слова или подстроки.
+
+        Returns:
+            dict: Слово -> число вакансий.
+        """
+        titles = self.table(['title'])['title']
+        return {keyword: pc.sum(pc.match_substring(titles, keyword, ignore_case=True)).as_py() or 0
+                for keyword in keywords}
@@ -0,0 +1,191 @@
+# hh_cache.py - Локальный кэш ответов API hh.ru на диске (SQLite)
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'hh_responses.sqlite3')
+DEFAULT_TTL = 24 * 60 * 60          # Сутки: вакансии и работодатели меняются не чаще
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 МБ тел ответов
+
+
+class ResponseCache:
+    """
+    Постоянный кэш HTTP-ответов с TTL и вытеснением давно не использованных записей (LRU).
+
+    Ключ - URL вместе с параметрами запроса. Вместе с телом хранятся заголовки
+    ETag и Last-Modified, чтобы устаревшую запись можно было перепроверить
+    условным запросом (ответ 304 не передает тело заново).
+    Экземпляр можно использовать из нескольких потоков.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Открывает (или создает) файл кэша.
+
+        Args:
+            path (str): Путь к файлу SQLite.
+            ttl (float): Сколько секунд запись считается свежей.
+            max_bytes (int): Предельный суммарный размер тел ответов.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at_idx ON responses (accessed_at);")
+        self._conn.commit()
+
+        self.hits = 0          # Свежая запись, сеть не нужна
+        self.revalidated = 0   # Запись устарела, но сервер ответил 304
+        self.misses = 0        # Ответ пришлось загрузить целиком
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(url, params=None):
+        """
+        Строит ключ кэша из URL и параметров запроса (порядок параметров не важен).
+
+        Args:
+            url (str): Адрес запроса.
+            params (dict): Параметры строки запроса.
+
+        Returns:
+            str: Ключ.
+        """
+        if not params:
+            return url
+        separator = '&' if '?' in url else '?'
+        return url + separator + urlencode(sorted(params.items()))
+
+    def lookup(self, key):
+        """
+        Ищет запись и отмечает обращение к ней для LRU.
+
+        Свежая запись засчитывается как попадание. Устаревшая тоже возвращается,
+        чтобы вызывающий код мог перепроверить ее по ETag/Last-Modified.
+
+        Args:
+            key (str): Ключ из make_key.
+
+        Returns:
+            dict: Запись с ключами 'body', 'etag', 'last_modified', 'fresh' или None.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?;", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?;", (now, key))
+            self._conn.commit()
+
+            fresh = now - row[3] < self.ttl
+            if fresh:
+                self.hits += 1
+        return {'body': row[0], 'etag': row[1], 'last_modified': row[2], 'fresh': fresh}
+
+    def store(self, key, body, etag=None, last_modified=None):
+        """
+        Сохраняет загруженный ответ (засчитывается как промах) и при необходимости
+        вытесняет давно не использованные записи.
+
+        Args:
+            key (str): Ключ из make_key.
+            body (bytes): Тело ответа.
+            etag (str): Заголовок ETag ответа.
+            last_modified (str): Заголовок Last-Modified ответа.
+        """
+        now = time.time()
+        with self._lock:
+            self.misses += 1
+            self._conn.execute("""
+                INSERT OR REPLACE INTO responses (key, body, etag, last_modified, stored_at, accessed_at, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, (key, body, etag, last_modified, now, now, len(body)))
+            self._evict()
+            self._conn.commit()
+
+    def revalidate(self, key):
+        """
+        Продлевает запись после ответа 304 Not Modified.
+
+        Args:
+            key (str): Ключ из make_key.
+        """
+        now = time.time()
+        with self._lock:
+            self.revalidated += 1
+            self._conn.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?;", (now, now, key)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        """Удаляет самые давно использованные записи, пока размер кэша больше max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses;").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at;")
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?;", to_delete)
+        self.evictions += len(to_delete)
+
+    def stats(self):
+        """
+        Возвращает счетчики кэша, чтобы подобрать его размер и TTL.
+
+        Returns:
+            dict: 'hits', 'revalidated', 'misses', 'evictions', 'hit_rate', 'entries', 'bytes'.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses;"
+            ).fetchone()
+            requests_total = self.hits + self.revalidated + self.misses
+            return {
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.revalidated) / requests_total if requests_total else 0.0,
+                'entries': entries,
+                'bytes': size,
+            }
+
+    def clear(self):
+        """Удаляет все записи."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses;")
+            self._conn.commit()
+
+    def close(self):
+        """Закрывает файл кэша."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,307 @@
+# hh_scheduler.py - Планировщик запросов к API hh.ru: лимит скорости, повторы и защита от сбоев
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import observe
+
+
+DEFAULT_RATE = 10.0           # Запросов в секунду на все потоки вместе
+DEFAULT_MIN_RATE = 1.0        # Ниже этого темпа не опускаемся даже после 429
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5    # Секунды; задержка растет как base * 2^попытка
+DEFAULT_BACKOFF_MAX = 30.0
+DEFAULT_FAILURE_THRESHOLD = 5  # Сколько сбоев подряд открывают предохранитель хоста
+DEFAULT_RESET_TIMEOUT = 30.0   # Через сколько секунд пробуем хост снова
+# Секунды на установку соединения и на ожидание ответа: без них зависшее
+# соединение держит поток загрузки бесконечно, а повтор по Timeout не наступает
+DEFAULT_TIMEOUT = (5, 30)
+
+# 429 - нас притормаживают, 5xx - временные сбои сервера
+THROTTLE_STATUS = 429
+RETRY_STATUSES = {THROTTLE_STATUS, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Хост слишком часто отвечает ошибками, запросы к нему временно не отправляются."""
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости "ведро с жетонами", общий для всех потоков.
+
+    Темп подстраивается под сервер: после 429 он снижается на четверть, после
+    успешных ответов постепенно возвращается к максимальному.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=None, min_rate=DEFAULT_MIN_RATE):
+        """
+        Args:
+            rate (float): Максимальный темп, запросов в секунду.
+            capacity (float): Сколько запросов можно отправить пачкой (по умолчанию = rate).
+            min_rate (float): Минимальный темп после замедлений.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Ждет, пока можно отправить очередной запрос, и забирает жетон."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Останавливает выдачу жетонов всем потокам на заданное время (Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+            self._updated = max(self._updated, self._paused_until)
+
+    def slow_down(self):
+        """Снижает темп на четверть после ответа 429."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.75)
+
+    def speed_up(self):
+        """Немного повышает темп после успешного ответа (не выше максимального)."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для одного хоста.
+
+    После failure_threshold сбоев подряд запросы к хосту не отправляются
+    reset_timeout секунд; затем пропускается один пробный запрос, и по его
+    результату предохранитель закрывается или снова открывается. Пока проба
+    идет (полуоткрытое состояние), остальные запросы получают CircuitOpenError.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def before_request(self, host):
+        """Вызывает CircuitOpenError, если предохранитель открыт или пробный запрос уже идет."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            # Проба, не вернувшая результат за reset_timeout, считается потерянной
+            if now - self.opened_at >= self.reset_timeout and (
+                    not self.probe_in_flight or now - self._probe_started >= self.reset_timeout):
+                self.probe_in_flight = True
+                self._probe_started = now
+                return
+        raise CircuitOpenError(f'Хост {host} временно недоступен: слишком много ошибок подряд')
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # Неудачная проба снова открывает предохранитель на reset_timeout
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def finish_probe(self):
+        """Снимает пробу без вывода о хосте (ответ 429, чужая ошибка): пробовать будет следующий запрос."""
+        with self._lock:
+            self.probe_in_flight = False
+
+
+def parse_retry_after(value):
+    """
+    Разбирает заголовок Retry-After (секунды или HTTP-дата).
+
+    Args:
+        value (str): Значение заголовка.
+
+    Returns:
+        float: Задержка в секундах или None, если заголовка нет или он некорректен.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RequestScheduler:
+    """
+    Отправляет GET-запросы с общим лимитом скорости, повторами и предохранителями.
+
+    - Темп ограничивается TokenBucket на все потоки сразу.
+    - На 429 и 5xx запрос повторяется с экспоненциальной задержкой и случайным
+      разбросом (full jitter); заголовок Retry-After имеет приоритет и
+      приостанавливает все потоки.
+    - Для каждого хоста свой CircuitBreaker: 5xx и сетевые ошибки подряд
+      временно отключают запросы к нему.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, min_rate=DEFAULT_MIN_RATE):
+        """
+        Args:
+            rate (float): Максимальный темп, запросов в секунду.
+            max_retries (int): Сколько раз повторять запрос после 429/5xx/сетевой ошибки.
+            backoff_base (float): Базовая задержка повтора, секунды.
+            backoff_max (float): Максимальная задержка повтора, секунды.
+            failure_threshold (int): Сбоев подряд до открытия предохранителя.
+            reset_timeout (float): Сколько секунд предохранитель остается открытым.
+            min_rate (float): Минимальный темп после замедлений из-за 429.
+        """
+        self.bucket = TokenBucket(rate, min_rate=min_rate)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'throttled': 0, 'server_errors': 0, 'network_errors': 0}
+
+    def breaker(self, host):
+        """Возвращает предохранитель хоста (создает при первом обращении)."""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def backoff(self, attempt):
+        """Задержка перед повтором номер attempt (с нуля): full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, session, url, **kwargs):
+        """
+        Выполняет GET-запрос с учетом лимитов и повторов.
+
+        Args:
+            session (requests.Session): Сессия для запроса.
+            url (str): Адрес.
+            **kwargs: Аргументы для session.get (params, headers, ...); timeout по умолчанию -
+                      DEFAULT_TIMEOUT.
+
+        Returns:
+            requests.Response: Последний полученный ответ (после исчерпания повторов
+                               это может быть 429 или 5xx - проверяйте raise_for_status).
+
+        Raises:
+            CircuitOpenError: Предохранитель хоста открыт.
+            requests.RequestException: Сетевая ошибка после всех повторов.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+
+        for attempt in range(self.max_retries + 1):
+            breaker.before_request(host)
+            self.bucket.acquire()
+            self._count('requests')
+            last_attempt = attempt == self.max_retries
+
+            start = time.perf_counter()
+            try:
+                response = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                observe('http_attempt', time.perf_counter() - start, {'host': host, 'status': 'error'})
+                self._count('network_errors')
+                breaker.record_failure()
+                if last_attempt:
+                    raise
+                self._count('retries')
+                time.sleep(self.backoff(attempt))
+                continue
+            except Exception:
+                breaker.finish_probe()
+                raise
+
+            # Одна попытка без ожидания лимита и пауз между повторами
+            observe('http_attempt', time.perf_counter() - start, {'host': host, 'status': response.status_code})
+
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                self.bucket.speed_up()
+                return response
+
+            if response.status_code == THROTTLE_STATUS:
+                # Сервер жив, просто просит снизить темп - предохранитель не трогаем
+                self._count('throttled')
+                self.bucket.slow_down()
+                breaker.finish_probe()
+            else:
+                self._count('server_errors')
+                breaker.record_failure()
+
+            if last_attempt:
+                return response
+
+            self._count('retries')
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is not None:
+                self.bucket.pause(delay)
+            else:
+                delay = self.backoff(attempt)
+            response.close()
+            time.sleep(delay)
+
+        return response
+
+    def stats(self):
+        """
+        Возвращает счетчики запросов и текущий темп.
+
+        Returns:
+            dict: 'requests', 'retries', 'throttled', 'server_errors', 'network_errors',
+                  'rate', 'open_circuits'.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats['open_circuits'] = [host for host, breaker in self._breakers.items()
+                                      if breaker.opened_at is not None]
+        stats['rate'] = self.bucket.rate
+        return stats
@@ -1,138 +1,402 @@
-# main.py - Главный скрипт для запуска процесса сбора данных и работы с БД
+# main.py - Командная строка: создание БД, сбор, загрузка и запросы
+#
+#   python main.py init-db
+#   python main.py crawl --ids-file employers.txt
+#   python main.py crawl --ids-file employers.txt --to-staging   # только сбор в staging
+#   python main.py discover --areas 1 2 --crawl                  # найти работодателей поиском HH и собрать
+#   python main.py load                                          # загрузка последнего запуска из staging
+#   python main.py load --chunk-rows 5000                        # частями, с продолжением после сбоя
+#   python main.py query vacancies --format csv > vacancies.csv
+#   python main.py query keyword --keyword Python --format jsonl
+#   python main.py export --dir snapshot                         # снимок в Parquet для аналитики
+#   python main.py rates                                         # курсы валют из exchange_rates.json
+#
+# Тяжелые модули (psycopg2, requests) импортируются внутри команд: запрос к БД
+# не загружает HTTP-клиент, а --help не загружает ничего.
 
-from db import save_employers_to_db, save_vacancies_to_db, DBManager, db_params, create_database, create_tables
-from api_HH import get_company_data
+import argparse
+import contextlib
+import csv
 import json
+import os
+import sys
 
 
-# --- ШАГ 0: Создание базы данных и таблиц ---
-print("\n--- Создание базы данных и таблиц ---")
-create_database(db_params)
-create_tables(db_params)
-print("--- Создание базы данных и таблиц завершено ---\n")
-
-# --- ШАГ 1: Сбор данных с HH.ru ---
-print("\n--- Запуск процесса сбора данных с HH.ru ---")
-
-all_employers_ids = [
+# Работодатели по умолчанию, если не передан --ids-file / --ids
+DEFAULT_EMPLOYER_IDS = [
     6086392, 9498112, 3529, 1565051, 1947314,
     78638, 7944, 2374897, 6093775, 906391
 ]
 
-all_companies_data = []
-
-for employer_id in all_employers_ids:
-    print(f'\n Получаем данные для компании с ID: {employer_id}')
-    company_data = get_company_data(employer_id)
-    all_companies_data.append(company_data)
-
-print("\n--- Процесс сбора данных завершен ---")
-# --- Конец ШАГ 1 ---
-
-
-# --- ШАГ 2: Загрузка данных в БД ---
-print("\n--- Загрузка данных в БД ---")
-
-print("--- Загрузка данных о работодателях в БД ---")
-save_employers_to_db(all_companies_data, db_params)
-print("--- Загрузка данных о работодателях завершена ---")
-
-print("\n--- Загрузка данных о вакансиях в БД ---")
-save_vacancies_to_db(all_companies_data, db_params)
-print("--- Загрузка данных о вакансиях завершена ---")
-# --- Конец ШАГ 2 ---
-
-
-# --- ШАГ 3: Работа с базой данных через DBManager ---
-print("\n--- Работа с базой данных через DBManager ---")
-
-db_manager = DBManager(db_params)
-
-# --- Выполнение запросов через DBManager ---
-print("\n--- Выполнение запросов через DBManager ---")
-
-# 1. Получаем список всех компаний и количество открытых вакансий у каждой
-print("\nЗапрос 1: Количество вакансий у каждой компании:")
-companies_with_vacancy_count = db_manager.get_companies_and_vacancies_count()
-if companies_with_vacancy_count:
-    for row in companies_with_vacancy_count:
-        print(f"Компания: {row[0]}, Вакансий: {row[1]}")
-else:
-    print("Нет данных или произошла ошибка при выполнении запроса 1.")
-print("------------------------------------------")
-
-# 2. Получаем список всех вакансий
-print("\nЗапрос 2: Список всех вакансий:")
-all_vacancies = db_manager.get_all_vacancies()
-if all_vacancies:
-    print(f"Найдено всего вакансий: {len(all_vacancies)}. Первые 5:")
-    for i, row in enumerate(all_vacancies[:5]):
-         print(f"  ID: {row[0]}, Компания: {row[1]}, Заголовок: {row[2]}, Зарплата: {row[3]}-{row[4]} {row[5]}, URL: {row[6]}")
-    if len(all_vacancies) > 5:
-        print("  ...")
-else:
-    print("Нет данных или произошла ошибка при выполнении запроса 2.")
-print("------------------------------------------")
-
-
-# 3. Получаем список всех вакансий с указанной зарплатой
-print("\nЗапрос 3: Список вакансий с зарплатой:")
-vacancies_with_salary = db_manager.get_vacancies_with_salary()
-if vacancies_with_salary:
-    print(f"Найдено вакансий с зарплатой: {len(vacancies_with_salary)}. Первые 5:")
-    for i, row in enumerate(vacancies_with_salary[:5]):
-         print(f"  ID: {row[0]}, Заголовок: {row[2]}, Зарплата: {row[3]}-{row[4]} {row[5]}, URL: {row[6]}")
-    if len(vacancies_with_salary) > 5:
-        print("  ...")
-else:
-    print("Нет данных или произошла ошибка при выполнении запроса 3.")
-print("------------------------------------------")
-
-
-# 4. Получаем список всех вакансий, в названии которых содержится ключевое слово
-keyword_to_search = input("Введите ключевое слово для поиска в вакансиях (например, Python): ")
-print(f"\nЗапрос 4: Список вакансий с ключевым словом '{keyword_to_search}':")
-vacancies_with_keyword = db_manager.get_vacancies_with_keyword(keyword_to_search)
-if vacancies_with_keyword:
-    print(f"Найдено вакансий с ключевым словом: {len(vacancies_with_keyword)}. Первые 5:")
-    for i, row in enumerate(vacancies_with_keyword[:5]):
-         print(f"  ID: {row[0]}, Заголовок: {row[2]}, Зарплата: {row[3]}-{row[4]} {row[5]}, URL: {row[6]}")
-    if len(vacancies_with_keyword) > 5:
-        print("  ...")
-else:
-    print("Нет данных или произошла ошибка при выполнении запроса 4.")
-print("------------------------------------------")
-
-# 5. Получаем среднюю зарплату по всем вакансиям
-print("\nЗапрос 5: Средняя зарплата по всем вакансиям:")
-avg_salary = db_manager.get_avg_salary()
-if avg_salary is not None:
-    print(f"Средняя зарплата: {avg_salary:.2f}")
-else:
-    print("Нет данных о зарплатах или произошла ошибка при выполнении запроса 5.")
-print("------------------------------------------")
-
-# 6. Получаем список вакансий с зарплатой выше средней
-print("\nЗапрос 6: Список вакансий с зарплатой выше средней:")
-vacancies_higher_salary = db_manager.get_vacancies_with_higher_salary()
-if vacancies_higher_salary:
-    print(f"Найдено вакансий с зарплатой выше средней: {len(vacancies_higher_salary)}. Первые 5:")
-    for i, row in enumerate(vacancies_higher_salary[:5]):
-        # Последний элемент в кортеже - название компании из JOIN
-        employer_name = row[-1]
-        print(f"  ID: {row[0]}, Компания: {employer_name}, Заголовок: {row[2]}, Зарплата: {row[3]}-{row[4]} {row[5]}, URL: {row[6]}")
-    if len(vacancies_higher_salary) > 5:
-        print("  ...")
-else:
-    print("Нет данных или произошла ошибка при выполнении запроса 6.")
-print("------------------------------------------")
-
-print("\n--- Работа с базой данных через DBManager завершена ---")
-# --- Конец ШАГ 3 ---
-
-
-# --- ШАГ 4: Вывод всех собранных данных (для справки, можно удалить) ---
-print("\n--- Вывод всех собранных данных о компаниях (из main.py) ---")
-print(json.dumps(all_companies_data, indent=4, ensure_ascii=False))
-print("------------------------------------")
-# --- Конец ШАГ 4 ---
+VACANCY_COLUMNS = ('vacancy_id', 'employer_id', 'title', 'salary_from', 'salary_to', 'salary_currency', 'url')
+
+# Имя запроса -> (метод DBManager, столбцы результата, нужен ли --keyword).
+# Запросы по всей таблице идут через iter_*: строки пишутся по мере чтения с сервера
+QUERIES = {
+    'companies': ('get_companies_and_vacancies_count', ('employer_name', 'vacancies'), False),
+    'vacancies': ('iter_all_vacancies',
+                  ('vacancy_id', 'employer_name', 'title', 'salary_from', 'salary_to', 'salary_currency', 'url'),
+                  False),
+    'with-salary': ('iter_vacancies_with_salary', VACANCY_COLUMNS, False),
+    'keyword': ('get_vacancies_with_keyword', VACANCY_COLUMNS, True),
+    'search': ('search_vacancies', VACANCY_COLUMNS + ('rank',), True),
+    'avg-salary': ('get_avg_salary', ('avg_salary',), False),
+    'higher-salary': ('iter_vacancies_with_higher_salary', VACANCY_COLUMNS + ('employer_name',), False),
+    'salary-stats': (None, ('group', 'label', 'vacancies', 'with_salary', 'mean', 'min', 'max',
+                            'p10', 'median', 'p90'), False),
+}
+
+OUTPUT_FORMATS = ('csv', 'jsonl')
+
+
+def read_employer_ids(args):
+    """
+    ID работодателей из --ids и --ids-file (по одному или через пробел/запятую
+    в строке, '#' - комментарий, '-' - стандартный ввод).
+
+    Returns:
+        list: ID без повторов в исходном порядке.
+    """
+    ids = list(args.ids or ())
+    if args.ids_file:
+        with (contextlib.nullcontext(sys.stdin) if args.ids_file == '-'
+              else open(args.ids_file, encoding='utf-8')) as f:
+            for line in f:
+                line = line.split('#', 1)[0]
+                ids.extend(int(token) for token in line.replace(',', ' ').split())
+    if not ids:
+        ids = DEFAULT_EMPLOYER_IDS
+    return list(dict.fromkeys(ids))
+
+
+def cmd_init_db(args):
+    """Создает БД, таблицы и очередь заданий, применяет миграции."""
+    from db import DBManager, db_params, create_database, create_tables
+    from crawl_queue import create_crawl_jobs_table
+    from chunked_load import create_load_tables
+    from migrations import migrate
+
+    create_database(db_params)
+    with DBManager(db_params) as db_manager:
+        create_tables(db_manager)
+        # Доводим схему до актуальной версии (BIGINT-ключи, индексы, зарплата в рублях)
+        if migrate(db_manager) is None:
+            return 1
+        create_crawl_jobs_table(db_manager)
+        create_load_tables(db_manager)
+    return 0
+
+
+def cmd_crawl(args):
+    """Собирает работодателей: через очередь сразу в БД или только в staging."""
+    employer_ids = read_employer_ids(args)
+    print(f"Работодателей к сбору: {len(employer_ids)}")
+
+    if args.to_staging:
+        from staging import crawl_to_staging
+        # Только сбор: сырые ответы в сегменты, загрузка - командой load
+        run_dir = crawl_to_staging(employer_ids, args.staging_dir or 'staging', args.concurrency)
+        print(f"Загрузить в БД: python main.py load --run-dir {run_dir}")
+        return 0
+
+    from db import DBManager, db_params
+    from crawl_queue import create_crawl_jobs_table, enqueue_employers
+
+    with DBManager(db_params) as db_manager:
+        create_crawl_jobs_table(db_manager)
+        enqueue_employers(employer_ids, db_manager, requeue=True)
+        return process_queue(db_manager, args)
+
+
+def process_queue(db_manager, args):
+    """Обрабатывает очередь crawl_jobs процессами-обработчиками и обновляет статистику."""
+    from db import db_params, refresh_stats
+    from crawl_queue import run_workers, queue_stats
+
+    # Процессы-обработчики забирают задания пачками; без --staging-dir
+    # они пишут в БД конвейером, пока другие потоки ждут ответов HH
+    exit_codes = run_workers(db_params, processes=args.processes, total_rate=args.rate,
+                             staging_dir=args.staging_dir, concurrency=args.concurrency,
+                             claim_size=args.claim_size)
+    stats = queue_stats(db_manager)
+    print(f"Состояние очереди: {stats}")
+    refresh_stats(db_manager)
+    return 0 if not any(exit_codes) and not (stats or {}).get('failed') else 1
+
+
+def cmd_discover(args):
+    """Находит работодателей поиском HH, ставит их в очередь и (с --crawl) собирает."""
+    from db import DBManager, db_params
+    from crawl_queue import create_crawl_jobs_table
+    from discovery import discover_employers
+
+    with DBManager(db_params) as db_manager:
+        create_crawl_jobs_table(db_manager)
+        summary = discover_employers(db_manager, areas=args.areas, industries=args.industries,
+                                     source=args.source, cursor_path=args.cursor,
+                                     concurrency=args.search_concurrency, reset=args.reset)
+        if summary is None:
+            return 1
+        if args.crawl:
+            return process_queue(db_manager, args)
+    return 0 if not summary['failed_pages'] else 1
+
+
+def cmd_load(args):
+    """Загружает запуск сбора из staging в БД."""
+    from db import DBManager, db_params, refresh_stats
+    from staging import latest_run_dir, load_staging
+
+    run_dir = args.run_dir or latest_run_dir(args.staging_dir)
+    if not run_dir:
+        print(f"❌ В {args.staging_dir} нет запусков сбора")
+        return 1
+
+    print(f"Загрузка {run_dir}")
+    with DBManager(db_params) as db_manager:
+        if args.chunk_rows or args.per_employer:
+            from chunked_load import create_load_tables, DEFAULT_CHUNK_ROWS
+            from staging import load_staging_chunked
+            # Транзакция на часть: сбой откатывает только ее, повторный запуск продолжает с контрольной точки
+            create_load_tables(db_manager)
+            summary = load_staging_chunked(run_dir, db_manager, chunk_rows=args.chunk_rows or DEFAULT_CHUNK_ROWS,
+                                           per_employer=args.per_employer, job_name=args.job, restart=args.restart)
+            ok = summary is not None
+        else:
+            employers_summary, vacancies_summary = load_staging(run_dir, db_manager)
+            ok = employers_summary is not None and vacancies_summary is not None
+        refresh_stats(db_manager)
+    return 0 if ok else 1
+
+
+def cmd_rates(args):
+    """Перечитывает курсы валют из файла и пересчитывает зарплату в рублях."""
+    from db import DBManager, db_params, refresh_stats, update_exchange_rates
+
+    with DBManager(db_params) as db_manager:
+        changed = update_exchange_rates(db_manager, args.file)
+        if changed:
+            refresh_stats(db_manager)
+    return 0 if changed is not None else 1
+
+
+def cmd_export(args):
+    """Выгружает вакансии в Parquet (полностью или дописывая изменения)."""
+    from db import DBManager, db_params
+    from export import export_vacancies
+
+    with DBManager(db_params) as db_manager:
+        summary = export_vacancies(db_manager, args.dir, full=args.full, batch_rows=args.batch_rows,
+                                   compact_files=args.compact_files or None)
+    return 0 if summary is not None else 1
+
+
+def query_rows(db_manager, args):
+    """
+    Выполняет запрос args.name.
+
+    Returns:
+        iterable: Строки результата (кортежи или словари) или None при ошибке.
+    """
+    method_name, _, _ = QUERIES[args.name]
+
+    if args.name == 'salary-stats':
+        from salary_analytics import SalaryAnalytics
+        return SalaryAnalytics(db_manager).summary(by=args.by, limit=args.limit)
+
+    method = getattr(db_manager, method_name)
+    if args.name == 'avg-salary':
+        value = method()
+        return [] if value is None else [(value,)]
+    if args.name in ('keyword', 'search'):
+        return method(args.keyword, limit=args.limit) if args.limit else method(args.keyword)
+    if method_name.startswith('iter_'):
+        return method(limit=args.limit)
+    rows = method()
+    return rows[:args.limit] if args.limit else rows
+
+
+def _json_default(value):
+    # Decimal (AVG, ts_rank) - числом, даты - строкой ISO 8601
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return float(value)
+
+
+def write_output(rows, columns, output_format, out):
+    """
+    Пишет строки по одной в CSV (с заголовком) или JSON Lines.
+
+    Returns:
+        int: Сколько строк записано.
+    """
+    written = 0
+    if output_format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row.get(column) for column in columns] if isinstance(row, dict) else row)
+            written += 1
+        return written
+
+    for row in rows:
+        record = row if isinstance(row, dict) else dict(zip(columns, row))
+        out.write(json.dumps(record, ensure_ascii=False, default=_json_default))
+        out.write('\n')
+        written += 1
+    return written
+
+
+def cmd_query(args):
+    """Выполняет запрос к БД и выводит результат в CSV или JSON Lines."""
+    _, columns, needs_keyword = QUERIES[args.name]
+    if needs_keyword and not args.keyword:
+        print(f"❌ Для запроса {args.name} нужен --keyword", file=sys.stderr)
+        return 2
+
+    import psycopg2
+    from db import DBManager, db_params
+
+    cache = None
+    if args.cache_url:
+        from query_cache import QueryCache, RedisBackend
+        try:
+            # Общий кэш переживает запуск: повторный запрос до следующей загрузки читается из Redis
+            cache = QueryCache(backend=RedisBackend(args.cache_url))
+        except ImportError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 2
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        # Сообщения модулей (ошибки запросов и т.п.) - в stderr, чтобы не смешивать их с данными;
+        # ошибки запросов пробрасываются, чтобы запуск по расписанию увидел их в коде выхода
+        with contextlib.redirect_stdout(sys.stderr), DBManager(db_params, cache=cache, raise_errors=True) as db_manager:
+            rows = query_rows(db_manager, args)
+            if rows is None:
+                return 1
+            try:
+                written = write_output(rows, columns, args.format, out)
+            finally:
+                # Прерванный потоковый запрос должен вернуть соединение до закрытия пула
+                if hasattr(rows, 'close'):
+                    rows.close()
+        out.flush()
+    except BrokenPipeError:
+        # Вывод оборвали (например, `| head`): не печатаем трассировку при выходе
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except psycopg2.Error:
+        # Сообщение об ошибке уже напечатал DBManager
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Строк: {written}", file=sys.stderr)
+    if cache is not None:
+        print(f"Кэш запросов: {cache.stats()}", file=sys.stderr)
+    return 0
+
+
+def add_worker_arguments(parser):
+    """Параметры процессов-обработчиков очереди (общие для crawl и discover --crawl)."""
+    parser.add_argument('--staging-dir',
+                        help="Каталог staging: обработчики очереди пишут через него, а не конвейером "
+                             "(для --to-staging по умолчанию 'staging')")
+    parser.add_argument('--processes', type=int, default=2, help='Процессов-обработчиков очереди')
+    parser.add_argument('--concurrency', type=int, default=10, help='Одновременных запросов к API в процессе')
+    parser.add_argument('--claim-size', type=int, default=20, help='Работодателей в одной пачке очереди')
+    parser.add_argument('--rate', type=float, help='Общий лимит запросов в секунду на все процессы')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Сбор вакансий с hh.ru в PostgreSQL и запросы к ним')
+    parser.add_argument('--profile', metavar='FILE', default=os.getenv('HH_PROFILE'),
+                        help='Профилировать команду и сохранить результат в FILE (или HH_PROFILE)')
+    parser.add_argument('--profile-mode', choices=('cprofile', 'sample'),
+                        default=os.getenv('HH_PROFILE_MODE', 'cprofile'),
+                        help='cprofile - точно, но медленнее; sample - сэмплирование стеков')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='команда')
+
+    init_db = commands.add_parser('init-db', help='Создать БД и таблицы, применить миграции')
+    init_db.set_defaults(handler=cmd_init_db)
+
+    # Значения по умолчанию совпадают с DEFAULT_* модулей api_HH, crawl_queue и staging,
+    # но не импортируются оттуда, чтобы разбор аргументов не загружал requests и psycopg2
+    crawl = commands.add_parser('crawl', help='Собрать работодателей и их вакансии')
+    crawl.add_argument('--ids-file', help="Файл с ID работодателей ('-' - стандартный ввод)")
+    crawl.add_argument('--ids', type=int, nargs='+', help='ID работодателей')
+    crawl.add_argument('--to-staging', action='store_true',
+                       help='Только сохранить ответы API в staging (загрузка - командой load)')
+    add_worker_arguments(crawl)
+    crawl.set_defaults(handler=cmd_crawl)
+
+    discover = commands.add_parser('discover', help='Найти работодателей поиском HH и поставить в очередь')
+    discover.add_argument('--areas', nargs='+', help='ID областей (по умолчанию - все верхние области HH)')
+    discover.add_argument('--industries', nargs='+', help='ID отраслей (только для --source vacancies)')
+    discover.add_argument('--source', choices=('employers', 'vacancies'), default='employers',
+                          help='Искать работодателей или вакансии (у вакансий есть фильтр по отрасли)')
+    discover.add_argument('--cursor', default='discovery_cursor.json',
+                          help='Файл курсора: повторный запуск продолжает поиск с него')
+    discover.add_argument('--reset', action='store_true', help='Начать поиск заново, не глядя на курсор')
+    discover.add_argument('--search-concurrency', type=int, default=20, help='Одновременных поисковых запросов')
+    discover.add_argument('--crawl', action='store_true', help='После поиска собрать работодателей из очереди')
+    add_worker_arguments(discover)
+    discover.set_defaults(handler=cmd_discover)
+
+    load = commands.add_parser('load', help='Загрузить собранное в staging в БД')
+    load.add_argument('--run-dir', help='Каталог запуска (по умолчанию - последний)')
+    load.add_argument('--staging-dir', default='staging')
+    load.add_argument('--chunk-rows', type=int,
+                      help='Фиксировать каждые N вакансий, записывать контрольную точку и откладывать плохие '
+                           'строки в load_dead_letters (без этого - одна транзакция на весь запуск)')
+    load.add_argument('--per-employer', action='store_true', help='Фиксировать после каждого работодателя')
+    load.add_argument('--job', help="Имя задания загрузки (по умолчанию 'staging:<каталог запуска>')")
+    load.add_argument('--restart', action='store_true', help='Загрузить заново, забыв контрольную точку задания')
+    load.set_defaults(handler=cmd_load)
+
+    rates = commands.add_parser('rates', help='Обновить курсы валют и пересчитать зарплату в рублях')
+    rates.add_argument('--file', help='Файл курсов (по умолчанию - HH_EXCHANGE_RATES_FILE или exchange_rates.json); '
+                                      'новые вакансии пересчитываются по файлу по умолчанию')
+    rates.set_defaults(handler=cmd_rates)
+
+    export = commands.add_parser('export', help='Выгрузить вакансии в Parquet для аналитики')
+    export.add_argument('--dir', default='snapshot', help='Каталог снимка')
+    export.add_argument('--full', action='store_true', help='Переписать снимок целиком, а не дописать изменения')
+    export.add_argument('--batch-rows', type=int, default=50000, help='Строк в одной пачке Arrow')
+    export.add_argument('--compact-files', type=int, default=8,
+                        help='С какого числа файлов уплотнять каталог разбиения (0 - не уплотнять)')
+    export.set_defaults(handler=cmd_export)
+
+    query = commands.add_parser('query', help='Выполнить запрос и вывести строки')
+    query.add_argument('name', choices=sorted(QUERIES))
+    query.add_argument('--format', choices=OUTPUT_FORMATS, default='csv')
+    query.add_argument('--keyword', help='Слово для keyword и search')
+    query.add_argument('--limit', type=int, help='Не больше стольких строк')
+    query.add_argument('--by', choices=('all', 'employer', 'currency'), default='currency',
+                       help='Группировка для salary-stats')
+    query.add_argument('--output', '-o', help='Файл результата (по умолчанию - стандартный вывод)')
+    query.add_argument('--cache-url', default=os.getenv('HH_QUERY_CACHE_URL'),
+                       help='Redis для общего кэша результатов, например redis://localhost:6379/0 '
+                            '(или HH_QUERY_CACHE_URL); статистика кэша печатается в конце')
+    query.set_defaults(handler=cmd_query)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if not args.profile:
+        return args.handler(args)
+
+    from metrics import profile_run
+    with profile_run(args.profile, args.profile_mode):
+        return args.handler(args)
+
+
+# Защита нужна и для multiprocessing: в режиме spawn процессы-обработчики
+# заново импортируют main и не должны снова запускать команду
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,490 @@
+# metrics.py - Замеры этапов сбора, загрузки и запросов
+#
+# Каждый HTTP-запрос, запись в БД и запрос DBManager отмечается событием
+# observe(имя, секунды, метки, поля): в памяти копятся гистограммы времени и
+# суммы полей (строки, байты), а сами события и сводки отдаются подключенным
+# приемникам - строке лога или текстовому файлу в формате Prometheus.
+# Без приемников события только считаются в памяти (get_metrics().snapshot()).
+#
+# Профилирование всего запуска включается отдельно: profile_run / HH_PROFILE.
+
+import atexit
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+# Границы корзин гистограмм времени, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_FLUSH_INTERVAL = 15.0   # Как часто переписывать файл Prometheus, секунды
+DEFAULT_SLOW_QUERY_SECONDS = 1.0
+DEFAULT_SLOW_QUERY_LOG = 20     # Сколько последних медленных запросов держать в памяти
+DEFAULT_SAMPLE_INTERVAL = 0.005  # Шаг сэмплирующего профилировщика, секунды
+METRIC_PREFIX = 'hh_'
+
+logger = logging.getLogger('hh_parser.metrics')
+
+
+class LogSink:
+    """Пишет каждое событие одной строкой вида 'event=db_query seconds=0.012 name=... rows=10'."""
+
+    def __init__(self, log=None, level=logging.INFO):
+        """
+        Args:
+            log (logging.Logger): Логгер (по умолчанию 'hh_parser.metrics').
+            level (int): Уровень записей.
+        """
+        self.log = log or logger
+        self.level = level
+
+    def emit(self, event):
+        if not self.log.isEnabledFor(self.level):
+            return
+        plan = event.get('plan')
+        line = ' '.join(f'{key}={_format_value(value)}' for key, value in event.items() if key != 'plan')
+        self.log.log(self.level, line + (f'\n{plan}' if plan else ''))
+
+    def write(self, snapshot):
+        pass  # Сводки в лог не пишем: в нем уже есть каждое событие
+
+
+class PrometheusFileSink:
+    """
+    Переписывает текстовый файл в формате Prometheus (для textfile collector
+    node_exporter) не чаще раза в interval секунд и при закрытии.
+
+    В пути можно указать {pid}: у каждого процесса-обработчика будет свой файл.
+    """
+
+    def __init__(self, path, interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        Args:
+            path (str): Путь к файлу, например '/var/lib/node_exporter/hh_parser.prom'.
+            interval (float): Минимальный интервал между записями, секунды.
+        """
+        self.path = path
+        self.interval = interval
+
+    def emit(self, event):
+        pass  # Файл строится из сводки, а не из отдельных событий
+
+    def write(self, snapshot):
+        path = self.path.format(pid=os.getpid())
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл и подменяем: сборщик не увидит файл наполовину
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text(snapshot))
+        os.replace(tmp_path, path)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f'{value:.6f}'
+    text = str(value)
+    return f'"{text}"' if ' ' in text else text
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in items) + '}'
+
+
+def prometheus_text(snapshot):
+    """
+    Переводит сводку Metrics.snapshot() в текстовый формат Prometheus.
+
+    Args:
+        snapshot (dict): Сводка.
+
+    Returns:
+        str: Текст для файла .prom.
+    """
+    lines = []
+    by_name = {}
+    for series in snapshot['series']:
+        by_name.setdefault(series['name'], []).append(series)
+
+    for name, series_list in sorted(by_name.items()):
+        metric = f'{METRIC_PREFIX}{name}_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for series in series_list:
+            labels = series['labels']
+            cumulative = 0
+            for bound, count in zip(snapshot['buckets'], series['buckets']):
+                cumulative += count
+                lines.append(f'{metric}_bucket{_label_text(labels, ("le", bound))} {cumulative}')
+            lines.append(f'{metric}_bucket{_label_text(labels, ("le", "+Inf"))} {series["count"]}')
+            lines.append(f'{metric}_sum{_label_text(labels)} {series["sum"]:.6f}')
+            lines.append(f'{metric}_count{_label_text(labels)} {series["count"]}')
+
+        field_names = sorted({field for series in series_list for field in series['fields']})
+        for field in field_names:
+            counter = f'{METRIC_PREFIX}{name}_{field}_total'
+            lines.append(f'# TYPE {counter} counter')
+            for series in series_list:
+                if field in series['fields']:
+                    lines.append(f'{counter}{_label_text(series["labels"])} {series["fields"][field]}')
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """
+    Сборщик замеров: гистограммы времени и суммы числовых полей по (имя, метки).
+    Экземпляр можно использовать из нескольких потоков.
+    """
+
+    def __init__(self, sinks=(), buckets=DEFAULT_BUCKETS, flush_interval=None,
+                 slow_query_seconds=DEFAULT_SLOW_QUERY_SECONDS, explain_slow=False):
+        """
+        Args:
+            sinks (iterable): Приемники событий и сводок (LogSink, PrometheusFileSink, ...).
+            buckets (tuple): Границы корзин гистограмм, секунды.
+            flush_interval (float): Как часто отдавать сводку приемникам (по умолчанию -
+                                    минимальный interval среди них или DEFAULT_FLUSH_INTERVAL).
+            slow_query_seconds (float): С какой длительности запрос DBManager считается
+                                        медленным (None - не отслеживать).
+            explain_slow (bool): Снимать для медленных запросов план EXPLAIN (ANALYZE, BUFFERS).
+                                 Запрос при этом выполняется повторно.
+        """
+        self.sinks = list(sinks)
+        self.buckets = tuple(buckets)
+        if flush_interval is None:
+            flush_interval = min((getattr(sink, 'interval', DEFAULT_FLUSH_INTERVAL) for sink in self.sinks),
+                                 default=DEFAULT_FLUSH_INTERVAL)
+        self.flush_interval = flush_interval
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_slow = explain_slow
+        self.slow_queries = deque(maxlen=DEFAULT_SLOW_QUERY_LOG)
+        self._series = {}
+        self._lock = threading.Lock()
+        self._next_flush = time.monotonic() + flush_interval
+
+    def observe(self, name, seconds, labels=None, **fields):
+        """
+        Отмечает одно событие.
+
+        Args:
+            name (str): Имя замера ('http_request', 'db_query', ...).
+            seconds (float): Длительность.
+            labels (dict): Метки с небольшим числом значений (статус, таблица, имя запроса).
+            **fields: Числовые поля, которые суммируются (rows, bytes, ...).
+        """
+        labels = tuple(sorted((labels or {}).items()))
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+
+        with self._lock:
+            series = self._series.get((name, labels))
+            if series is None:
+                series = self._series[(name, labels)] = {
+                    'count': 0, 'sum': 0.0, 'max': 0.0,
+                    'buckets': [0] * len(self.buckets), 'fields': Counter(),
+                }
+            series['count'] += 1
+            series['sum'] += seconds
+            series['max'] = max(series['max'], seconds)
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            for field, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    series['fields'][field] += value
+            flush_due = self.sinks and time.monotonic() >= self._next_flush
+
+        if self.sinks:
+            event = {'event': name, 'seconds': seconds}
+            event.update(labels)
+            event.update(fields)
+            self._emit(event)
+        if flush_due:
+            self.flush()
+
+    @contextmanager
+    def timer(self, name, labels=None, **fields):
+        """
+        Замеряет блок кода. В блок отдается словарь полей, его можно дополнить
+        (например, числом строк), пока блок выполняется.
+
+            with metrics.timer('db_write', {'table': 'vacancies'}) as fields:
+                fields['rows'] = write(...)
+        """
+        fields = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.observe(name, time.perf_counter() - start, labels, **fields)
+
+    def is_slow_query(self, seconds):
+        """Превышает ли длительность порог медленного запроса."""
+        return self.slow_query_seconds is not None and seconds >= self.slow_query_seconds
+
+    def slow_query(self, name, seconds, sql_query, plan=None):
+        """
+        Отмечает медленный запрос (и его план, если он снят).
+
+        Args:
+            name (str): Имя запроса DBManager.
+            seconds (float): Длительность.
+            sql_query (str): Текст запроса.
+            plan (str): Вывод EXPLAIN (ANALYZE, BUFFERS) или None.
+        """
+        entry = {'event': 'slow_query', 'name': name, 'seconds': seconds,
+                 'query': ' '.join(sql_query.split())}
+        if plan:
+            entry['plan'] = plan
+        with self._lock:
+            self.slow_queries.append(entry)
+        self._emit(entry)
+
+    def _emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                # Замеры не должны ронять сбор и загрузку
+                print(f"⚠️ Ошибка приемника метрик {type(sink).__name__}: {e}")
+
+    def snapshot(self):
+        """
+        Возвращает сводку по всем замерам.
+
+        Returns:
+            dict: 'buckets' (границы) и 'series' - список словарей с ключами 'name',
+                  'labels', 'count', 'sum', 'max', 'buckets', 'fields'.
+        """
+        with self._lock:
+            return {
+                'buckets': self.buckets,
+                'series': [
+                    {'name': name, 'labels': labels, 'count': series['count'], 'sum': series['sum'],
+                     'max': series['max'], 'buckets': list(series['buckets']), 'fields': dict(series['fields'])}
+                    for (name, labels), series in sorted(self._series.items(), key=lambda item: item[0])
+                ],
+            }
+
+    def flush(self):
+        """Отдает текущую сводку приемникам."""
+        with self._lock:
+            self._next_flush = time.monotonic() + self.flush_interval
+        if not self.sinks:
+            return
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.write(snapshot)
+            except Exception as e:
+                print(f"⚠️ Ошибка приемника метрик {type(sink).__name__}: {e}")
+
+    def reset(self):
+        """Сбрасывает накопленные замеры."""
+        with self._lock:
+            self._series.clear()
+            self.slow_queries.clear()
+
+
+# Текущий сборщик; без приемников он только копит сводку в памяти
+_metrics = Metrics()
+
+
+def configure_metrics(sinks=(), **kwargs):
+    """
+    Заменяет сборщик замеров для всех последующих событий.
+
+    Args:
+        sinks (iterable): Приемники (LogSink, PrometheusFileSink, ...).
+        **kwargs: Остальные аргументы Metrics (slow_query_seconds, explain_slow, ...).
+
+    Returns:
+        Metrics: Новый сборщик.
+    """
+    global _metrics
+    _metrics.flush()
+    _metrics = Metrics(sinks, **kwargs)
+    return _metrics
+
+
+def get_metrics():
+    """Возвращает текущий сборщик замеров."""
+    return _metrics
+
+
+def observe(name, seconds, labels=None, **fields):
+    """Отмечает событие в текущем сборщике (см. Metrics.observe)."""
+    _metrics.observe(name, seconds, labels, **fields)
+
+
+def timer(name, labels=None, **fields):
+    """Замеряет блок кода текущим сборщиком (см. Metrics.timer)."""
+    return _metrics.timer(name, labels, **fields)
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик: фоновый поток раз в interval секунд снимает
+    стеки всех потоков. В отличие от cProfile почти не замедляет программу,
+    поэтому его можно включать на настоящих запусках. Результат - файл в
+    формате "свернутых стеков" (строка 'f1;f2;f3 число'), который читают
+    flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                # Функции без номера текущей строки: сэмплы одной функции складываются вместе
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(names))] += 1
+
+    def dump(self, path):
+        """Сохраняет свернутые стеки в файл."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def top(self, limit=20):
+        """Функции, чаще всего оказывавшиеся на вершине стека: [(функция, доля сэмплов)]."""
+        total = sum(self.samples.values()) or 1
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [(leaf, count / total) for leaf, count in leaves.most_common(limit)]
+
+
+class Profiler:
+    """
+    Профилирование участка программы с сохранением результата в файл.
+
+    Режим 'cprofile' - точный учет всех вызовов, но заметно замедляет выполнение;
+    результат - статистика pstats (python -m pstats, snakeviz). Режим 'sample' -
+    сэмплирование стеков почти без накладных расходов; результат - свернутые стеки.
+    """
+
+    MODES = ('cprofile', 'sample')
+
+    def __init__(self, output, mode='cprofile', limit=30):
+        """
+        Args:
+            output (str): Файл результата.
+            mode (str): 'cprofile' или 'sample'.
+            limit (int): Сколько самых тяжелых функций напечатать при остановке.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим профилирования {mode!r}, ожидается один из {self.MODES}")
+        self.output = output
+        self.mode = mode
+        self.limit = limit
+        self._profiler = cProfile.Profile() if mode == 'cprofile' else SamplingProfiler()
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        """Останавливает профилирование, сохраняет результат и печатает самые тяжелые функции."""
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            self._profiler.dump_stats(self.output)
+            report = io.StringIO()
+            pstats.Stats(self._profiler, stream=report).sort_stats('cumulative').print_stats(self.limit)
+            print(report.getvalue())
+            print(f"📊 Профиль сохранен в {self.output}")
+            return
+
+        self._profiler.stop()
+        self._profiler.dump(self.output)
+        for leaf, share in self._profiler.top(self.limit):
+            print(f"{share:6.1%}  {leaf}")
+        print(f"📊 Стеки сохранены в {self.output}")
+
+
+@contextmanager
+def profile_run(output, mode='cprofile', limit=30):
+    """
+    Профилирует блок кода (см. Profiler).
+
+        with profile_run('run.prof'):
+            main()
+    """
+    profiler = Profiler(output, mode, limit).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+
+def profiler_from_env():
+    """
+    Запускает профилирование, если задана переменная окружения HH_PROFILE
+    (путь к файлу результата); режим - HH_PROFILE_MODE ('cprofile' или 'sample').
+
+    Returns:
+        Profiler: Запущенный профилировщик (остановить - stop()) или None.
+    """
+    output = os.getenv('HH_PROFILE')
+    if not output:
+        return None
+    return Profiler(output, os.getenv('HH_PROFILE_MODE', 'cprofile')).start()
+
+
+def _configure_from_env():
+    """Подключает приемники из HH_METRICS_LOG, HH_METRICS_FILE и HH_SLOW_QUERY_SECONDS."""
+    sinks = []
+    if os.getenv('HH_METRICS_LOG'):
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+        sinks.append(LogSink())
+    if os.getenv('HH_METRICS_FILE'):
+        sinks.append(PrometheusFileSink(os.getenv('HH_METRICS_FILE')))
+    slow = os.getenv('HH_SLOW_QUERY_SECONDS')
+    if sinks or slow:
+        configure_metrics(sinks, slow_query_seconds=float(slow) if slow else DEFAULT_SLOW_QUERY_SECONDS,
+                          explain_slow=bool(os.getenv('HH_EXPLAIN_SLOW')))
+
+
+_configure_from_env()
+# Последняя сводка при выходе (процессы multiprocessing вызывают flush сами)
+atexit.register(lambda: _metrics.flush())
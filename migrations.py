@@ -0,0 +1,244 @@
+# migrations.py - Версионированные изменения схемы БД
+#
+# create_tables создает исходную схему; migrate доводит ее до текущей,
+# применяя по порядку миграции, которых еще нет в таблице schema_migrations.
+# Каждая миграция выполняется в своей транзакции: если она упала, схема
+# остается на предыдущей версии, и migrate можно просто запустить снова.
+
+from db import acquire_connection, release_connection, create_stats_views, mark_data_changed
+from exchange_rates import get_rates, store_rates, recompute_salary_rub
+
+
+# Произвольный ключ рекомендательной блокировки: две одновременные migrate
+# (например, несколько процессов сбора) не применяют одну миграцию дважды
+MIGRATIONS_LOCK_ID = 4_815_162_342
+
+DEFAULT_PURGE_BATCH = 10000
+
+
+def migration_bigint_keys(cur):
+    """
+    ID вакансий и работодателей на hh.ru - числа. BIGINT занимает 8 байт
+    вместо строки, а сравнение и соединение по нему дешевле, чем по VARCHAR.
+    """
+    # Представления с агрегатами ссылаются на столбцы ключей - пересоздаем их
+    cur.execute("""
+        DROP MATERIALIZED VIEW IF EXISTS employer_stats;
+        DROP MATERIALIZED VIEW IF EXISTS salary_stats;
+        ALTER TABLE vacancies DROP CONSTRAINT IF EXISTS vacancies_employer_id_fkey;
+        ALTER TABLE employers ALTER COLUMN employer_id TYPE BIGINT USING employer_id::bigint;
+        ALTER TABLE vacancies
+            ALTER COLUMN vacancy_id TYPE BIGINT USING vacancy_id::bigint,
+            ALTER COLUMN employer_id TYPE BIGINT USING employer_id::bigint;
+        ALTER TABLE vacancies ADD CONSTRAINT vacancies_employer_id_fkey
+            FOREIGN KEY (employer_id) REFERENCES employers (employer_id);
+    """)
+    create_stats_views(cur)
+
+
+def migration_employer_id_index(cur):
+    """
+    Индекс по внешнему ключу: соединение с employers и выборка вакансий
+    одного работодателя (в том числе архивация при синхронизации) идут по
+    индексу, а не полным просмотром таблицы.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS vacancies_employer_id_idx ON vacancies (employer_id);")
+
+
+def migration_published_at_index(cur):
+    """
+    Индекс по дате публикации: выборки и удаление за период не читают всю таблицу.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS vacancies_published_at_idx ON vacancies (published_at);")
+
+
+def migration_salary_rub(cur):
+    """
+    Зарплата в рублях для сравнения вакансий в разных валютах.
+    Пока курсов валют в БД нет, в рублях известны только рублевые вилки.
+    """
+    cur.execute("""
+        ALTER TABLE vacancies
+            ADD COLUMN IF NOT EXISTS salary_from_rub INTEGER
+                GENERATED ALWAYS AS (CASE WHEN salary_currency IN ('RUR', 'RUB') THEN salary_from END) STORED,
+            ADD COLUMN IF NOT EXISTS salary_to_rub INTEGER
+                GENERATED ALWAYS AS (CASE WHEN salary_currency IN ('RUR', 'RUB') THEN salary_to END) STORED;
+    """)
+
+
+def migration_updated_at_index(cur):
+    """
+    Индекс по времени изменения: дописывание выгрузки в Parquet (export.py)
+    читает только вакансии, измененные после прошлой выгрузки.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS vacancies_updated_at_idx ON vacancies (updated_at);")
+
+
+def migration_salary_rub_rates(cur):
+    """
+    Зарплата в рублях по курсам валют. Вычисляемые столбцы из миграции 4 знали
+    только рубли; теперь это обычные столбцы, которые заполняются при записи
+    вакансии (db.vacancy_to_row), а курсы хранятся в таблице exchange_rates.
+    Средние в employer_stats и salary_stats тоже считаются в рублях.
+    """
+    cur.execute("""
+        DROP MATERIALIZED VIEW IF EXISTS employer_stats;
+        DROP MATERIALIZED VIEW IF EXISTS salary_stats;
+        ALTER TABLE vacancies
+            ALTER COLUMN salary_from_rub DROP EXPRESSION IF EXISTS,
+            ALTER COLUMN salary_to_rub DROP EXPRESSION IF EXISTS;
+    """)
+    store_rates(cur, get_rates())
+    recompute_salary_rub(cur)
+    # Отбор вакансий с зарплатой выше средней (db.higher_salary_sql) идет по этому индексу
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS vacancies_salary_rub_max_idx
+            ON vacancies ((GREATEST(salary_from_rub, salary_to_rub)))
+            WHERE NOT archived;
+    """)
+    create_stats_views(cur)
+
+
+# (версия, имя, функция). Новые миграции только дописываются в конец
+MIGRATIONS = [
+    (1, 'bigint_keys', migration_bigint_keys),
+    (2, 'employer_id_index', migration_employer_id_index),
+    (3, 'published_at_index', migration_published_at_index),
+    (4, 'salary_rub', migration_salary_rub),
+    (5, 'updated_at_index', migration_updated_at_index),
+    (6, 'salary_rub_rates', migration_salary_rub_rates),
+]
+
+
+def applied_migrations(cur):
+    """
+    Возвращает версии уже примененных миграций.
+
+    Args:
+        cur: Курсор psycopg2.
+
+    Returns:
+        set: Номера версий.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("SELECT version FROM schema_migrations;")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(params, target=None):
+    """
+    Применяет недостающие миграции по порядку.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        target (int): Последняя версия, которую нужно применить (по умолчанию - все).
+
+    Returns:
+        list: Номера примененных сейчас версий или None при ошибке.
+    """
+    conn = None
+    cur = None
+    applied = []
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        for version, name, migration in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            # Блокировка держится до конца транзакции миграции
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATIONS_LOCK_ID,))
+            if version in applied_migrations(cur):
+                conn.commit()
+                continue
+
+            migration(cur)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+            conn.commit()
+            applied.append(version)
+            print(f"✅ Миграция {version} ({name}) применена")
+
+        if not applied:
+            print("✅ Схема БД уже актуальна")
+        else:
+            # Миграции могут менять данные (например, зарплату в рублях): кэши запросов устарели
+            mark_data_changed(conn)
+
+    except Exception as e:
+        print(f"❌ Ошибка при миграции схемы: {e}")
+        if conn:
+            conn.rollback()
+        applied = None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return applied
+
+
+def purge_vacancies(params, published_before, archived_only=True, batch_size=DEFAULT_PURGE_BATCH):
+    """
+    Удаляет вакансии, опубликованные раньше заданной даты.
+
+    Удаление идет пачками по индексу vacancies_published_at_idx, каждая пачка
+    в своей транзакции, чтобы не держать долгие блокировки.
+
+    Args:
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        published_before (datetime | str): Граница даты публикации.
+        archived_only (bool): Удалять только закрытые (архивные) вакансии.
+        batch_size (int): Строк в одной пачке.
+
+    Returns:
+        int: Сколько вакансий удалено (None при ошибке).
+    """
+    conn = None
+    cur = None
+    deleted = 0
+
+    archived_filter = "AND archived" if archived_only else ""
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+
+        while True:
+            cur.execute(f"""
+                DELETE FROM vacancies
+                WHERE vacancy_id IN (
+                    SELECT vacancy_id FROM vacancies
+                    WHERE published_at < %s {archived_filter}
+                    LIMIT %s
+                );
+            """, (published_before, batch_size))
+            conn.commit()
+            deleted += cur.rowcount
+            if cur.rowcount < batch_size:
+                break
+
+        if deleted:
+            mark_data_changed(conn)
+
+        print(f"✅ Удалено вакансий, опубликованных до {published_before}: {deleted}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при удалении старых вакансий: {e}")
+        if conn:
+            conn.rollback()
+        deleted = None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return deleted
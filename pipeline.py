@@ -0,0 +1,425 @@
+# pipeline.py - Конвейерная загрузка: сбор из API, нормализация и запись в БД идут одновременно
+#
+# Стадии связаны очередями ограниченного размера:
+#
+#   ID работодателей -> загрузчики (N потоков) -> нормализатор -> пакетная запись в БД
+#
+# Пока загрузчики ждут ответов hh.ru, писатель уже пишет в PostgreSQL
+# предыдущие страницы. Если какая-то стадия не успевает, очередь перед ней
+# заполняется и предыдущая стадия ждет (backpressure), так что в памяти
+# держится не больше queue_size сообщений на очередь.
+
+import queue
+import threading
+import time
+
+import psycopg2.extras
+
+from api_HH import get_company_data, iter_vacancy_pages, DEFAULT_CONCURRENCY
+from db import (
+    acquire_connection, release_connection, mark_data_changed, upsert_changed_rows, vacancy_list_complete,
+    employer_to_sync_row, vacancy_to_sync_row, SYNC_EMPLOYER_COLUMNS, SYNC_VACANCY_COLUMNS, DEFAULT_BATCH_SIZE,
+)
+
+
+DEFAULT_QUEUE_SIZE = 100       # Сообщений (страниц вакансий) в каждой очереди
+DEFAULT_FLUSH_INTERVAL = 1.0   # Секунды: неполная пачка пишется, если новых данных долго нет
+
+# Конец потока данных от одной стадии
+_DONE = object()
+
+
+class StageMetrics:
+    """
+    Счетчики одной стадии конвейера.
+
+    items - обработанные элементы (работодатели, вакансии, строки), busy -
+    время, которое потоки стадии работали, а не ждали очередь. Глубина входной
+    очереди замеряется при каждом чтении из нее: если она почти всегда полна,
+    эта стадия - узкое место; если почти всегда пуста - узкое место выше.
+    """
+
+    def __init__(self, name, workers=1, input_queue=None):
+        self.name = name
+        self.workers = workers
+        self.input_queue = input_queue
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def record(self, items, seconds):
+        """Учитывает items обработанных элементов за seconds секунд работы."""
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def sample_depth(self):
+        """Замеряет глубину входной очереди."""
+        if self.input_queue is None:
+            return
+        depth = self.input_queue.qsize()
+        with self._lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: 'stage', 'items', 'throughput' (элементов в секунду),
+                  'utilization' (доля времени в работе), 'queue_depth',
+                  'queue_depth_avg', 'queue_depth_max'.
+        """
+        end = self.finished_at or time.perf_counter()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        with self._lock:
+            return {
+                'stage': self.name,
+                'items': self.items,
+                'throughput': self.items / elapsed if elapsed else 0.0,
+                'utilization': self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+                'queue_depth': self.input_queue.qsize() if self.input_queue is not None else 0,
+                'queue_depth_avg': self.depth_total / self.depth_samples if self.depth_samples else 0.0,
+                'queue_depth_max': self.depth_max,
+            }
+
+
+class IngestPipeline:
+    """
+    Собирает работодателей и их вакансии и пишет их в БД конвейером.
+
+    Запись инкрементальная, как в sync_vacancies_to_db: неизменившиеся строки
+    не перезаписываются, вакансии полностью собранного работодателя, которых
+    больше нет в выдаче, помечаются архивными. Каждая пачка пишется в своей
+    транзакции одним соединением.
+    """
+
+    def __init__(self, params, fetchers=DEFAULT_CONCURRENCY, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        Args:
+            params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+            fetchers (int): Число потоков, запрашивающих API.
+            queue_size (int): Предельный размер каждой очереди между стадиями.
+            batch_size (int): Строк вакансий в одной транзакции записи.
+            flush_interval (float): Через сколько секунд без новых данных писать неполную пачку.
+        """
+        self.params = params
+        self.fetchers = max(1, fetchers)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.ids_queue = queue.Queue(maxsize=queue_size)
+        self.raw_queue = queue.Queue(maxsize=queue_size)
+        self.rows_queue = queue.Queue(maxsize=queue_size)
+
+        self.fetch_metrics = StageMetrics('fetch', self.fetchers, self.ids_queue)
+        self.normalize_metrics = StageMetrics('normalize', 1, self.raw_queue)
+        self.write_metrics = StageMetrics('write', 1, self.rows_queue)
+
+        self.failed_employers = []
+        self.completed_employers = []
+        self.counters = {'employers_inserted': 0, 'employers_updated': 0, 'vacancies_inserted': 0,
+                         'vacancies_updated': 0, 'vacancies_total': 0, 'archived': 0}
+        self.error = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def metrics(self):
+        """Возвращает снимки StageMetrics всех стадий по порядку."""
+        return [stage.snapshot() for stage in (self.fetch_metrics, self.normalize_metrics, self.write_metrics)]
+
+    def print_metrics(self):
+        """Печатает пропускную способность и заполненность очередей по стадиям."""
+        for stage in self.metrics():
+            print(f"📊 {stage['stage']:>9}: {stage['items']} шт., {stage['throughput']:,.0f}/с, "
+                  f"загрузка {stage['utilization']:.0%}, очередь ср. {stage['queue_depth_avg']:.1f} "
+                  f"/ макс. {stage['queue_depth_max']}")
+
+    # --- Стадия 0: подача ID ---
+
+    def _feed(self, employer_ids):
+        for employer_id in employer_ids:
+            if self._stop.is_set():
+                break
+            self.ids_queue.put(employer_id)
+        for _ in range(self.fetchers):
+            self.ids_queue.put(_DONE)
+
+    # --- Стадия 1: загрузка из API ---
+
+    def _fetch(self):
+        while True:
+            self.fetch_metrics.sample_depth()
+            employer_id = self.ids_queue.get()
+            if employer_id is _DONE:
+                self.raw_queue.put(_DONE)
+                return
+            if self._stop.is_set():
+                continue
+
+            started = time.perf_counter()
+            try:
+                company_data = get_company_data(employer_id)
+                self.raw_queue.put(('employer', company_data))
+                for _, vacancies in iter_vacancy_pages(company_data):
+                    self.raw_queue.put(('vacancies', company_data.get('id'), vacancies))
+                # Только после всех страниц вакансии работодателя можно архивировать,
+                # и только если HH отдал его список целиком (см. db.vacancy_list_complete)
+                self.raw_queue.put(('complete', company_data.get('id'), vacancy_list_complete(company_data)))
+            except Exception as e:
+                print(f"❌ Ошибка при сборе работодателя {employer_id}: {e}")
+                with self._lock:
+                    self.failed_employers.append(employer_id)
+            # Время ожидания свободного места в raw_queue тоже попадает сюда:
+            # загрузка 100% при полной очереди значит, что тормозит следующая стадия
+            self.fetch_metrics.record(1, time.perf_counter() - started)
+
+    # --- Стадия 2: нормализация в строки таблиц ---
+
+    def _normalize(self):
+        remaining = self.fetchers
+        # Работодатели, данные которых не удалось разобрать: остальные их сообщения
+        # пропускаются, чтобы вакансии с пропущенных страниц не ушли в архив
+        failed = set()
+        while remaining:
+            self.normalize_metrics.sample_depth()
+            message = self.raw_queue.get()
+            if message is _DONE:
+                remaining -= 1
+                continue
+
+            started = time.perf_counter()
+            kind = message[0]
+            employer_id = message[1].get('id') if kind == 'employer' else message[1]
+            if employer_id in failed:
+                continue
+            try:
+                if kind == 'employer':
+                    out = ('employer', employer_to_sync_row(message[1]))
+                    items = 1
+                elif kind == 'vacancies':
+                    out = ('vacancies', [vacancy_to_sync_row(vacancy, employer_id) for vacancy in message[2]])
+                    items = len(out[1])
+                else:
+                    out = message
+                    items = 0
+            except Exception as e:
+                print(f"❌ Ошибка при разборе данных работодателя {employer_id}: {e}")
+                failed.add(employer_id)
+                with self._lock:
+                    self.failed_employers.append(employer_id)
+                continue
+            self.normalize_metrics.record(items, time.perf_counter() - started)
+            self.rows_queue.put(out)
+        self.rows_queue.put(_DONE)
+
+    # --- Стадия 3: пакетная запись ---
+
+    def _write(self):
+        conn = None
+        cur = None
+        employer_rows = {}
+        vacancy_rows = []
+        completed = []
+        finished = False
+
+        try:
+            conn = acquire_connection(self.params)
+            cur = conn.cursor()
+            # Какие вакансии видели у работодателей, которые еще собираются;
+            # типы столбцов берем из основной таблицы. Схема pg_temp в DROP - чтобы
+            # не удалить постоянную таблицу с тем же именем
+            cur.execute("""
+                DROP TABLE IF EXISTS pg_temp.pipeline_seen_vacancies;
+                CREATE TEMP TABLE pipeline_seen_vacancies AS
+                SELECT vacancy_id, employer_id FROM vacancies WITH NO DATA;
+                CREATE INDEX ON pipeline_seen_vacancies (vacancy_id);
+                DROP TABLE IF EXISTS pg_temp.pipeline_completed_employers;
+                CREATE TEMP TABLE pipeline_completed_employers ON COMMIT DELETE ROWS AS
+                SELECT employer_id, TRUE AS archive FROM employers WITH NO DATA;
+            """)
+            conn.commit()
+
+            while True:
+                self.write_metrics.sample_depth()
+                try:
+                    message = self.rows_queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    message = None
+
+                if message is _DONE:
+                    finished = True
+                    self._flush(conn, cur, employer_rows, vacancy_rows, completed)
+                    break
+                if message is not None:
+                    kind = message[0]
+                    if kind == 'employer':
+                        employer_rows[message[1][0]] = message[1]
+                    elif kind == 'vacancies':
+                        vacancy_rows.extend(message[1])
+                    else:
+                        completed.append((message[1], message[2]))
+
+                full = (len(vacancy_rows) >= self.batch_size or len(employer_rows) >= self.batch_size
+                        or len(completed) >= self.batch_size)
+                if full or (message is None and (employer_rows or vacancy_rows or completed)):
+                    self._flush(conn, cur, employer_rows, vacancy_rows, completed)
+                    employer_rows = {}
+                    vacancy_rows = []
+                    completed = []
+
+            cur.execute("DROP TABLE pg_temp.pipeline_seen_vacancies; DROP TABLE pg_temp.pipeline_completed_employers;")
+            conn.commit()
+
+        except Exception as e:
+            print(f"❌ Ошибка при записи в БД: {e}")
+            self.error = e
+            self._stop.set()
+            if conn:
+                conn.rollback()
+            # Дочитываем очередь, чтобы загрузчики не зависли на полной очереди
+            while not finished and self.rows_queue.get() is not _DONE:
+                pass
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_connection(self.params, conn)
+
+    def _flush(self, conn, cur, employer_rows, vacancy_rows, completed):
+        """Пишет пачку одной транзакцией и архивирует вакансии завершенных работодателей."""
+        started = time.perf_counter()
+
+        # Работодатели раньше вакансий: на них ссылается внешний ключ
+        employers_inserted, employers_updated, _ = upsert_changed_rows(
+            cur, 'employers', SYNC_EMPLOYER_COLUMNS, 'employer_id', employer_rows.values(), self.batch_size
+        )
+        inserted, updated, total = upsert_changed_rows(
+            cur, 'vacancies', SYNC_VACANCY_COLUMNS, 'vacancy_id', vacancy_rows, self.batch_size,
+            extra_set=', archived = FALSE'
+        )
+        if vacancy_rows:
+            psycopg2.extras.execute_values(
+                cur, "INSERT INTO pipeline_seen_vacancies (vacancy_id, employer_id) VALUES %s",
+                [(row[0], row[1]) for row in vacancy_rows], page_size=self.batch_size
+            )
+
+        archived = 0
+        if completed:
+            psycopg2.extras.execute_values(
+                cur, "INSERT INTO pipeline_completed_employers VALUES %s", completed
+            )
+            # Архивная вакансия с прежним хэшем не обновилась выше - возвращаем ее отдельно
+            cur.execute("""
+                UPDATE vacancies v SET archived = FALSE, updated_at = now()
+                FROM pipeline_seen_vacancies s
+                JOIN pipeline_completed_employers c ON c.employer_id = s.employer_id
+                WHERE v.vacancy_id = s.vacancy_id AND v.archived;
+            """)
+            updated += cur.rowcount
+            cur.execute("""
+                UPDATE vacancies v SET archived = TRUE, updated_at = now()
+                WHERE NOT v.archived
+                  AND v.employer_id IN (SELECT employer_id FROM pipeline_completed_employers WHERE archive)
+                  AND NOT EXISTS (SELECT 1 FROM pipeline_seen_vacancies s WHERE s.vacancy_id = v.vacancy_id);
+            """)
+            archived = cur.rowcount
+            cur.execute("""
+                DELETE FROM pipeline_seen_vacancies
+                WHERE employer_id IN (SELECT employer_id FROM pipeline_completed_employers);
+            """)
+
+        conn.commit()
+        if employers_inserted or employers_updated or inserted or updated or archived:
+            mark_data_changed(conn)
+
+        with self._lock:
+            self.completed_employers.extend(employer_id for employer_id, _ in completed)
+            self.counters['employers_inserted'] += employers_inserted
+            self.counters['employers_updated'] += employers_updated
+            self.counters['vacancies_inserted'] += inserted
+            self.counters['vacancies_updated'] += updated
+            self.counters['vacancies_total'] += total
+            self.counters['archived'] += archived
+        self.write_metrics.record(len(employer_rows) + len(vacancy_rows), time.perf_counter() - started)
+
+    def run(self, employer_ids):
+        """
+        Прогоняет работодателей через конвейер и ждет окончания записи.
+
+        Args:
+            employer_ids (iterable): ID работодателей.
+
+        Returns:
+            dict: Счетчики записи, 'completed' и 'failed' (списки ID работодателей)
+                  или None, если запись в БД не удалась.
+        """
+        threads = [threading.Thread(target=self._feed, args=(employer_ids,), name='pipeline-feed')]
+        threads += [threading.Thread(target=self._fetch, name=f'pipeline-fetch-{number}')
+                    for number in range(self.fetchers)]
+        threads += [threading.Thread(target=self._normalize, name='pipeline-normalize'),
+                    threading.Thread(target=self._write, name='pipeline-write')]
+
+        for stage in (self.fetch_metrics, self.normalize_metrics, self.write_metrics):
+            stage.start()
+        for thread in threads:
+            thread.start()
+
+        # Стадии завершаются по порядку, потому что _DONE идет по конвейеру следом за данными
+        threads[0].join()
+        for thread in threads[1:1 + self.fetchers]:
+            thread.join()
+        self.fetch_metrics.finish()
+        threads[-2].join()
+        self.normalize_metrics.finish()
+        threads[-1].join()
+        self.write_metrics.finish()
+
+        if self.error is not None:
+            return None
+
+        counters = dict(self.counters)
+        # Возврат из архива может попасть в более позднюю пачку, чем сама строка,
+        # поэтому неизменившиеся считаются по итогам всего прогона
+        counters['vacancies_unchanged'] = max(
+            0, counters.pop('vacancies_total') - counters['vacancies_inserted'] - counters['vacancies_updated']
+        )
+        print(f"✅ Конвейер: работодателей {len(self.completed_employers)} (ошибок {len(self.failed_employers)}), "
+              f"вакансий новых {counters['vacancies_inserted']}, изменилось {counters['vacancies_updated']}, "
+              f"без изменений {counters['vacancies_unchanged']}, закрыто {counters['archived']}")
+        return {**counters, 'completed': list(self.completed_employers), 'failed': list(self.failed_employers)}
+
+
+def ingest(employer_ids, params, fetchers=DEFAULT_CONCURRENCY, queue_size=DEFAULT_QUEUE_SIZE,
+           batch_size=DEFAULT_BATCH_SIZE, show_metrics=True):
+    """
+    Собирает работодателей и загружает их в БД конвейером (см. IngestPipeline).
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        fetchers (int): Число потоков, запрашивающих API.
+        queue_size (int): Предельный размер каждой очереди между стадиями.
+        batch_size (int): Строк вакансий в одной транзакции записи.
+        show_metrics (bool): Напечатать метрики стадий после завершения.
+
+    Returns:
+        dict: Итоги IngestPipeline.run или None, если запись в БД не удалась.
+    """
+    pipeline = IngestPipeline(params, fetchers, queue_size, batch_size)
+    summary = pipeline.run(employer_ids)
+    if show_metrics:
+        pipeline.print_metrics()
+    return summary
@@ -0,0 +1,254 @@
+# query_cache.py - Кэш результатов запросов DBManager
+#
+# Данные в БД меняются только при загрузке, поэтому результат запроса можно
+# переиспользовать, пока не изменилось поколение данных (db.mark_data_changed).
+# Поколение входит в ключ: после записи старые ключи просто перестают
+# запрашиваться и вытесняются, отдельная инвалидация не нужна.
+#
+# В общее хранилище результаты пишутся в JSON, а не pickle: разбор pickle
+# выполняет код, и любой, кто может писать в Redis, мог бы запустить его
+# во всех процессах с этим кэшем.
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_ROWS = 1_000_000      # Суммарно строк во всех закэшированных результатах
+DEFAULT_SHARED_TTL = 24 * 60 * 60  # Сколько хранить результаты в общем хранилище
+
+
+def encode_result(value):
+    """
+    Сериализует результат запроса для общего хранилища.
+
+    Кортежи (строки), Decimal и даты помечаются, чтобы decode_result вернул те же типы.
+
+    Args:
+        value: Список строк или одно значение.
+
+    Returns:
+        bytes: JSON в UTF-8.
+
+    Raises:
+        TypeError: В результате есть значение, которое не сериализуется.
+    """
+    return json.dumps(_to_json(value), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _to_json(value):
+    if isinstance(value, tuple):
+        return {'__tuple__': [_to_json(item) for item in value]}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {'__dict__': [[key, _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    # datetime - подкласс date, поэтому проверяется первым
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f'Значение типа {type(value).__name__} не сохраняется в общем кэше')
+
+
+_DECODERS = {
+    '__tuple__': tuple,
+    '__dict__': dict,
+    '__decimal__': Decimal,
+    '__datetime__': datetime.fromisoformat,
+    '__date__': date.fromisoformat,
+}
+
+
+def _from_json(obj):
+    if len(obj) == 1:
+        (tag, data), = obj.items()
+        if tag in _DECODERS:
+            return _DECODERS[tag](data)
+    return obj
+
+
+def decode_result(data):
+    """
+    Восстанавливает результат, записанный encode_result.
+
+    Raises:
+        ValueError: Данные не разбираются (чужой или испорченный формат).
+    """
+    return json.loads(data, object_hook=_from_json)
+
+
+class RedisBackend:
+    """
+    Общее хранилище результатов в Redis для нескольких процессов или машин.
+
+    Нужен пакет redis (pip install redis); он импортируется только здесь.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='hh_query_cache', ttl=DEFAULT_SHARED_TTL):
+        """
+        Args:
+            url (str): Адрес Redis.
+            prefix (str): Префикс ключей.
+            ttl (int): Сколько секунд хранить результат (старые поколения истекают сами).
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("Для общего кэша запросов нужен пакет redis: pip install redis") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key):
+        return f'{self.prefix}:{hashlib.sha1(repr(key).encode("utf-8")).hexdigest()}'
+
+    def get(self, key):
+        """Возвращает сериализованный результат или None."""
+        return self.client.get(self._key(key))
+
+    def set(self, key, data):
+        """Сохраняет сериализованный результат."""
+        self.client.set(self._key(key), data, ex=self.ttl)
+
+
+class QueryCache:
+    """
+    LRU-кэш результатов запросов в памяти процесса с ограничением по числу
+    записей и по суммарному числу строк.
+
+    Если задано общее хранилище (например, RedisBackend), промах в памяти
+    сначала ищется там, а новые результаты пишутся в оба места.
+    Экземпляр можно использовать из нескольких потоков.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_rows=DEFAULT_MAX_ROWS, backend=None):
+        """
+        Args:
+            max_entries (int): Предельное число результатов в памяти.
+            max_rows (int): Предельное суммарное число строк в памяти; результат
+                            больше этого не кэшируется.
+            backend: Общее хранилище с методами get(key) и set(key, data) или None.
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0          # Найдено в памяти
+        self.shared_hits = 0   # Найдено в общем хранилище
+        self.misses = 0        # Запрос пришлось выполнить
+        self.evictions = 0
+
+    @staticmethod
+    def _weight(value):
+        return len(value) if isinstance(value, list) else 1
+
+    def get(self, key):
+        """
+        Ищет результат.
+
+        Args:
+            key (tuple): Ключ (метод, параметры, поколение данных).
+
+        Returns:
+            tuple: (найден ли результат, результат).
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+
+        if self.backend is not None:
+            try:
+                data = self.backend.get(key)
+            except Exception as e:
+                # Недоступное общее хранилище не должно ломать запросы
+                print(f"⚠️ Общий кэш недоступен: {e}")
+                data = None
+            if data is not None:
+                try:
+                    value = decode_result(data)
+                except (ValueError, TypeError) as e:
+                    # Неразборчивая запись считается промахом и будет перезаписана
+                    print(f"⚠️ Запись общего кэша не прочитана: {e}")
+                    data = None
+            if data is not None:
+                self._put_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        """
+        Сохраняет результат.
+
+        Args:
+            key (tuple): Ключ (метод, параметры, поколение данных).
+            value: Результат запроса (список строк или одно значение).
+        """
+        self._put_local(key, value)
+        if self.backend is not None:
+            try:
+                data = encode_result(value)
+            except TypeError as e:
+                print(f"⚠️ Результат не записан в общий кэш: {e}")
+                return
+            try:
+                self.backend.set(key, data)
+            except Exception as e:
+                print(f"⚠️ Общий кэш недоступен: {e}")
+
+    def _put_local(self, key, value):
+        weight = self._weight(value)
+        if weight > self.max_rows:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._rows -= self._weight(self._entries.pop(key))
+            self._entries[key] = value
+            self._rows += weight
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= self._weight(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Очищает кэш в памяти (общее хранилище не трогается)."""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self):
+        """
+        Возвращает счетчики кэша.
+
+        Returns:
+            dict: 'hits', 'shared_hits', 'misses', 'evictions', 'hit_rate', 'entries', 'rows'.
+        """
+        with self._lock:
+            total = self.hits + self.shared_hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared_hits) / total if total else 0.0,
+                'entries': len(self._entries),
+                'rows': self._rows,
+            }
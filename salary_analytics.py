@@ -0,0 +1,247 @@
+# salary_analytics.py - Статистика зарплат: медиана, перцентили, гистограмма и счетчики
+#
+# Все статистики считаются в PostgreSQL одним запросом (percentile_cont и
+# width_bucket по одному проходу по вакансиям), в Python приходит только по
+# строке на группу. Результаты кэшируются до следующей записи данных
+# (см. db.mark_data_changed), поэтому панели не пересчитывают их на каждый запрос.
+
+import threading
+
+from db import acquire_connection, release_connection, get_data_generation, salary_midpoint_sql
+
+
+# Границы корзин гистограммы в рублях: до 50 000, 50-100 тыс., ..., от 500 000
+DEFAULT_HISTOGRAM_EDGES = tuple(range(0, 500001, 50000))
+
+PERCENTILES = (0.1, 0.5, 0.9)
+
+# Измерение -> (выражение группы, соединение для него, подпись группы)
+DIMENSIONS = {
+    'all': ("'all'", "", "s.grp"),
+    'employer': ("v.employer_id", "", "COALESCE(e.employer_name, s.grp::text)"),
+    'currency': ("v.salary_currency", "", "s.grp"),
+    'keyword': ("k.keyword", "JOIN unnest(%(keywords)s::text[]) AS k(keyword) "
+                             "ON v.title ILIKE '%%' || k.keyword || '%%'", "s.grp"),
+}
+
+
+def salary_summary_sql(by='all', in_rub=True):
+    """
+    Строит запрос статистики зарплат по группам.
+
+    Зарплата вакансии - середина вилки (см. salary_midpoint_sql). Запрос
+    принимает параметры %(edges)s, %(min_count)s, %(limit)s и для
+    by='keyword' - %(keywords)s.
+
+    Args:
+        by (str): Измерение из DIMENSIONS.
+        in_rub (bool): Брать зарплату в рублях (salary_*_rub), а не в валюте вакансии.
+
+    Returns:
+        str: SQL-запрос.
+    """
+    group_sql, join_sql, label_sql = DIMENSIONS[by]
+    midpoint = salary_midpoint_sql('v', '_rub' if in_rub else '')
+    percentiles = ', '.join(str(p) for p in PERCENTILES)
+    employer_join = "LEFT JOIN employers e ON e.employer_id = s.grp" if by == 'employer' else ""
+    return f"""
+        WITH base AS MATERIALIZED (
+            SELECT {group_sql} AS grp, ({midpoint})::float8 AS salary
+            FROM vacancies v {join_sql}
+            WHERE NOT v.archived
+        ),
+        summary AS (
+            SELECT grp,
+                   COUNT(*) AS vacancies,
+                   COUNT(salary) AS with_salary,
+                   AVG(salary) AS mean,
+                   MIN(salary) AS min,
+                   MAX(salary) AS max,
+                   percentile_cont(ARRAY[{percentiles}]) WITHIN GROUP (ORDER BY salary) AS percentiles
+            FROM base
+            GROUP BY grp
+        ),
+        histogram AS (
+            SELECT grp, array_agg(ARRAY[bucket, n] ORDER BY bucket) AS buckets
+            FROM (
+                SELECT grp, width_bucket(salary, %(edges)s::float8[]) AS bucket, COUNT(*) AS n
+                FROM base
+                WHERE salary IS NOT NULL
+                GROUP BY grp, bucket
+            ) counted
+            GROUP BY grp
+        )
+        SELECT s.grp, {label_sql}, s.vacancies, s.with_salary, s.mean, s.min, s.max, s.percentiles, h.buckets
+        FROM summary s
+        LEFT JOIN histogram h ON h.grp = s.grp
+        {employer_join}
+        WHERE s.vacancies >= %(min_count)s
+        ORDER BY s.vacancies DESC, s.grp
+        LIMIT %(limit)s
+    """
+
+
+def histogram_from_buckets(buckets, edges):
+    """
+    Превращает пары (номер корзины width_bucket, количество) в полную гистограмму.
+
+    Args:
+        buckets (list): Пары [номер, количество] или None.
+        edges (tuple): Границы корзин.
+
+    Returns:
+        list: Словари {'from', 'to', 'count'}; у крайних корзин одна граница None.
+    """
+    counts = dict((bucket, count) for bucket, count in buckets or ())
+    bounds = [None] + list(edges) + [None]
+    return [
+        {'from': bounds[index], 'to': bounds[index + 1], 'count': counts.get(index, 0)}
+        for index in range(len(edges) + 1)
+    ]
+
+
+class SalaryAnalytics:
+    """
+    Статистика зарплат по всем вакансиям, работодателям, валютам и ключевым словам.
+
+    Результаты кэшируются в памяти на текущее поколение данных: пока после
+    последней загрузки ничего не записано, повторный запрос не идет в БД
+    дальше чтения номера поколения.
+    """
+
+    def __init__(self, params, edges=DEFAULT_HISTOGRAM_EDGES):
+        """
+        Args:
+            params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+            edges (tuple): Границы корзин гистограммы (в рублях или в валюте вакансии).
+        """
+        self.params = params
+        self.edges = tuple(edges)
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def current_generation(self):
+        """Возвращает текущее поколение данных или None при ошибке."""
+        conn = None
+        cur = None
+        generation = None
+
+        try:
+            conn = acquire_connection(self.params)
+            cur = conn.cursor()
+            generation = get_data_generation(cur)
+            conn.commit()
+        except Exception as e:
+            print(f"❌ Ошибка при чтении поколения данных: {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_connection(self.params, conn)
+
+        return generation
+
+    def summary(self, by='all', keywords=None, in_rub=True, min_count=1, limit=None):
+        """
+        Возвращает статистику зарплат по группам.
+
+        Args:
+            by (str): 'all', 'employer', 'currency' или 'keyword'.
+            keywords (list): Ключевые слова для by='keyword' (поиск по подстроке в названии).
+            in_rub (bool): Считать в рублях. Для by='currency' всегда в валюте вакансии.
+            min_count (int): Пропустить группы, в которых меньше вакансий.
+            limit (int): Вернуть не больше стольких групп (самые крупные).
+
+        Returns:
+            list: Словари с ключами 'group', 'label', 'vacancies', 'with_salary',
+                  'mean', 'min', 'max', 'p10', 'median', 'p90', 'histogram'
+                  (см. histogram_from_buckets) или None при ошибке.
+        """
+        if by not in DIMENSIONS:
+            raise ValueError(f"Неизвестное измерение {by!r}, ожидается одно из {sorted(DIMENSIONS)}")
+        if by == 'keyword' and not keywords:
+            raise ValueError("Для by='keyword' нужен список keywords")
+        if by == 'currency':
+            in_rub = False
+
+        key = (by, tuple(keywords or ()), in_rub, min_count, limit)
+        generation = self.current_generation()
+        with self._lock:
+            if generation is None or generation != self._generation:
+                self._cache.clear()
+                self._generation = generation
+            elif key in self._cache:
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        result = self._compute(by, keywords, in_rub, min_count, limit)
+
+        with self._lock:
+            # Пока шел расчет, могло смениться поколение - тогда не кэшируем
+            if result is not None and generation is not None and generation == self._generation:
+                self._cache[key] = result
+        return result
+
+    def _compute(self, by, keywords, in_rub, min_count, limit):
+        conn = None
+        cur = None
+        result = None
+
+        try:
+            conn = acquire_connection(self.params)
+            cur = conn.cursor()
+            cur.execute(salary_summary_sql(by, in_rub), {
+                'edges': list(self.edges),
+                'min_count': min_count,
+                'limit': limit,
+                'keywords': list(keywords or ()),
+            })
+            result = []
+            for group, label, vacancies, with_salary, mean, low, high, percentiles, buckets in cur.fetchall():
+                p10, median, p90 = percentiles or (None, None, None)
+                result.append({
+                    'group': group,
+                    'label': label,
+                    'vacancies': vacancies,
+                    'with_salary': with_salary,
+                    'mean': mean,
+                    'min': low,
+                    'max': high,
+                    'p10': p10,
+                    'median': median,
+                    'p90': p90,
+                    'histogram': histogram_from_buckets(buckets, self.edges),
+                })
+            conn.commit()
+        except Exception as e:
+            print(f"❌ Ошибка при расчете статистики зарплат: {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_connection(self.params, conn)
+
+        return result
+
+    def stats(self):
+        """
+        Returns:
+            dict: 'hits', 'misses', 'hit_rate', 'entries', 'generation'.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._cache),
+                'generation': self._generation,
+            }
@@ -0,0 +1,343 @@
+# staging.py - Промежуточное хранение сырых ответов API в сжатых JSONL-сегментах
+#
+# Сбор данных пишет ответы hh.ru в файлы по мере их получения, загрузка в БД
+# читает эти файлы. Так обе стадии можно запускать, повторять и
+# распараллеливать независимо, а упавшую загрузку - повторить без нового обхода.
+
+import gzip
+import itertools
+import json
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_HH import get_company_data, iter_vacancy_pages, DEFAULT_CONCURRENCY
+from chunked_load import load_chunked, DEFAULT_CHUNK_ROWS
+from db import sync_employers_to_db, sync_vacancies_to_db, vacancy_list_complete, DEFAULT_BATCH_SIZE
+
+
+DEFAULT_STAGING_DIR = 'staging'
+DEFAULT_SEGMENT_RECORDS = 50000  # Записей в одном сегменте до перехода к следующему
+SEGMENT_SUFFIX = '.jsonl.gz'
+PART_SUFFIX = '.part'            # Недописанный сегмент; читатель его пропускает
+
+
+class SegmentWriter:
+    """
+    Дописывает записи в сжатые JSONL-сегменты одного запуска сбора.
+
+    Каждая запись - одна строка JSON вида {"kind": ..., "employer_id": ..., "payload": {...}}.
+    Сегмент пишется во временный файл *.part и переименовывается, когда заполнен
+    или писатель закрыт, поэтому читатель видит только целые сегменты.
+    Писать можно из нескольких потоков.
+    """
+
+    def __init__(self, run_dir, max_records=DEFAULT_SEGMENT_RECORDS, compresslevel=6):
+        """
+        Args:
+            run_dir (str): Каталог запуска (создается при необходимости).
+            max_records (int): Записей в одном сегменте.
+            compresslevel (int): Степень сжатия gzip (1 - быстрее, 9 - меньше).
+        """
+        os.makedirs(run_dir, exist_ok=True)
+        self.run_dir = run_dir
+        self.max_records = max_records
+        self.compresslevel = compresslevel
+        self.records_written = 0
+        self._lock = threading.Lock()
+        self._segment_number = len(list_segments(run_dir))
+        self._file = None
+        self._path = None
+        self._segment_records = 0
+
+    def _open_segment(self):
+        self._segment_number += 1
+        self._path = os.path.join(self.run_dir, f'{self._segment_number:06d}{SEGMENT_SUFFIX}')
+        self._file = gzip.open(self._path + PART_SUFFIX, 'wt', encoding='utf-8', compresslevel=self.compresslevel)
+        self._segment_records = 0
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path + PART_SUFFIX, self._path)
+        self._file = None
+
+    def write_records(self, records):
+        """
+        Дописывает записи подряд, не перемежая их записями других потоков.
+
+        Args:
+            records (iterable): Словари вида {'kind': ..., ..., 'payload': {...}}.
+        """
+        lines = [json.dumps(record, ensure_ascii=False) for record in records]
+        with self._lock:
+            for line in lines:
+                if self._file is None:
+                    self._open_segment()
+                self._file.write(line)
+                self._file.write('\n')
+                self._segment_records += 1
+                self.records_written += 1
+                if self._segment_records >= self.max_records:
+                    self._close_segment()
+
+    def write(self, kind, payload, **meta):
+        """
+        Дописывает одну запись.
+
+        Args:
+            kind (str): Тип записи: 'employer' или 'vacancy'.
+            payload (dict): Ответ API как есть.
+            **meta: Дополнительные поля записи (employer_id, page, ...).
+        """
+        self.write_records([{'kind': kind, **meta, 'payload': payload}])
+
+    def write_company(self, employer, pages):
+        """
+        Дописывает работодателя и все страницы его вакансий одним непрерывным блоком.
+
+        Args:
+            employer (dict): Данные работодателя.
+            pages (iterable): Пары (номер страницы, список вакансий).
+        """
+        employer_id = employer.get('id')
+        records = [{'kind': 'employer', 'employer_id': employer_id, 'payload': employer}]
+        for page, vacancies in pages:
+            records.extend(
+                {'kind': 'vacancy', 'employer_id': employer_id, 'page': page, 'payload': vacancy}
+                for vacancy in vacancies
+            )
+        self.write_records(records)
+
+    def close(self):
+        """Завершает текущий сегмент."""
+        with self._lock:
+            self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def new_run_dir(staging_dir=DEFAULT_STAGING_DIR):
+    """
+    Возвращает путь к каталогу нового запуска сбора (имя - время запуска).
+
+    Args:
+        staging_dir (str): Корневой каталог промежуточных данных.
+
+    Returns:
+        str: Путь к каталогу запуска.
+    """
+    return os.path.join(staging_dir, time.strftime('%Y%m%dT%H%M%S') + f'-{os.getpid()}')
+
+
+def latest_run_dir(staging_dir=DEFAULT_STAGING_DIR):
+    """
+    Возвращает каталог последнего запуска сбора.
+
+    Args:
+        staging_dir (str): Корневой каталог промежуточных данных.
+
+    Returns:
+        str: Путь к каталогу или None, если запусков нет.
+    """
+    if not os.path.isdir(staging_dir):
+        return None
+    runs = sorted(name for name in os.listdir(staging_dir) if os.path.isdir(os.path.join(staging_dir, name)))
+    return os.path.join(staging_dir, runs[-1]) if runs else None
+
+
+def list_segments(run_dir):
+    """
+    Возвращает завершенные сегменты запуска в порядке записи.
+
+    Args:
+        run_dir (str): Каталог запуска.
+
+    Returns:
+        list: Пути к файлам сегментов.
+    """
+    if not os.path.isdir(run_dir):
+        return []
+    return [os.path.join(run_dir, name) for name in sorted(os.listdir(run_dir)) if name.endswith(SEGMENT_SUFFIX)]
+
+
+def iter_segment(path):
+    """
+    Потоково читает записи одного сегмента.
+
+    Файл отображается в память (mmap), поэтому чтение не копирует сжатые
+    данные в буферы Python и не держит весь сегмент в памяти.
+
+    Args:
+        path (str): Путь к сегменту.
+
+    Yields:
+        dict: Запись сегмента.
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with gzip.GzipFile(fileobj=mapped, mode='rb') as gz:
+                for line in gz:
+                    yield json.loads(line)
+
+
+def iter_records(run_dir, kinds=None):
+    """
+    Потоково читает все записи запуска по порядку.
+
+    Args:
+        run_dir (str): Каталог запуска.
+        kinds (set): Оставить только записи этих типов (None - все).
+
+    Yields:
+        dict: Запись.
+    """
+    for path in list_segments(run_dir):
+        for record in iter_segment(path):
+            if kinds is None or record['kind'] in kinds:
+                yield record
+
+
+def crawl_employer(writer, employer_id):
+    """
+    Собирает одного работодателя со всеми страницами вакансий и пишет их в сегмент.
+
+    Записи попадают в сегмент только после успешной загрузки всех страниц:
+    частично собранный работодатель при загрузке пометил бы недостающие
+    вакансии архивными. HH отдает не больше 2000 вакансий на запрос, так что
+    в памяти держится не больше 2000 вакансий одного работодателя.
+
+    Args:
+        writer (SegmentWriter): Куда писать записи.
+        employer_id: ID работодателя.
+    """
+    company_data = get_company_data(employer_id)
+    pages = list(iter_vacancy_pages(company_data))
+    writer.write_company(company_data, pages)
+
+
+def crawl_to_staging(employer_ids, staging_dir=DEFAULT_STAGING_DIR, concurrency=DEFAULT_CONCURRENCY,
+                     on_error=None):
+    """
+    Собирает работодателей и все их вакансии и пишет сырые ответы в новый запуск.
+
+    Args:
+        employer_ids (iterable): ID работодателей.
+        staging_dir (str): Корневой каталог промежуточных данных.
+        concurrency (int): Сколько работодателей запрашивать одновременно.
+        on_error (callable): Функция (employer_id, exception) для ошибок отдельных
+                             работодателей; если не задана, первая ошибка прерывает сбор.
+
+    Returns:
+        str: Каталог запуска с записанными сегментами.
+    """
+    run_dir = new_run_dir(staging_dir)
+
+    def crawl_one(employer_id):
+        try:
+            crawl_employer(writer, employer_id)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(employer_id, e)
+
+    with SegmentWriter(run_dir) as writer:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            # list() дожидается всех работодателей и пробрасывает исключения
+            list(executor.map(crawl_one, employer_ids))
+    print(f"✅ Сохранено записей: {writer.records_written} в {run_dir}")
+    return run_dir
+
+
+def iter_staged_companies(run_dir):
+    """
+    Собирает записи запуска в словари компаний для sync_vacancies_to_db.
+
+    Записи одного работодателя идут подряд (см. SegmentWriter.write_company);
+    вакансии каждой компании отдаются лениво, без чтения всего сегмента в память.
+
+    Args:
+        run_dir (str): Каталог запуска.
+
+    Yields:
+        dict: {'id': ID работодателя, 'vacancies': итератор вакансий,
+            'vacancies_complete': полон ли список вакансий (см. db.vacancy_list_complete)}.
+    """
+    for employer_id, employer, pages in iter_staged_company_pages(run_dir):
+        yield {
+            'id': employer_id,
+            'vacancies': (vacancy for _, vacancies in pages for vacancy in vacancies),
+            'vacancies_complete': vacancy_list_complete(employer or {}),
+        }
+
+
+def iter_staged_company_pages(run_dir):
+    """
+    Собирает записи запуска по работодателям и страницам вакансий для load_chunked.
+
+    Args:
+        run_dir (str): Каталог запуска.
+
+    Yields:
+        tuple: (ID работодателя, данные работодателя или None, итератор пар (страница, вакансии)).
+    """
+    records = iter_records(run_dir)
+    for employer_id, group in itertools.groupby(records, key=lambda record: record['employer_id']):
+        # Запись работодателя идет перед его вакансиями (см. SegmentWriter.write_company)
+        first = next(group)
+        employer = first['payload'] if first['kind'] == 'employer' else None
+        vacancies = itertools.chain([] if employer is not None else [first], group)
+        pages = ((page, [record['payload'] for record in page_records])
+                 for page, page_records in itertools.groupby(vacancies, key=lambda record: record.get('page', 0)))
+        yield employer_id, employer, pages
+
+
+def load_staging_chunked(run_dir, params, chunk_rows=DEFAULT_CHUNK_ROWS, per_employer=False, job_name=None,
+                         restart=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Загружает запуск сбора частями с контрольными точками (см. chunked_load.load_chunked).
+
+    Прерванная загрузка того же запуска продолжается с последней зафиксированной страницы.
+
+    Args:
+        run_dir (str): Каталог запуска.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        chunk_rows (int): Вакансий в одной транзакции.
+        per_employer (bool): Фиксировать транзакцию после каждого работодателя.
+        job_name (str): Имя задания; по умолчанию - 'staging:' и имя каталога запуска.
+        restart (bool): Загрузить запуск заново, забыв контрольную точку.
+        batch_size (int): Размер пачки записи.
+
+    Returns:
+        dict: Итог load_chunked или None при ошибке.
+    """
+    job_name = job_name or f'staging:{os.path.basename(os.path.normpath(run_dir))}'
+    return load_chunked(iter_staged_company_pages(run_dir), params, job_name, chunk_rows=chunk_rows,
+                        per_employer=per_employer, batch_size=batch_size, restart=restart)
+
+
+def load_staging(run_dir, params, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Загружает запуск сбора из сегментов в PostgreSQL (инкрементально).
+
+    Args:
+        run_dir (str): Каталог запуска.
+        params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+        batch_size (int): Размер пачки записи.
+
+    Returns:
+        tuple: Итоги sync_employers_to_db и sync_vacancies_to_db.
+    """
+    employers = (record['payload'] for record in iter_records(run_dir, kinds={'employer'}))
+    employers_summary = sync_employers_to_db(employers, params, batch_size)
+    vacancies_summary = sync_vacancies_to_db(iter_staged_companies(run_dir), params, batch_size)
+    return employers_summary, vacancies_summary
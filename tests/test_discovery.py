@@ -0,0 +1,51 @@
+# Поиск работодателей (discovery.py) против заглушки API из benchmarks/stub_hh.py
+
+import pytest
+
+import discovery
+from benchmarks.stub_hh import start_stub_server
+
+
+EMPLOYERS = 12000
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """Заглушка HH с EMPLOYERS работодателями (по одной вакансии у каждого)."""
+    server, url = start_stub_server(vacancies_per_employer=1, employers=EMPLOYERS)
+    monkeypatch.setattr(discovery, 'HH_API', url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def discover(tmp_path, source):
+    found = []
+
+    def sink(employer_ids):
+        found.extend(employer_ids)
+        return len(employer_ids)
+
+    summary = discovery.discover_employers(None, source=source, cursor_path=str(tmp_path / 'cursor.json'),
+                                           concurrency=4, sink=sink)
+    return summary, found
+
+
+def test_vacancy_search_finds_every_employer(stub_api, tmp_path):
+    """Работодатели самой области-родителя находятся поиском по отраслям, ничего не теряется."""
+    summary, found = discover(tmp_path, 'vacancies')
+
+    assert summary['truncated'] == 0
+    assert len(found) == len(set(found))
+    assert set(found) == set(range(1, EMPLOYERS + 1))
+
+
+def test_employer_search_reports_parent_remainder(stub_api, tmp_path):
+    """Поиск работодателей по отраслям не делится: недоступный остаток попадает в truncated."""
+    summary, found = discover(tmp_path, 'employers')
+
+    assert summary['truncated'] > 0
+    cursor = discovery.read_cursor(str(tmp_path / 'cursor.json'))
+    missing = EMPLOYERS - len(set(found))
+    assert missing > 0
+    assert sum(found_count for _, _, found_count in cursor['truncated']) >= missing
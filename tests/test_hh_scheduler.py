@@ -0,0 +1,74 @@
+# Предохранитель хоста (hh_scheduler.CircuitBreaker) против заглушки API из benchmarks/stub_hh.py
+
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.stub_hh import start_stub_server
+from hh_scheduler import RequestScheduler, CircuitOpenError
+
+
+RESET_TIMEOUT = 0.2
+
+
+@pytest.fixture
+def stub_api():
+    """Заглушка HH, отвечающая с задержкой: пробный запрос успевает быть "в пути"."""
+    server, url = start_stub_server(latency=0.5)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def open_breaker(scheduler, url):
+    breaker = scheduler.breaker(requests.utils.urlparse(url).netloc)
+    for _ in range(scheduler.failure_threshold):
+        breaker.record_failure()
+    time.sleep(RESET_TIMEOUT * 1.5)
+    return breaker
+
+
+def test_half_open_lets_through_single_probe(stub_api):
+    """После reset_timeout проходит один пробный запрос, остальные ждут его результата."""
+    server, url = stub_api
+    scheduler = RequestScheduler(rate=100, max_retries=0, failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+    open_breaker(scheduler, url)
+
+    results = []
+
+    def request():
+        try:
+            results.append(scheduler.get(requests.Session(), f'{url}employers/1').status_code)
+        except CircuitOpenError:
+            results.append('open')
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results, key=str) == [200, 'open', 'open', 'open', 'open']
+    assert server.request_count == 1
+    # Проба удалась - предохранитель закрыт
+    assert scheduler.get(requests.Session(), f'{url}employers/1').status_code == 200
+
+
+def test_failed_probe_reopens_breaker(stub_api):
+    """Неудачная проба снова открывает предохранитель на reset_timeout."""
+    _, url = stub_api
+    scheduler = RequestScheduler(rate=100, max_retries=0, failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+    breaker = open_breaker(scheduler, url)
+
+    breaker.before_request('host')
+    for _ in range(4):
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request('host')
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('host')
+    time.sleep(RESET_TIMEOUT * 1.5)
+    breaker.before_request('host')
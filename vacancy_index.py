@@ -0,0 +1,309 @@
+# vacancy_index.py - Индекс открытых вакансий в памяти процесса
+#
+# Для сервисов, которые тысячи раз в секунду ищут вакансии по словам в
+# названии, работодателю и зарплате: данные меняются только при загрузке,
+# поэтому индекс строится один раз из таблицы vacancies и отвечает без
+# обращения к PostgreSQL.
+#
+# Столбцы хранятся в типизированных массивах (array), а не в кортежах Python:
+# 4-8 байт на значение вместо объекта на каждое. Названия лежат одной строкой
+# байт UTF-8 со смещениями. Для поиска есть обратный индекс слов названия,
+# списки строк по работодателям и отсортированные массивы границ зарплаты.
+# LiveVacancyIndex перестраивает индекс после каждой загрузки и подменяет его
+# целиком, поэтому запрос всегда видит один согласованный индекс.
+
+import itertools
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from db import DBManager, DEFAULT_ITERSIZE, acquire_connection, release_connection, get_data_generation
+
+
+# Слова названия: буквы и цифры, без учета регистра ('C++' и 'C#' дают 'c')
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Значение "зарплата не указана" в массивах зарплат (INTEGER в БД не бывает меньше)
+NO_SALARY = -2 ** 31
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре без повторов."""
+    return list(dict.fromkeys(TOKEN_PATTERN.findall(text.lower())))
+
+
+def _contains(postings, position):
+    # Списки позиций отсортированы: они заполняются по порядку строк
+    i = bisect_left(postings, position)
+    return i < len(postings) and postings[i] == position
+
+
+class VacancyIndex:
+    """
+    Неизменяемый индекс открытых вакансий.
+
+    Строка индекса - позиция вакансии в массивах столбцов. Запрос выбирает
+    самый короткий список кандидатов (слово, работодатель или диапазон
+    зарплат) и проверяет остальные условия по массивам столбцов.
+    """
+
+    def __init__(self, rows, generation=None):
+        """
+        Args:
+            rows (iterable): Кортежи (vacancy_id, employer_id, title, salary_from, salary_to),
+                зарплата - в рублях (см. DBManager.iter_vacancies_for_index).
+            generation (int): Поколение данных, из которого построен индекс.
+        """
+        start = time.perf_counter()
+        self.generation = generation
+        self.vacancy_ids = array('q')
+        self.employer_ids = array('q')
+        self.salary_from = array('i')
+        self.salary_to = array('i')
+        self._titles = bytearray()
+        self._title_offsets = array('q', [0])
+        self._tokens = {}        # слово -> array позиций
+        self._employers = {}     # ID работодателя -> array позиций
+
+        for position, (vacancy_id, employer_id, title, salary_from, salary_to) in enumerate(rows):
+            self.vacancy_ids.append(int(vacancy_id))
+            self.employer_ids.append(int(employer_id))
+            self.salary_from.append(NO_SALARY if salary_from is None else salary_from)
+            self.salary_to.append(NO_SALARY if salary_to is None else salary_to)
+            self._titles += title.encode('utf-8')
+            self._title_offsets.append(len(self._titles))
+            for token in tokenize(title):
+                postings = self._tokens.get(token)
+                if postings is None:
+                    postings = self._tokens[token] = array('i')
+                postings.append(position)
+            postings = self._employers.get(int(employer_id))
+            if postings is None:
+                postings = self._employers[int(employer_id)] = array('i')
+            postings.append(position)
+
+        self._titles = bytes(self._titles)
+        # Нижняя и верхняя граница вилки: единственная указанная граница служит обеими
+        lower = array('i', (salary_from if salary_from != NO_SALARY else salary_to
+                            for salary_from, salary_to in zip(self.salary_from, self.salary_to)))
+        upper = array('i', (salary_to if salary_to != NO_SALARY else salary_from
+                            for salary_from, salary_to in zip(self.salary_from, self.salary_to)))
+        self._by_lower_rows, self._by_lower = self._sorted_salaries(lower)
+        self._by_upper_rows, self._by_upper = self._sorted_salaries(upper)
+        self.build_seconds = time.perf_counter() - start
+
+    @staticmethod
+    def _sorted_salaries(values):
+        """Позиции вакансий с зарплатой, упорядоченные по values, и сами значения в том же порядке."""
+        rows = sorted((position for position, value in enumerate(values) if value != NO_SALARY),
+                      key=values.__getitem__)
+        return array('i', rows), array('i', (values[position] for position in rows))
+
+    @classmethod
+    def build(cls, params, itersize=DEFAULT_ITERSIZE):
+        """
+        Строит индекс по таблице vacancies.
+
+        Args:
+            params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+            itersize (int): Сколько строк серверный курсор забирает за раз.
+
+        Returns:
+            VacancyIndex: Индекс или None при ошибке, в том числе если поток строк оборвался.
+        """
+        db_manager = params if isinstance(params, DBManager) else DBManager(params, max_size=1)
+        try:
+            # Поколение читаем до строк: если загрузка пройдет во время построения,
+            # следующая проверка увидит новое поколение и перестроит индекс
+            generation = current_generation(db_manager)
+            if generation is None:
+                return None
+            return cls(db_manager.iter_vacancies_for_index(itersize), generation)
+        except Exception as e:
+            print(f"❌ Ошибка при построении индекса вакансий: {e}")
+            return None
+        finally:
+            if db_manager is not params:
+                db_manager.close()
+
+    def __len__(self):
+        return len(self.vacancy_ids)
+
+    def title(self, position):
+        """Название вакансии в позиции position."""
+        return self._titles[self._title_offsets[position]:self._title_offsets[position + 1]].decode('utf-8')
+
+    def row(self, position):
+        """
+        Returns:
+            tuple: (vacancy_id, employer_id, title, salary_from, salary_to); зарплата в рублях или None.
+        """
+        salary_from = self.salary_from[position]
+        salary_to = self.salary_to[position]
+        return (self.vacancy_ids[position], self.employer_ids[position], self.title(position),
+                None if salary_from == NO_SALARY else salary_from,
+                None if salary_to == NO_SALARY else salary_to)
+
+    def _lower(self, position):
+        salary_from = self.salary_from[position]
+        return salary_from if salary_from != NO_SALARY else self.salary_to[position]
+
+    def _upper(self, position):
+        salary_to = self.salary_to[position]
+        return salary_to if salary_to != NO_SALARY else self.salary_from[position]
+
+    def search(self, keyword=None, employer_id=None, salary_min=None, salary_max=None, limit=None, ids_only=False):
+        """
+        Ищет открытые вакансии; все заданные условия должны выполняться.
+
+        В отличие от get_vacancies_with_keyword (ILIKE по подстроке), keyword
+        сравнивается со словами названия целиком: 'java' не найдет 'JavaScript'.
+
+        Args:
+            keyword (str): Слова, которые все должны быть в названии.
+            employer_id (int): ID работодателя.
+            salary_min (int): Вилка доходит хотя бы до этой суммы (в рублях).
+            salary_max (int): Вилка начинается не выше этой суммы (в рублях).
+            limit (int): Максимальное число вакансий.
+            ids_only (bool): Вернуть только ID вакансий.
+
+        Returns:
+            list: Кортежи как в row() (или ID вакансий). Если самое узкое условие - зарплата,
+                  вакансии идут от самых высоких зарплат к низким (для salary_max)
+                  или от salary_min вверх, иначе - в порядке построения индекса.
+        """
+        # Каждое условие - (число кандидатов, их позиции, проверка одной позиции)
+        conditions = []
+        if keyword is not None:
+            for token in tokenize(keyword) or ['']:
+                postings = self._tokens.get(token, array('i'))
+                conditions.append((len(postings), lambda postings=postings: postings,
+                                   lambda p, postings=postings: _contains(postings, p)))
+        if employer_id is not None:
+            employer_id = int(employer_id)
+            postings = self._employers.get(employer_id, array('i'))
+            conditions.append((len(postings), lambda: postings, lambda p: self.employer_ids[p] == employer_id))
+        # Кандидаты по зарплате перебираются лениво в порядке зарплат: с limit
+        # не нужно копировать и сортировать весь диапазон
+        if salary_min is not None:
+            first = bisect_left(self._by_upper, salary_min)
+            conditions.append((len(self._by_upper) - first,
+                               lambda: map(self._by_upper_rows.__getitem__, range(first, len(self._by_upper))),
+                               lambda p: self._upper(p) >= salary_min))
+        if salary_max is not None:
+            last = bisect_right(self._by_lower, salary_max)
+            conditions.append((last,
+                               lambda: map(self._by_lower_rows.__getitem__, range(last - 1, -1, -1)),
+                               lambda p: NO_SALARY != self._lower(p) <= salary_max))
+
+        if conditions:
+            conditions.sort(key=lambda condition: condition[0])
+            candidates = conditions[0][1]()
+            checks = [check for _, _, check in conditions[1:]]
+        else:
+            candidates = range(len(self))
+            checks = []
+
+        if len(checks) == 1:
+            matched = filter(checks[0], candidates)
+        elif checks:
+            matched = (position for position in candidates if all(check(position) for check in checks))
+        else:
+            matched = candidates
+        return [self.vacancy_ids[position] if ids_only else self.row(position)
+                for position in itertools.islice(matched, limit)]
+
+    def memory_bytes(self):
+        """
+        Приблизительный размер индекса в памяти: буферы массивов и словари.
+
+        Returns:
+            int: Байт.
+        """
+        arrays = [self.vacancy_ids, self.employer_ids, self.salary_from, self.salary_to, self._title_offsets,
+                  self._by_lower_rows, self._by_lower, self._by_upper_rows, self._by_upper]
+        size = sum(sys.getsizeof(values) for values in arrays) + sys.getsizeof(self._titles)
+        for postings in (self._tokens, self._employers):
+            size += sys.getsizeof(postings)
+            size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in postings.items())
+        return size
+
+
+def current_generation(params):
+    """Возвращает текущее поколение данных или None при ошибке."""
+    conn = None
+    cur = None
+    generation = None
+
+    try:
+        conn = acquire_connection(params)
+        cur = conn.cursor()
+        generation = get_data_generation(cur)
+        conn.commit()
+    except Exception as e:
+        print(f"❌ Ошибка при чтении поколения данных: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_connection(params, conn)
+
+    return generation
+
+
+class LiveVacancyIndex:
+    """
+    Индекс, который перестраивается после каждой загрузки данных.
+
+    refresh() строит новый индекс, только если поколение данных изменилось,
+    и подменяет ссылку на него одним присваиванием: запросы, начатые раньше,
+    дорабатывают на старом индексе, новые сразу идут в новый.
+    """
+
+    def __init__(self, params, itersize=DEFAULT_ITERSIZE):
+        """
+        Args:
+            params (dict | DBManager): Параметры подключения к PostgreSQL или DBManager с пулом.
+            itersize (int): Сколько строк серверный курсор забирает за раз.
+        """
+        self.params = params
+        self.itersize = itersize
+        self.index = None
+        self._build_lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """
+        Перестраивает индекс, если данные изменились.
+
+        Args:
+            force (bool): Перестроить, даже если поколение данных прежнее.
+
+        Returns:
+            bool: Подменен ли индекс.
+        """
+        # Одновременно строится не больше одного индекса
+        with self._build_lock:
+            if not force and self.index is not None and current_generation(self.params) == self.index.generation:
+                return False
+            index = VacancyIndex.build(self.params, self.itersize)
+            if index is None:
+                # Остаемся на прежнем индексе: старые данные лучше, чем никаких
+                return False
+            self.index = index
+        print(f"✅ Индекс вакансий перестроен: {len(index)} вакансий за {index.build_seconds:.1f} с")
+        return True
+
+    def search(self, *args, **kwargs):
+        """Поиск по текущему индексу (см. VacancyIndex.search); строит индекс при первом вызове."""
+        index = self.index
+        if index is None:
+            self.refresh()
+            index = self.index
+            if index is None:
+                return []
+        return index.search(*args, **kwargs)